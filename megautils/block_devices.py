@@ -0,0 +1,301 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Block devices of virtual drivers
+
+megaraid_sas exposes a virtual driver as scsi device host:2:target id:0 of
+the scsi host of its adapter. Adapters are numbered like MegaCli does, in
+pci address order. mpt3sas volumes are matched by the volume wwid which is
+part of the wwid of the block device.
+
+The members of mpt3sas IR volumes are hidden from the disk driver, only
+their scsi generic device is left, found by the sas address of the disk.
+
+wait_for_block_device() watches /dev with inotify and looks again on every
+event. sysfs sends no inotify events, so it also looks every EVENT_TIMEOUT
+seconds for a device whose node udev has not created yet, and every
+POLL_INTERVAL where inotify is not available.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import time
+
+from megautils import exception
+
+SYSFS_ROOT = os.environ.get('MEGAUTILS_SYSFS_ROOT', '/sys')
+DEV_ROOT = os.environ.get('MEGAUTILS_DEV_ROOT', '/dev')
+
+MEGARAID_DRIVER = 'megaraid_sas'
+MEGARAID_VD_CHANNEL = 2
+
+# seconds between two looks without inotify, and the longest inotify wait,
+# sysfs entries the kernel creates are not reported by inotify
+POLL_INTERVAL = 0.5
+EVENT_TIMEOUT = 5
+
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def scsi_hosts(driver, root=None):
+    """
+    Get the scsi hosts of a driver
+    :param driver: driver name, e.g. 'megaraid_sas'
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :return: host numbers in pci address order of their adapters
+    """
+    hosts_dir = os.path.join(root or SYSFS_ROOT, 'class', 'scsi_host')
+    try:
+        names = os.listdir(hosts_dir)
+    except OSError:
+        return []
+
+    hosts = []
+    for name in names:
+        path = os.path.join(hosts_dir, name)
+        if _read(os.path.join(path, 'proc_name')) != driver:
+            continue
+        # .../0000:03:00.0/host0/scsi_host/host0
+        hosts.append((os.path.realpath(path), int(name[4:])))
+    return [host for _, host in sorted(hosts)]
+
+
+def block_devices(root=None):
+    """
+    Get the scsi address of every scsi block device
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :return: dict of block device name to (host, channel, target, lun)
+    """
+    block_dir = os.path.join(root or SYSFS_ROOT, 'block')
+    try:
+        names = os.listdir(block_dir)
+    except OSError:
+        return {}
+
+    devices = {}
+    for name in names:
+        device = os.path.join(block_dir, name, 'device')
+        if not os.path.exists(device):
+            continue
+        address = os.path.basename(os.path.realpath(device)).split(':')
+        if len(address) != 4 or not all(x.isdigit() for x in address):
+            continue
+        devices[name] = tuple(int(x) for x in address)
+    return devices
+
+
+def _normalize_wwid(wwid):
+    wwid = wwid.strip().lower()
+    for prefix in ('naa.', 'eui.', '0x'):
+        if wwid.startswith(prefix):
+            wwid = wwid[len(prefix):]
+    return wwid
+
+
+def megaraid_device(adapter_id, target_id, root=None, dev_root=None):
+    """
+    Get the block device of a megaraid virtual driver
+    :param adapter_id: MegaCli adapter id
+    :param target_id: virtual driver target id
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :param dev_root: device directory, $MEGAUTILS_DEV_ROOT or /dev
+    :return: device path, None when the kernel does not expose it (yet)
+    """
+    hosts = scsi_hosts(MEGARAID_DRIVER, root)
+    if int(adapter_id) >= len(hosts):
+        return None
+    address = (hosts[int(adapter_id)], MEGARAID_VD_CHANNEL, int(target_id), 0)
+    for name, device_address in sorted(block_devices(root).items()):
+        if device_address == address:
+            return os.path.join(dev_root or DEV_ROOT, name)
+    return None
+
+
+def wwid_device(wwid, root=None, dev_root=None):
+    """
+    Get the block device of a volume by its wwid
+    :param wwid: volume wwid as sas3ircu reports it
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :param dev_root: device directory, $MEGAUTILS_DEV_ROOT or /dev
+    :return: device path, None when the kernel does not expose it (yet)
+    """
+    wwid = _normalize_wwid(wwid).lstrip('0')
+    if not wwid:
+        return None
+    block_dir = os.path.join(root or SYSFS_ROOT, 'block')
+    for name in sorted(block_devices(root)):
+        device_wwid = _read(os.path.join(block_dir, name, 'device', 'wwid'))
+        if device_wwid and _normalize_wwid(device_wwid).endswith(wwid):
+            return os.path.join(dev_root or DEV_ROOT, name)
+    return None
+
+
+def _normalize_sas_address(sas_address):
+    # sas3ircu prints '4433221-1-0500-0000', sysfs '0x4433221105000000'
+    return _normalize_wwid(sas_address).replace('-', '').lstrip('0')
+
+
+def sas_generic_device(sas_address, root=None, dev_root=None):
+    """
+    Get the scsi generic device of a disk by its sas address
+    :param sas_address: sas address as sas3ircu reports it
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :param dev_root: device directory, $MEGAUTILS_DEV_ROOT or /dev
+    :return: device path, None when the kernel does not expose it
+    """
+    sas_address = _normalize_sas_address(sas_address)
+    if not sas_address:
+        return None
+    devices_dir = os.path.join(root or SYSFS_ROOT, 'class', 'scsi_device')
+    try:
+        names = os.listdir(devices_dir)
+    except OSError:
+        return None
+
+    for name in sorted(names):
+        device = os.path.join(devices_dir, name, 'device')
+        address = _read(os.path.join(device, 'sas_address'))
+        if not address or _normalize_sas_address(address) != sas_address:
+            continue
+        try:
+            generic = os.listdir(os.path.join(device, 'scsi_generic'))
+        except OSError:
+            return None
+        if generic:
+            return os.path.join(dev_root or DEV_ROOT, generic[0])
+    return None
+
+
+def find_block_device(vd, root=None, dev_root=None):
+    """
+    Get the block device of a virtual driver
+    :param vd: megaraid VirtualDriver or sas3ircu VirtualDriver
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :param dev_root: device directory, $MEGAUTILS_DEV_ROOT or /dev
+    :return: device path, None when the kernel does not expose it (yet)
+             or the virtual driver was not queried
+    """
+    wwid = getattr(vd, 'volume_wwid', None)
+    if wwid:
+        return wwid_device(wwid, root, dev_root)
+    if not _has_target_id(vd):
+        return None
+    return megaraid_device(vd.adapter, vd.target_id, root, dev_root)
+
+
+def _has_target_id(vd):
+    # the target id differs from the virtual driver id once virtual
+    # drivers were deleted and created again, only a queried one has it
+    return vd.adapter is not None and \
+        getattr(vd, 'target_id', None) is not None
+
+
+class _Inotify(object):
+    """Creations in some directories, None from open() without inotify"""
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    @classmethod
+    def open(cls, paths):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                               use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+
+        watches = 0
+        for path in paths:
+            if libc.inotify_add_watch(fd, ctypes.c_char_p(path.encode()),
+                                      IN_CREATE | IN_MOVED_TO) >= 0:
+                watches += 1
+        if not watches:
+            os.close(fd)
+            return None
+        return cls(fd)
+
+    def wait(self, timeout):
+        """
+        Wait for events and drain them
+        :param timeout: seconds
+        :return: True when something was created
+        """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return False
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+def wait_for_block_device(vd, timeout=60, root=None, dev_root=None):
+    """
+    Wait until the kernel exposes the block device of a virtual driver
+    :param vd: megaraid VirtualDriver or sas3ircu VirtualDriver
+    :param timeout: seconds
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :param dev_root: device directory, $MEGAUTILS_DEV_ROOT or /dev
+    :return: device path
+    :raises: InvalidParameterValue when the virtual driver has neither a
+             volume wwid nor a target id
+    :raises: BlockDeviceNotFound when timeout passed
+    """
+    if not getattr(vd, 'volume_wwid', None) and not _has_target_id(vd):
+        raise exception.InvalidParameterValue(
+            'target id of virtual driver %s of adapter %s unknown' %
+            (vd.id, vd.adapter))
+    root = root or SYSFS_ROOT
+    dev_root = dev_root or DEV_ROOT
+    deadline = time.time() + timeout
+    watcher = _Inotify.open([dev_root])
+    try:
+        while True:
+            device = find_block_device(vd, root, dev_root)
+            if device is not None and os.path.exists(device):
+                return device
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise exception.BlockDeviceNotFound(
+                    'no block device of virtual driver %s of adapter %s '
+                    'after %s seconds' % (vd.id, vd.adapter, timeout))
+            if watcher is not None:
+                watcher.wait(min(remaining, EVENT_TIMEOUT))
+            else:
+                time.sleep(min(remaining, POLL_INTERVAL))
+    finally:
+        if watcher is not None:
+            watcher.close()
@@ -0,0 +1,105 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Process wide cache of controller query output
+
+Entries are keyed by adapter and query. Running any mutating command on an
+adapter drops the entries of that adapter and of the queries spanning all
+adapters.
+"""
+
+import os
+import threading
+import time
+
+ALL_ADAPTERS = 'ALL'
+DEFAULT_TTL = float(os.environ.get('MEGAUTILS_CACHE_TTL', 30))
+
+
+class InventoryCache(object):
+
+    def __init__(self, ttl=DEFAULT_TTL, timer=time.time):
+        self.ttl = ttl
+        self.generation = 0
+        self._timer = timer
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, adapter, query):
+        """
+        Get a cached query output
+        :param adapter: adapter id or 'ALL'
+        :param query: query command
+        :return: cached output or None when missing or expired
+        """
+        if self.ttl <= 0:
+            return None
+        key = (str(adapter), query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self._timer():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, adapter, query, value, generation=None):
+        """
+        Cache a query output
+        :param adapter: adapter id or 'ALL'
+        :param query: query command
+        :param value: query output
+        :param generation: cache generation read before the query ran, the
+                           output is dropped if the cache was invalidated
+                           while the query was running
+        """
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[(str(adapter), query)] = \
+                (self._timer() + self.ttl, value)
+
+    def invalidate(self, adapter=None):
+        """
+        Drop cached outputs of an adapter
+        :param adapter: adapter id, None or 'ALL' drops everything
+        """
+        with self._lock:
+            self.generation += 1
+            if adapter is None or str(adapter) == ALL_ADAPTERS:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if key[0] in (str(adapter), ALL_ADAPTERS):
+                    del self._entries[key]
+
+
+_cache = InventoryCache()
+
+
+def get_cache():
+    return _cache
+
+
+def configure(ttl):
+    """
+    Set the time to live of cached outputs, 0 disables caching
+    :param ttl: seconds
+    """
+    _cache.ttl = ttl
+    _cache.invalidate()
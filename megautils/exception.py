@@ -47,4 +47,9 @@ class RaidOperationError(errors.RESTError):
 class PhysicalDisksNotFoundError(errors.RESTError):
     """Error raised when require physical disk not found"""
 
-    message = ('No available pyhsical disk found!')
\ No newline at end of file
+    message = ('No available pyhsical disk found!')
+
+class BlockDeviceNotFound(errors.RESTError):
+    """Error raised when the block device of a virtual driver not found"""
+
+    message = ('Block device of the virtual driver not found!')
@@ -0,0 +1,132 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per command instrumentation of the controller clis
+
+Records call count, latency histogram, output bytes and exit codes of every
+cli verb. Disabled by default, set MEGAUTILS_INSTRUMENTATION=1 or call
+enable(); when disabled the clis only test a module flag.
+"""
+
+import json
+import os
+import threading
+import time
+
+enabled = os.environ.get('MEGAUTILS_INSTRUMENTATION', '') not in \
+    ('', '0', 'false', 'False')
+DUMP_FILE = os.environ.get('MEGAUTILS_INSTRUMENTATION_FILE')
+
+# upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+
+timer = time.time
+
+_stats = {}
+_lock = threading.Lock()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def _new_stats():
+    return {'calls': 0,
+            'cache_hits': 0,
+            'seconds': 0.0,
+            'max_seconds': 0.0,
+            'histogram': [0] * (len(LATENCY_BUCKETS) + 1),
+            'output_bytes': 0,
+            'exit_codes': {}}
+
+
+def _bucket(seconds):
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            return index
+    return len(LATENCY_BUCKETS)
+
+
+def record(cli, verb, seconds, output_bytes, exitcode):
+    """
+    Record a cli run
+    :param cli: cli name, 'megacli' or 'sas3ircu'
+    :param verb: command verb like '-PdList' or 'DISPLAY'
+    :param seconds: wall clock time of the run
+    :param output_bytes: size of the output
+    :param exitcode: exit code, None when the cli did not exit normally
+    """
+    exitcode = str(exitcode)
+    with _lock:
+        stats = _stats.get((cli, verb))
+        if stats is None:
+            stats = _stats[(cli, verb)] = _new_stats()
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        stats['histogram'][_bucket(seconds)] += 1
+        stats['output_bytes'] += output_bytes
+        stats['exit_codes'][exitcode] = \
+            stats['exit_codes'].get(exitcode, 0) + 1
+
+
+def record_cache_hit(cli, verb):
+    with _lock:
+        stats = _stats.get((cli, verb))
+        if stats is None:
+            stats = _stats[(cli, verb)] = _new_stats()
+        stats['cache_hits'] += 1
+
+
+def get_stats():
+    """
+    Get the recorded stats
+    :return: dict of cli name to dict of verb to stats, histogram counts
+             are ordered like LATENCY_BUCKETS with a last overflow bucket
+    """
+    result = {}
+    with _lock:
+        for (cli, verb), stats in _stats.items():
+            stats = dict(stats, histogram=list(stats['histogram']),
+                         exit_codes=dict(stats['exit_codes']))
+            result.setdefault(cli, {})[verb] = stats
+    return result
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def dump_json(step=None, path=DUMP_FILE):
+    """
+    Dump the recorded stats as json
+    :param step: name of the clean step the stats belong to
+    :param path: file the json document is appended to as a single line
+    :return: json document
+    """
+    document = json.dumps({'step': step,
+                           'time': time.time(),
+                           'latency_buckets': LATENCY_BUCKETS,
+                           'stats': get_stats()}, sort_keys=True)
+    if path:
+        with open(path, 'a') as f:
+            f.write(document + '\n')
+    return document
@@ -12,27 +12,77 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+
 from oslo_log import log
 
 from ironic_python_agent import hardware
-from megautils.raid.adapter import Adapter
-from megautils.raid_ircu.adapter import Adapter as SASAdapter
-from megautils.raid.virtual_driver import VirtualDriver
-from megautils.raid_ircu.virtual_driver import VirtualDriver as SASVirtualDriver
-from megautils.raid.virtual_driver import validate_raid_schema
-from megautils.raid.disk_allocator import allocate_disks
-from megautils.raid_ircu.disk_allocator import allocate_disks as sas_allocate_disks
+from megautils import block_devices
+from megautils import exception
+from megautils import instrumentation
+from megautils import pci
+from megautils import smart
+from megautils import utils
+
+# IPA loads every registered hardware manager at boot, the backends and
+# their dependencies are imported by the methods of the manager using them
+# so nodes without a controller of that family do not pay for them.
 
 LOG = log.getLogger(__name__)
 
 
+def _instrumented_step(func):
+    """Dump the cli instrumentation of a clean step when it ends"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not instrumentation.enabled:
+            return func(*args, **kwargs)
+        instrumentation.reset()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            LOG.info('cli stats of %s: %s' %
+                     (func.__name__, instrumentation.dump_json(func.__name__)))
+    return wrapper
+
+
 class MegaHardwareManager(hardware.GenericHardwareManager):
     HARDWARE_MANAGER_VERSION = "4"
     LSI_RAID_PROVIDER = 4
+    # number of controllers handled concurrently
+    CONTROLLER_WORKERS = utils.DEFAULT_WORKERS
+    # list_hardware_info adds the SMART data of the physical disks
+    COLLECT_SMART = smart.ENABLED
+    # number of disks whose SMART data is read concurrently
+    SMART_WORKERS = smart.DEFAULT_WORKERS
+    # seconds create_configuration waits for the block device of the root
+    # volume, the deploy steps after it look for the root device
+    ROOT_DEVICE_TIMEOUT = 60
 
     def evaluate_hardware_support(cls):
-        adapters = Adapter().get_adapters()
-        return cls.LSI_RAID_PROVIDER if adapters else hardware.HardwareSupport.NONE
+        if pci.has_controller(pci.FAMILY_MEGARAID, cls._cli_has_adapters):
+            return cls.LSI_RAID_PROVIDER
+        return hardware.HardwareSupport.NONE
+
+    @staticmethod
+    def _cli_has_adapters():
+        from megautils.raid.adapter import Adapter
+        return Adapter().get_adapters()
+
+    def _wait_for_root_device(self, vd):
+        """
+        Wait until the kernel exposes the block device of the root volume
+        :param vd: queried root virtual driver
+        :return: device path, None when it did not show up in time
+        """
+        try:
+            device = block_devices.wait_for_block_device(
+                vd, self.ROOT_DEVICE_TIMEOUT)
+        except exception.BlockDeviceNotFound as e:
+            LOG.warning(e)
+            return None
+        LOG.info('root volume is %s' % device)
+        return device
 
     def list_hardware_info(self):
         """Return full hardware inventory as a serializable dict.
@@ -45,6 +95,10 @@ class MegaHardwareManager(hardware.GenericHardwareManager):
         hardware_info['cpu'] = self.get_cpus()
         hardware_info['disks'] = hardware.list_all_block_devices()
         hardware_info['physical_disks'] = self.list_all_physical_disks()
+        hardware_info['virtual_disks'] = self.list_all_virtual_disks()
+        if self.COLLECT_SMART:
+            hardware_info['physical_disk_health'] = \
+                self.list_physical_disk_health()
         hardware_info['memory'] = self.get_memory()
         hardware_info['bmc_address'] = self.get_bmc_address()
         hardware_info['system_vendor'] = self.get_system_vendor_info()
@@ -56,21 +110,58 @@ class MegaHardwareManager(hardware.GenericHardwareManager):
         Get all physical disks to node for allocation
         :return: physical disk dict
         """
-        adapters = Adapter().get_adapters()
+        from megautils.raid.inventory import Inventory
+        inventory = Inventory()
+        inventory.collect_physical_disks()
         cache_physical_drivers = []
-        for adapter in adapters:
-            pds = adapter.get_physical_drivers()
-            for pd in pds:
-                cache_physical_drivers.append({
-                    'size': pd.raw_size,
-                    'type': pd.pd_type,
-                    'enclosure': pd.enclosure,
-                    'slot': pd.enclosure,
-                    'wwn': pd.wwn
-                })
+        for pd in inventory.all_physical_disks():
+            cache_physical_drivers.append({
+                'size': pd.raw_size,
+                'type': pd.pd_type,
+                'enclosure': pd.enclosure,
+                'slot': pd.slot,
+                'wwn': pd.wwn
+            })
 
         return cache_physical_drivers
 
+    def list_physical_disk_health(self):
+        """
+        Get the SMART data of all physical disks, one smartctl call per
+        disk on at most SMART_WORKERS threads
+        :return: health dict list, see megautils.smart.read
+        """
+        from megautils.raid.inventory import Inventory
+        inventory = Inventory()
+        inventory.collect_physical_disks()
+        health = inventory.collect_health(self.SMART_WORKERS)
+        return [health[key] for key in sorted(health)]
+
+    def list_all_virtual_disks(self):
+        """
+        Get all virtual disks with their physical disks and block device,
+        which relates 'disks' and 'physical_disks' of the inventory
+        :return: virtual disk dict
+        """
+        from megautils.raid.inventory import Inventory
+        inventory = Inventory()
+        inventory.collect_virtual_drivers()
+        cache_virtual_drivers = []
+        for adapter_id in sorted(inventory.virtual_drivers):
+            for vd in inventory.get_virtual_drivers(adapter_id):
+                cache_virtual_drivers.append({
+                    'controller': adapter_id,
+                    'id': vd.id,
+                    'raid_level': vd.raid_level,
+                    'size': vd.size,
+                    'state': vd.state,
+                    'physical_disks': inventory.get_members(adapter_id,
+                                                            vd.id),
+                    'device': block_devices.find_block_device(vd)
+                })
+
+        return cache_virtual_drivers
+
     def get_clean_steps(self, node, ports):
         """Return the clean steps supported by this hardware manager.
 
@@ -91,9 +182,13 @@ class MegaHardwareManager(hardware.GenericHardwareManager):
              'priority': 0},
             {'step': 'delete_configuration',
              'interface': 'raid',
-             'priority': 1}
+             'priority': 1},
+            {'step': 'apply_controller_profile',
+             'interface': 'raid',
+             'priority': 0}
         ]
 
+    @_instrumented_step
     def create_configuration(self, node, ports):
         """
         Create a Raid configuration to the baremetal node
@@ -101,6 +196,10 @@ class MegaHardwareManager(hardware.GenericHardwareManager):
         :param ports: ironic port objects
         :return: current raid configuration schema
         """
+        from megautils.raid.planner import execute_plan
+        from megautils.raid.planner import plan_configuration
+        from megautils.raid.virtual_driver import validate_raid_schema
+
         LOG.info('creating configuration of node %s' % node['uuid'])
 
         target_raid_config = node.get('target_raid_config', {}).copy()
@@ -108,29 +207,19 @@ class MegaHardwareManager(hardware.GenericHardwareManager):
         LOG.debug('node raid config: %s' % target_raid_config)
         validate_raid_schema(target_raid_config)
 
-        target_sorted_virtual_driver = (
-            sorted((x for x in target_raid_config['logical_disks']
-                    if x['size_gb'] != 'MAX'),
-                   reverse=True,
-                   key=lambda x: x['size_gb']) +
-            [x for x in target_raid_config['logical_disks']
-             if x['size_gb'] == 'MAX'])
-
-        for target_virtual_driver in target_sorted_virtual_driver:
-            adapter = target_virtual_driver.get('controller', 0)
-            vd = VirtualDriver(adapter_id=adapter)
-            count = target_virtual_driver.get('count', 1)
-            for i in range(0, count):
-                if 'physical_disks' not in target_virtual_driver:
-                    allocate_disks(adapter, target_virtual_driver)
-                vd.create(target_virtual_driver['raid_level'],
-                          target_virtual_driver['physical_disks'])
-            if target_raid_config.get('is_root_volume', False)\
-                    and count == 1:
-                vd.set_boot_able()
+        plan = plan_configuration(target_raid_config)
+        LOG.info('raid plan of node %s: %s' % (node['uuid'], plan.to_dict()))
+        vds = execute_plan(plan)
+        for volume, vd in zip(plan.volumes, vds):
+            if volume.is_root_volume:
+                # the target id is known once the virtual driver is queried
+                vd.__flush__()
+                self._wait_for_root_device(vd)
 
+        target_raid_config['logical_disks'] = plan.logical_disks()
         return target_raid_config
 
+    @_instrumented_step
     def delete_configuration(self, node, ports):
         """
         Delete all Raid configuration to the baremetal node
@@ -138,36 +227,75 @@ class MegaHardwareManager(hardware.GenericHardwareManager):
         :param ports: ironic port objects
         :return: execute messages
         """
-        adapters = Adapter().get_adapters()
-        cache_virtual_drivers = []
-        for adapter in adapters:
-            cache_virtual_drivers += adapter.get_virtual_drivers()
+        from megautils.raid.adapter import Adapter
+        from megautils.raid.inventory import Inventory
+        inventory = Inventory()
+        inventory.collect_virtual_drivers()
 
         LOG.info('deleting virtual drivers')
-        for virtual_driver in cache_virtual_drivers:
-            LOG.debug('deleting virtual driver %s of adapter %s' %
-                      (virtual_driver.id, virtual_driver.adapter))
-            virtual_driver.destroy()
+        adapter_ids = [adapter_id
+                       for adapter_id in sorted(inventory.virtual_drivers)
+                       if inventory.get_virtual_drivers(adapter_id)]
+        utils.map_controllers(
+            lambda adapter_id:
+                Adapter(id=adapter_id).destroy_virtual_drivers(),
+            adapter_ids, self.CONTROLLER_WORKERS)
         return 'raid clean execution success'
 
+    @_instrumented_step
+    def apply_controller_profile(self, node, ports):
+        """
+        Apply the controller profile named by the node property
+        'raid_controller_profile' to all adapters
+        :param node: ironic node object
+        :param ports: ironic port objects
+        :return: dict of adapter id to the properties set
+        """
+        profile = node.get('properties', {}).get('raid_controller_profile')
+        if not profile:
+            LOG.info('node %s has no raid_controller_profile' % node['uuid'])
+            return {}
+
+        from megautils.raid.controller_profile import ControllerProfile
+        changes = ControllerProfile(profile).apply(self.CONTROLLER_WORKERS)
+        LOG.info('controller properties set on node %s: %s' %
+                 (node['uuid'], changes))
+        return changes
+
 
 class MegaSAS3HardwareManager(MegaHardwareManager):
     HARDWARE_MANAGER_VERSION = "5"
     LSI_RAID_PROVIDER = 5
 
+    def get_clean_steps(self, node, ports):
+        # sas3ircu has no controller properties to tune
+        return [step for step in
+                super(MegaSAS3HardwareManager, self).get_clean_steps(
+                    node, ports)
+                if step['step'] != 'apply_controller_profile']
+
     def evaluate_hardware_support(cls):
-        adapters = SASAdapter().get_adapters()
-        return cls.LSI_RAID_PROVIDER if adapters else hardware.HardwareSupport.NONE
+        if pci.has_controller(pci.FAMILY_SAS3, cls._cli_has_adapters):
+            return cls.LSI_RAID_PROVIDER
+        return hardware.HardwareSupport.NONE
+
+    @staticmethod
+    def _cli_has_adapters():
+        from megautils.raid_ircu.adapter import Adapter as SASAdapter
+        return SASAdapter().get_adapters()
 
     def list_all_physical_disks(self):
         """
         Get all physical disks to node for allocation
         :return: physical disk dict
         """
+        from megautils.raid_ircu.adapter import Adapter as SASAdapter
         adapters = SASAdapter().get_adapters()
+        adapter_physical_drivers = utils.map_controllers(
+            lambda adapter: adapter.get_physical_drivers(),
+            adapters, self.CONTROLLER_WORKERS)
         cache_physical_drivers = []
-        for adapter in adapters:
-            pds = adapter.get_physical_drivers()
+        for pds in adapter_physical_drivers:
             for pd in pds:
                 cache_physical_drivers.append({
                     'size': pd.size,
@@ -179,6 +307,50 @@ class MegaSAS3HardwareManager(MegaHardwareManager):
 
         return cache_physical_drivers
 
+    def list_physical_disk_health(self):
+        """
+        Get the SMART data of all physical disks, one smartctl call per
+        disk on at most SMART_WORKERS threads
+        :return: health dict list, see megautils.smart.read
+        """
+        from megautils.raid_ircu.adapter import Adapter as SASAdapter
+        adapters = SASAdapter().get_adapters()
+        adapter_physical_drivers = utils.map_controllers(
+            lambda adapter: adapter.get_physical_drivers(),
+            adapters, self.CONTROLLER_WORKERS)
+        targets = []
+        for adapter, pds in zip(adapters, adapter_physical_drivers):
+            targets.extend(smart.sas3_targets(adapter.id, pds))
+        health = smart.collect(targets, self.SMART_WORKERS)
+        return [health[key] for key in sorted(health)]
+
+    def list_all_virtual_disks(self):
+        """
+        Get all virtual disks with their physical disks and block device,
+        which relates 'disks' and 'physical_disks' of the inventory
+        :return: virtual disk dict
+        """
+        from megautils.raid_ircu.adapter import Adapter as SASAdapter
+        adapters = SASAdapter().get_adapters()
+        adapter_virtual_drivers = utils.map_controllers(
+            lambda adapter: adapter.get_virtual_drivers(),
+            adapters, self.CONTROLLER_WORKERS)
+        cache_virtual_drivers = []
+        for vds in adapter_virtual_drivers:
+            for vd in vds:
+                cache_virtual_drivers.append({
+                    'controller': vd.adapter,
+                    'id': vd.volume_id,
+                    'raid_level': vd.raid_level,
+                    'size': vd.size,
+                    'state': vd.status_of_volume,
+                    'physical_disks': list(vd.physical_hard_disks or []),
+                    'device': block_devices.find_block_device(vd)
+                })
+
+        return cache_virtual_drivers
+
+    @_instrumented_step
     def create_configuration(self, node, ports):
         """
         Create a Raid configuration to the baremetal node
@@ -186,6 +358,12 @@ class MegaSAS3HardwareManager(MegaHardwareManager):
         :param ports: ironic port objects
         :return: current raid configuration schema
         """
+        from megautils.raid.virtual_driver import validate_raid_schema
+        from megautils.raid_ircu.disk_allocator import allocate_disks \
+            as sas_allocate_disks
+        from megautils.raid_ircu.virtual_driver import VirtualDriver \
+            as SASVirtualDriver
+
         LOG.info('creating configuration of node %s' % node['uuid'])
 
         target_raid_config = node.get('target_raid_config', {}).copy()
@@ -210,12 +388,14 @@ class MegaSAS3HardwareManager(MegaHardwareManager):
                     sas_allocate_disks(adapter, target_virtual_driver)
                 vd.create(target_virtual_driver['raid_level'],
                           target_virtual_driver['physical_disks'])
-            if target_raid_config.get('is_root_volume', False)\
+            if target_virtual_driver.get('is_root_volume', False)\
                     and count == 1:
                 vd.set_boot_able()
+                self._wait_for_root_device(vd)
 
         return target_raid_config
 
+    @_instrumented_step
     def delete_configuration(self, node, ports):
         """
         Delete all Raid configuration to the baremetal node
@@ -223,15 +403,12 @@ class MegaSAS3HardwareManager(MegaHardwareManager):
         :param ports: ironic port objects
         :return: execute messages
         """
+        from megautils.raid_ircu.adapter import Adapter as SASAdapter
         adapters = SASAdapter().get_adapters()
-        cache_virtual_drivers = []
-        for adapter in adapters:
-            cache_virtual_drivers += adapter.get_virtual_drivers()
 
         LOG.info('deleting virtual drivers')
-        for virtual_driver in cache_virtual_drivers:
-            LOG.debug('deleting virtual driver %s of adapter %s' %
-                      (virtual_driver.id, virtual_driver.adapter))
-            virtual_driver.destroy()
+        utils.map_controllers(
+            lambda adapter: adapter.destroy_virtual_drivers(),
+            adapters, self.CONTROLLER_WORKERS)
         return 'raid clean execution success'
 
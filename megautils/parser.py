@@ -0,0 +1,131 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Table driven parser of 'key : value' controller cli output
+
+A parser is declared with a table of fields, each field maps the key printed
+by the cli to an attribute name and a converter. Every line is split once
+and its key is looked up in a dict, so the cost per line does not depend on
+the number of fields.
+"""
+
+
+class Field(object):
+    __slots__ = ('key', 'attr', 'converter', 'multi')
+
+    def __init__(self, key, attr, converter=None, multi=False):
+        """
+        :param key: key printed by the cli, without padding
+        :param attr: attribute name of the parsed value
+        :param converter: callable converting the raw value, the value is
+                          stripped when not specified
+        :param multi: collect every value of the key into a list
+        """
+        self.key = key
+        self.attr = attr
+        self.converter = converter or _strip
+        self.multi = multi
+
+
+def _strip(value):
+    return value.strip()
+
+
+def split_field(line):
+    """
+    Split a cli output line into key and value
+    :param line: output line like 'Slot Number: 1' or 'Adapter #0'
+    :return: (key, raw value) tuple, key is None for lines without a key
+    """
+    offset = line.find(':')
+    if offset < 0:
+        offset = line.find('#')
+        if offset < 0:
+            return None, None
+    return line[:offset].strip(), line[offset + 1:]
+
+
+class TableParser(object):
+
+    def __init__(self, fields, start, stop=None, splitter=split_field):
+        """
+        :param fields: list of Field
+        :param start: key beginning a new record
+        :param stop: key ending the parse
+        :param splitter: callable splitting a line into key and raw value
+        """
+        self.fields = dict((field.key, field) for field in fields)
+        self.start = start
+        self.stop = stop
+        self.splitter = splitter
+
+    def parse(self, lines, on_record=None):
+        """
+        Parse cli output into records
+        :param lines: iterable of output lines
+        :param on_record: hook called with the values dict of every record,
+                          its return value is yielded instead of the dict
+                          and records it returns None for are dropped
+        :return: generator of records, a record is yielded as soon as the
+                 next one begins or the output ends
+        """
+        fields = self.fields
+        start = self.start
+        stop = self.stop
+        splitter = self.splitter
+        values = None
+        for line in lines:
+            key, value = splitter(line)
+            if key is None:
+                continue
+            if key == start:
+                if values is not None:
+                    record = on_record(values) if on_record else values
+                    if record is not None:
+                        yield record
+                values = {}
+            elif key == stop:
+                break
+            field = fields.get(key)
+            if field is None or values is None:
+                continue
+            if field.multi:
+                values.setdefault(field.attr, []).append(
+                    field.converter(value))
+            else:
+                values[field.attr] = field.converter(value)
+        if values is not None:
+            record = on_record(values) if on_record else values
+            if record is not None:
+                yield record
+
+
+def to_int(value):
+    return int(value.strip())
+
+
+def to_size_gb(value):
+    """
+    Convert a size like '278.875 GB [0x22dc0000 Sectors]' to GB
+    :param value: raw size value
+    :return: float size in GB
+    """
+    parts = value.split('[', 1)[0].split()
+    size = float(parts[0])
+    unit = parts[1].upper() if len(parts) > 1 else 'GB'
+    if unit == 'TB':
+        size *= 1024
+    elif unit == 'MB':
+        size /= 1024
+    return size
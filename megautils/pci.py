@@ -0,0 +1,140 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Controller detection through sysfs
+
+Looking at /sys/bus/pci/devices is much cheaper than spawning MegaCli or
+sas3ircu. The cli is only asked when sysfs can not tell, e.g. an LSI device
+without a bound driver and an unknown device id, or no sysfs at all.
+"""
+
+import os
+import threading
+
+SYSFS_ROOT = os.environ.get('MEGAUTILS_SYSFS_ROOT', '/sys')
+
+VENDOR_LSI = '0x1000'
+
+FAMILY_MEGARAID = 'megaraid'
+FAMILY_SAS3 = 'sas3'
+
+FAMILY_DRIVERS = {FAMILY_MEGARAID: 'megaraid_sas',
+                  FAMILY_SAS3: 'mpt3sas'}
+
+# device ids of the controllers of a family, used when no driver is bound
+FAMILY_DEVICE_IDS = {
+    FAMILY_MEGARAID: frozenset((
+        '0x0014', '0x0016', '0x0017', '0x001b', '0x001c', '0x005b',
+        '0x005d', '0x005f', '0x0060', '0x0073', '0x0078', '0x0079',
+        '0x00ce', '0x00cf', '0x10e1', '0x10e2', '0x10e5', '0x10e6')),
+    FAMILY_SAS3: frozenset((
+        '0x0090', '0x0091', '0x0094', '0x0095', '0x0096', '0x0097',
+        '0x00aa', '0x00ab', '0x00ac', '0x00ad', '0x00ae', '0x00af',
+        '0x00c0', '0x00c1', '0x00c2', '0x00c3', '0x00c4', '0x00c5',
+        '0x00c6', '0x00c7', '0x00c8', '0x00c9', '0x00d0', '0x00d1',
+        '0x00d2', '0x00e0', '0x00e1', '0x00e2', '0x00e3', '0x00e4',
+        '0x00e5', '0x00e6', '0x00e7')),
+}
+
+PRESENT = 'present'
+ABSENT = 'absent'
+UNKNOWN = 'unknown'
+
+_answers = {}
+_lock = threading.Lock()
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip().lower()
+    except (IOError, OSError):
+        return None
+
+
+def lsi_devices(root=None):
+    """
+    List the LSI/Broadcom pci devices
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :return: list of (address, device id, bound driver or None) tuples,
+             None when the pci bus is not in sysfs
+    """
+    devices_dir = os.path.join(root or SYSFS_ROOT, 'bus', 'pci', 'devices')
+    try:
+        addresses = sorted(os.listdir(devices_dir))
+    except OSError:
+        return None
+
+    devices = []
+    for address in addresses:
+        path = os.path.join(devices_dir, address)
+        if _read(os.path.join(path, 'vendor')) != VENDOR_LSI:
+            continue
+        driver = os.path.join(path, 'driver')
+        driver = (os.path.basename(os.path.realpath(driver))
+                  if os.path.islink(driver) else None)
+        devices.append((address, _read(os.path.join(path, 'device')),
+                        driver))
+    return devices
+
+
+def probe(family, root=None):
+    """
+    Tell from sysfs whether a controller of a family is installed
+    :param family: FAMILY_MEGARAID or FAMILY_SAS3
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :return: PRESENT, ABSENT or UNKNOWN when only the cli can tell
+    """
+    devices = lsi_devices(root)
+    if devices is None:
+        return UNKNOWN
+
+    result = ABSENT
+    for address, device_id, driver in devices:
+        if driver == FAMILY_DRIVERS[family]:
+            return PRESENT
+        if driver is not None:
+            # bound to the driver of another family, or passed through
+            continue
+        if device_id in FAMILY_DEVICE_IDS[family]:
+            return PRESENT
+        if not any(device_id in ids for ids in FAMILY_DEVICE_IDS.values()):
+            result = UNKNOWN
+    return result
+
+
+def has_controller(family, cli_check, root=None):
+    """
+    Whether a controller of a family is installed, the answer is kept for
+    the lifetime of the process
+    :param family: FAMILY_MEGARAID or FAMILY_SAS3
+    :param cli_check: callable asking the cli, called when sysfs can not tell
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :return: bool
+    """
+    key = (family, root or SYSFS_ROOT)
+    with _lock:
+        if key not in _answers:
+            result = probe(family, root)
+            if result == UNKNOWN:
+                _answers[key] = bool(cli_check())
+            else:
+                _answers[key] = result == PRESENT
+        return _answers[key]
+
+
+def forget():
+    """Drop the remembered answers of has_controller"""
+    with _lock:
+        _answers.clear()
@@ -16,16 +16,62 @@
 
 import copy
 
+from oslo_log import log
+
 from megautils.raid.mega import Mega
 from megautils.raid import str2bool
 from megautils import exception
+from megautils.parser import Field, TableParser, to_int
+from megautils.record import RecordFacade, record_type
+from megautils.raid.cachecade import CacheCade
 from megautils.raid.virtual_driver import VirtualDriver
 from megautils.raid.physical_disk import PhysicalDisk
 
-class Adapter(object):
+LOG = log.getLogger(__name__)
+
+ADAPTER_PARSER = TableParser([
+    Field('Adapter', 'id', to_int),
+    Field('Product Name', 'product_name'),
+    Field('Serial No', 'serial_number'),
+    Field('FW Package Build', 'fw_package_build'),
+    Field('FW Version', 'fw_version'),
+    Field('BIOS Version', 'bios_version'),
+    Field('WebBIOS Version', 'webbios_version'),
+    Field('Preboot CLI Version', 'preboot_cli_version'),
+    Field('Boot Block Version', 'boot_block_version'),
+    Field('SAS Address', 'sas_address'),
+    Field('BBU', 'bbu_present', str2bool),
+    Field('Alarm', 'alarm_present', str2bool),
+    Field('NVRAM', 'nvram_present', str2bool),
+    Field('Serial Debugger', 'serial_debugger_present', str2bool),
+    Field('Flash', 'flash_present', str2bool),
+    Field('Memory Size', 'memory_size'),
+], start='Adapter')
+
+AdapterRecord = record_type('AdapterRecord', [
+    ('id', None),
+    ('product_name', ''),
+    ('serial_number', ''),
+    ('fw_package_build', ''),
+    ('fw_version', ''),
+    ('bios_version', ''),
+    ('webbios_version', ''),
+    ('preboot_cli_version', ''),
+    ('boot_block_version', ''),
+    ('sas_address', ''),
+    ('bbu_present', False),
+    ('alarm_present', False),
+    ('nvram_present', False),
+    ('serial_debugger_present', False),
+    ('flash_present', False),
+    ('memory_size', ''),
+])
+
+
+class Adapter(RecordFacade):
 
     def __init__(self, id=None):
-        self.id = id
+        self._record = AdapterRecord(id=id)
 
     def __flush__(self):
         if self.id == None:
@@ -34,7 +80,12 @@ class Adapter(object):
         cmd = '-AdpAllInfo -a%s' % self.id
 
         ret = self._get_client().command(cmd)
-        return self._handle(ret, multi_adapter=False)
+        adapter = self._handle(ret, multi_adapter=False)
+        if isinstance(adapter, list):
+            adapter = adapter[0] if adapter else None
+        if adapter is not None:
+            self._load(adapter._record)
+        return adapter
 
     def _get_client(self):
         return Mega()
@@ -47,60 +98,11 @@ class Adapter(object):
 
     def _handle(self, retstr, multi_adapter=True):
         adapters = []
-        for line in retstr.readlines():
+        for record in ADAPTER_PARSER.parse(
+                retstr, on_record=lambda values: AdapterRecord(**values)):
             if not multi_adapter and len(adapters) > 0:
                 return adapters[0]
-            if line.startswith('Adapter #'):
-                if self.id is not None:
-                    adapters.append(self.copy())
-                self.id = int(line[9:].strip())
-            elif line.startswith('Product Name'):
-                offset = line.find(':')
-                self.product_name = line[offset + 1:].strip()
-            elif line.startswith('Serial No'):
-                offset = line.find(':')
-                self.serial_number = line[offset + 1:].strip()
-            elif line.startswith('FW Package Build'):
-                offset = line.find(':')
-                self.fw_package_build = line[offset + 1:].strip()
-            elif line.startswith('FW Version'):
-                offset = line.find(':')
-                self.fw_version = line[offset + 1:].strip()
-            elif line.startswith('BIOS Version'):
-                offset = line.find(':')
-                self.bios_version = line[offset + 1:].strip()
-            elif line.startswith('WebBIOS Version'):
-                offset = line.find(':')
-                self.webbios_version = line[offset + 1:].strip()
-            elif line.startswith('Preboot CLI Version'):
-                offset = line.find(':')
-                self.preboot_cli_version = line[offset + 1:].strip()
-            elif line.startswith('Boot Block Version'):
-                offset = line.find(':')
-                self.boot_block_version = line[offset + 1:].strip()
-            elif line.startswith('SAS Address'):
-                offset = line.find(':')
-                self.sas_address = line[offset + 1:].strip()
-            elif line.startswith('BBU'):
-                offset = line.find(':')
-                self.bbu_present = str2bool(line[offset + 1:])
-            elif line.startswith('Alarm'):
-                offset = line.find(':')
-                self.alarm_present = str2bool(line[offset + 1:])
-            elif line.startswith('NVRAM'):
-                offset = line.find(':')
-                self.nvram_present = str2bool(line[offset + 1:])
-            elif line.startswith('Serial Debugger'):
-                offset = line.find(':')
-                self.serial_debugger_present = str2bool(line[offset + 1:])
-            elif line.startswith('Flash'):
-                offset = line.find(':')
-                self.flash_present = str2bool(line[offset + 1:])
-            elif line.startswith('Memory Size'):
-                offset = line.find(':')
-                self.memory_size = line[offset + 1:].strip()
-        if self.id is not None:
-            adapters.append(self.copy())
+            adapters.append(Adapter.from_record(record))
 
         return adapters
 
@@ -123,5 +125,37 @@ class Adapter(object):
         vds = VirtualDriver(adapter_id=self.id).getall_virtual_drivers()
         return vds
 
+    def destroy_virtual_drivers(self, virtual_drivers=None):
+        """
+        Delete virtual drivers of the adapter
+        :param virtual_drivers: virtual drivers to delete one by one, all
+                                CacheCade volumes and virtual drivers are
+                                deleted when not specified, the virtual
+                                drivers with a single megacli call
+        """
+        if self.id == None:
+            raise exception.InvalidParameterValue()
+
+        if virtual_drivers is None:
+            # CacheCade volumes hold their ssds and keep the virtual drivers
+            # they cache from being deleted, the bulk delete leaves them
+            for cachecade in CacheCade(
+                    adapter_id=self.id).get_cachecade_drivers():
+                cachecade.destroy()
+            try:
+                self._get_client().command('-CfgLdDel -LALL -Force -a%s' %
+                                           self.id)
+                return
+            except exception.MegaCLIError:
+                LOG.warning('bulk delete failed on adapter %s, deleting '
+                            'virtual drivers one by one' % self.id)
+            virtual_drivers = VirtualDriver(
+                adapter_id=self.id).getall_virtual_drivers()
+
+        for virtual_driver in virtual_drivers:
+            LOG.debug('deleting virtual driver %s of adapter %s' %
+                      (virtual_driver.id, self.id))
+            virtual_driver.destroy(flush=False)
+
     def copy(self):
         return copy.deepcopy(self)
\ No newline at end of file
@@ -0,0 +1,168 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""asyncio MegaCli client
+
+Runs megacli without blocking the event loop, at most `concurrency`
+commands per adapter at a time. A '-aALL' command touches every adapter,
+it waits until no other command runs and holds back new ones until it is
+done.
+
+Requires python 3.5 or later, tox leaves this module out of the python 2
+flake8 run.
+"""
+
+import asyncio
+import os
+import shlex
+
+from oslo_log import log
+
+from megautils import exception
+from megautils import instrumentation
+from megautils.cache import get_cache
+from megautils.raid import mega
+from megautils.raid.adapter import Adapter
+from megautils.raid.inventory import split_adapters
+from megautils.raid.physical_disk import PhysicalDisk
+from megautils.raid.virtual_driver import VirtualDriver
+
+LOG = log.getLogger(__name__)
+
+
+class AsyncMega(object):
+
+    def __init__(self, path=None, concurrency=1):
+        self.cli_path = path or mega.MEGACLI_PATH
+        self.concurrency = concurrency
+        # adapter id to number of running commands, 'ALL' included
+        self._running = {}
+        self._all_waiting = 0
+        self._condition = None
+
+        if not os.path.exists(self.cli_path):
+            raise exception.PathNotFound(
+                'path {0} not found'.format(self.cli_path))
+
+    def _can_run(self, adapter):
+        if self._running.get(mega.ALL_ADAPTERS):
+            return False
+        if adapter == mega.ALL_ADAPTERS:
+            return not any(self._running.values())
+        # a waiting '-aALL' command is not starved by new adapter commands
+        return not self._all_waiting and \
+            self._running.get(adapter, 0) < self.concurrency
+
+    async def _acquire(self, adapter):
+        if self._condition is None:
+            # created on first use, in the event loop running the commands
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            is_all = adapter == mega.ALL_ADAPTERS
+            if is_all:
+                self._all_waiting += 1
+            try:
+                await self._condition.wait_for(
+                    lambda: self._can_run(adapter))
+            finally:
+                if is_all:
+                    self._all_waiting -= 1
+            self._running[adapter] = self._running.get(adapter, 0) + 1
+
+    async def _release(self, adapter):
+        async with self._condition:
+            self._running[adapter] -= 1
+            self._condition.notify_all()
+
+    async def command(self, cmd):
+        """
+        Execute a megacli command
+        :param cmd: command string
+        :return: command output lines
+        """
+        verb, adapter = mega.parse_command(cmd)
+        cache = get_cache()
+        is_read = verb in mega.READ_COMMANDS
+        if is_read:
+            lines = cache.get(adapter, cmd)
+            if lines is not None:
+                LOG.debug("Using cached output of 'MegaCli64 %s'" % cmd)
+                if instrumentation.enabled:
+                    instrumentation.record_cache_hit('megacli',
+                                                     mega._verb(cmd))
+                return list(lines)
+        generation = cache.generation
+
+        await self._acquire(adapter)
+        try:
+            LOG.debug("Excuting megacli 'MegaCli64 %s'" % cmd)
+            if instrumentation.enabled:
+                start = instrumentation.timer()
+            proc = await asyncio.create_subprocess_exec(
+                self.cli_path, *(shlex.split(cmd) + ['-NoLog']),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE)
+            out, err = await proc.communicate()
+            if instrumentation.enabled:
+                instrumentation.record('megacli', mega._verb(cmd),
+                                       instrumentation.timer() - start,
+                                       len(out), proc.returncode)
+        finally:
+            await self._release(adapter)
+        if not is_read and not mega.is_progress_query(cmd):
+            cache.invalidate(adapter)
+
+        if proc.returncode:
+            LOG.error(err.decode('utf-8', 'replace'))
+            ex = exception.MegaCLIError("MegaCli execute error!")
+            ex.exitcode = proc.returncode
+            raise ex
+        lines = out.decode('utf-8', 'replace').splitlines(True)
+        if is_read:
+            cache.set(adapter, cmd, tuple(lines), generation)
+        return lines
+
+    async def get_adapters(self):
+        ret = await self.command('-AdpAllInfo -aALL')
+        return Adapter()._handle(ret)
+
+    async def get_physical_disks(self, adapter=None):
+        """
+        Get physical disks of an adapter
+        :param adapter: adapter id, None for all adapters
+        :return: physical disks
+        """
+        pd = PhysicalDisk(adapter=adapter)
+        ret = await self.command(pd._list_command())
+        if adapter is not None:
+            return pd._handle(ret)
+
+        # '-PdList -aALL' prints the disks of every adapter after its
+        # 'Adapter #N' line
+        pds = []
+        for adapter_id, lines in split_adapters(ret):
+            pds.extend(PhysicalDisk(adapter=adapter_id)._handle(lines))
+        return pds
+
+    async def getall_virtual_drivers(self, adapter):
+        """
+        Get all virtual drivers of an adapter
+        :param adapter: adapter id
+        :return: virtual drivers
+        """
+        if adapter is None:
+            raise exception.InvalidParameterValue()
+
+        ret = await self.command('-LdInfo -LALL -a%s' % adapter)
+        return VirtualDriver(adapter_id=adapter)._handle(ret, multi_vd=True)
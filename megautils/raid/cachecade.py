@@ -0,0 +1,147 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Raid CacheCade volume
+
+A CacheCade volume is built from ssds and caches the reads and optionally
+the writes of the hdd virtual drivers associated with it.
+"""
+
+import re
+
+from megautils.raid import mega
+from megautils import exception
+from megautils.parser import Field, TableParser
+from megautils.record import RecordFacade, record_type
+
+CACHECADE_RAID_LEVELS = (mega.RAID_0, mega.RAID_1)
+
+
+def _cachecade_id(value):
+    # '1 (Target Id: 1)'
+    return int(value.split('(', 1)[0].strip())
+
+
+def _target_ids(value):
+    # '0,2' or 'None'
+    return tuple(int(x) for x in value.strip().replace(' ', '').split(',')
+                 if x.isdigit())
+
+
+CACHECADE_PARSER = TableParser([
+    Field('CacheCade Virtual Drive', 'id', _cachecade_id),
+    Field('Name', 'name'),
+    Field('Cache Type', 'cache_type'),
+    Field('RAID Level', 'raid_level'),
+    Field('Size', 'size'),
+    Field('State', 'state'),
+    Field('Target Id of the Associated LDs', 'virtual_drivers', _target_ids),
+], start='CacheCade Virtual Drive')
+
+
+CacheCadeRecord = record_type('CacheCadeRecord', [
+    ('adapter', None),
+    ('id', None),
+    ('name', ''),
+    ('cache_type', ''),
+    ('raid_level', ''),
+    ('size', ''),
+    ('state', ''),
+    ('virtual_drivers', ()),
+])
+
+
+class CacheCade(RecordFacade):
+
+    def __init__(self, adapter_id=None, id=None):
+        self._record = CacheCadeRecord(adapter=adapter_id, id=id)
+
+    def _get_client(self):
+        return mega.Mega()
+
+    def _handle(self, retstr):
+        adapter = self.adapter
+        return [CacheCade.from_record(record) for record in
+                CACHECADE_PARSER.parse(
+                    retstr, on_record=lambda values: CacheCadeRecord(
+                        adapter=adapter, **values))]
+
+    def get_cachecade_drivers(self):
+        """
+        Get all CacheCade volumes of the adapter
+        :return: CacheCade volumes
+        """
+        if self.adapter is None:
+            raise exception.InvalidParameterValue()
+
+        cmd = '-CfgCacheCadeDsply -a%s' % self.adapter
+        ret = self._get_client().command(cmd)
+        return self._handle(ret)
+
+    def create(self, raid_level, disks, virtual_drivers=None,
+               write_policy=None):
+        """
+        Create a CacheCade volume
+        :param raid_level: '0' or '1'
+        :param disks: 'enclosure:slot' of the ssds
+        :param virtual_drivers: ids of the virtual drivers to cache
+        :param write_policy: 'WT' caches reads only, 'WB' writes as well
+        """
+        if self.adapter is None:
+            raise exception.InvalidParameterValue()
+        if raid_level not in CACHECADE_RAID_LEVELS:
+            raise exception.InvalidParameterValue(
+                'CacheCade raid level must be one of %s' %
+                ', '.join(CACHECADE_RAID_LEVELS))
+        if write_policy is not None and \
+                write_policy not in mega.WRITE_POLICIES:
+            raise exception.InvalidParameterValue(
+                '%s is not one of %s' %
+                (write_policy, ', '.join(mega.WRITE_POLICIES)))
+
+        disk_formater = re.compile(r'^[0-9]+:[0-9]+$')
+        for disk in disks:
+            if not re.match(disk_formater, disk):
+                raise exception.InvalidDiskFormater(disk=disk)
+
+        cmd = '-CfgCacheCadeAdd -r%s -Physdrv[%s]' % (raid_level,
+                                                      ','.join(disks))
+        if write_policy:
+            cmd += ' -%s' % write_policy
+        if virtual_drivers:
+            cmd += ' -assign -L%s' % ','.join(str(x)
+                                              for x in virtual_drivers)
+        cmd += ' -a%s' % self.adapter
+
+        ret = self._get_client().command(cmd)
+        self.id = None
+        for line in ret:
+            offset = line.find('Created VD')
+            if offset < 0:
+                continue
+            self.id = line[offset + 11:].strip()
+            break
+        if not self.id:
+            raise exception.MegaCLIError()
+
+    def destroy(self):
+        """
+        Delete this CacheCade volume, 'ALL' as id deletes every one
+        """
+        if self.adapter is None or self.id is None:
+            raise exception.InvalidParameterValue()
+
+        cmd = '-CfgCacheCadeDel -L%s -a%s' % (self.id, self.adapter)
+        self._get_client().command(cmd)
+        self.id = None
@@ -0,0 +1,209 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Controller performance profiles
+
+A profile is a dict of controller properties, either one of PROFILES or a
+custom one. Applying it reads the current values of all adapters with one
+'-AdpGetProp ... -aALL' per property and only sets the properties which
+differ.
+"""
+
+import re
+
+from megautils.raid.mega import Mega
+from megautils import exception
+from megautils import utils
+
+
+def _percent(value):
+    # '30%'
+    return int(value.strip().rstrip('%'))
+
+
+def _number(value):
+    # '4 Seconds'
+    return int(value.split()[0])
+
+
+def _enabled(value):
+    # 'NCQ is Enabled'
+    return 'enabled' in value.lower()
+
+
+class Property(object):
+    __slots__ = ('name', 'get', 'parse', 'set', 'valid')
+
+    def __init__(self, name, get, parse, set, valid):
+        """
+        :param name: name of the property in a profile
+        :param get: -AdpGetProp argument
+        :param parse: callable converting the printed value
+        :param set: callable building the -AdpSetProp arguments of a value
+        :param valid: callable validating a profile value
+        """
+        self.name = name
+        self.get = get
+        self.parse = parse
+        self.set = set
+        self.valid = valid
+
+
+def _is_int(value):
+    # True and False are ints too
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _rate(prop):
+    return Property(prop[0], prop[1], _percent,
+                    lambda value, name=prop[1]: '%s %d' % (name, value),
+                    lambda value: _is_int(value) and
+                    0 <= value <= 100)
+
+
+PROPERTIES = [_rate(prop) for prop in (('rebuild_rate', 'RebuildRate'),
+                                       ('cc_rate', 'CCRate'),
+                                       ('patrol_read_rate', 'PatrolReadRate'),
+                                       ('bgi_rate', 'BgiRate'),
+                                       ('reconstruction_rate', 'ReconRate'))]
+PROPERTIES += [
+    Property('cache_flush_interval', 'CacheFlushInterval', _number,
+             lambda value: 'CacheFlushInterval %d' % value,
+             lambda value: _is_int(value) and 0 <= value <= 255),
+    Property('ncq', 'NCQDsply', _enabled,
+             lambda value: 'NCQEnbl' if value else 'NCQDsbl',
+             lambda value: isinstance(value, bool)),
+    Property('spinup_drive_count', 'SpinupDriveCount', _number,
+             lambda value: 'SpinupDriveCount %d' % value,
+             lambda value: _is_int(value) and value > 0),
+    Property('spinup_delay', 'SpinupDelay', _number,
+             lambda value: 'SpinupDelay %d' % value,
+             lambda value: _is_int(value) and value >= 0),
+]
+PROPERTY_MAP = dict((prop.name, prop) for prop in PROPERTIES)
+
+PROFILES = {
+    # foreground io first, background tasks at a low rate
+    'throughput': {'rebuild_rate': 30,
+                   'cc_rate': 15,
+                   'patrol_read_rate': 15,
+                   'bgi_rate': 15,
+                   'reconstruction_rate': 30,
+                   'cache_flush_interval': 4,
+                   'ncq': True},
+    # shortest degraded window, at the cost of foreground io
+    'fast-rebuild': {'rebuild_rate': 90,
+                     'cc_rate': 30,
+                     'patrol_read_rate': 10,
+                     'bgi_rate': 30,
+                     'reconstruction_rate': 60,
+                     'ncq': True},
+}
+
+ADAPTER_VALUE = re.compile(r'^\s*Adapter\s*(\d+)\s*:\s*(.*)$')
+
+
+def get_profile(profile):
+    """
+    Get and validate a profile
+    :param profile: name of one of PROFILES or a property dict
+    :return: property dict
+    """
+    if not isinstance(profile, dict):
+        if profile not in PROFILES:
+            raise exception.InvalidParameterValue(
+                'unknown controller profile %s, known are %s' %
+                (profile, ', '.join(sorted(PROFILES))))
+        profile = PROFILES[profile]
+    for name, value in profile.items():
+        prop = PROPERTY_MAP.get(name)
+        if prop is None:
+            raise exception.InvalidParameterValue(
+                'unknown controller property %s' % name)
+        if not prop.valid(value):
+            raise exception.InvalidParameterValue(
+                'invalid value %s of controller property %s' % (value, name))
+    return profile
+
+
+def _parse_values(prop, lines):
+    values = {}
+    for line in lines:
+        match = ADAPTER_VALUE.match(line)
+        if not match:
+            continue
+        value = match.group(2)
+        if '=' in value:
+            value = value.split('=', 1)[1]
+        values[int(match.group(1))] = prop.parse(value)
+    return values
+
+
+class ControllerProfile(object):
+
+    def __init__(self, profile):
+        """
+        :param profile: name of one of PROFILES or a property dict
+        """
+        self.profile = get_profile(profile)
+
+    def _get_client(self):
+        return Mega()
+
+    def current(self):
+        """
+        Read the properties of the profile from all adapters
+        :return: dict of adapter id to property dict
+        """
+        current = {}
+        for name in sorted(self.profile):
+            prop = PROPERTY_MAP[name]
+            ret = self._get_client().command('-AdpGetProp %s -aALL' %
+                                             prop.get)
+            for adapter, value in _parse_values(prop, ret).items():
+                current.setdefault(adapter, {})[name] = value
+        return current
+
+    def diff(self, current=None):
+        """
+        Get the properties which differ from the profile
+        :param current: result of current()
+        :return: dict of adapter id to property dict of the new values
+        """
+        if current is None:
+            current = self.current()
+        changes = {}
+        for adapter, values in current.items():
+            changed = dict((name, value)
+                           for name, value in self.profile.items()
+                           if values.get(name) != value)
+            if changed:
+                changes[adapter] = changed
+        return changes
+
+    def _set(self, adapter, changes):
+        for name in sorted(changes):
+            self._get_client().command('-AdpSetProp %s -a%s' % (
+                PROPERTY_MAP[name].set(changes[name]), adapter))
+
+    def apply(self, workers=utils.DEFAULT_WORKERS):
+        """
+        Set the properties which differ, adapters are handled in parallel
+        :return: dict of adapter id to the properties set
+        """
+        changes = self.diff()
+        utils.map_controllers(
+            lambda adapter: self._set(adapter, changes[adapter]),
+            sorted(changes), workers)
+        return changes
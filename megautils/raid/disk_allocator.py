@@ -12,40 +12,64 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
+
 from oslo_log import log
 
 from megautils.raid import mega
 from megautils.exception import PhysicalDisksNotFoundError
-from megautils.raid.adapter import Adapter
+from megautils.raid.physical_disk import PhysicalDisk
 
 LOG = log.getLogger(__name__)
 
+# number of disks holding data for a raid level and a disk count
+DATA_DISKS = {mega.RAID_0: lambda n: n,
+              mega.RAID_1: lambda n: max(n // 2, 1),
+              mega.RAID_5: lambda n: n - 1,
+              mega.RAID_6: lambda n: n - 2,
+              mega.RAID_10: lambda n: n // 2,
+              mega.RAID_50: lambda n: n - n // 3,
+              mega.RAID_60: lambda n: n - 2 * (n // 4)}
 
-def allocate_disks(adapter_id, virtual_driver_config):
+# type assignments tried by the joint allocator before giving up
+MAX_SEARCH_STEPS = 10000
+
+PLACEMENT_SEQUENTIAL = 'sequential'
+PLACEMENT_BALANCED = 'balanced'
+
+
+def _requirements(virtual_driver_config):
     """
-    Allocate physical disks to a virtual driver
-    :param adapter: physical disk should be managed with adapter
-    :param virtual_driver_config: virtual driver 
-    :return: 
+    Get what the disks of a virtual driver must satisfy
+    :param virtual_driver_config: virtual driver
+    :return: (size in GB every disk must hold, number of disks) tuple
     """
-    adapter = Adapter(id=adapter_id)
-    size_gb = 1 if virtual_driver_config['size_gb'] == 'MAX' \
-        else virtual_driver_config['size_gb']
-    raid_level = virtual_driver_config['raid_level']
     number_of_physical_disks = virtual_driver_config.get(
-        'number_of_physical_disks', mega.RAID_LEVEL_MIN_DISKS[raid_level])
+        'number_of_physical_disks',
+        mega.RAID_LEVEL_MIN_DISKS[virtual_driver_config['raid_level']])
+    return (disk_size_gb(virtual_driver_config, number_of_physical_disks),
+            number_of_physical_disks)
+
+
+def _preferred_type(virtual_driver_config):
     disk_type = virtual_driver_config.get('disk_type', None)
-    avail_physical_disks = [x for x in adapter.get_physical_drivers()
-                            if 'Online' not in x.firmware_state
-                            and x.raw_size >= size_gb]
+    if (not disk_type and virtual_driver_config.get('is_root_volume', False))\
+            or disk_type == mega.DISK_TYPE_SSD:
+        return mega.DISK_TYPE_SSD
+    return mega.DISK_TYPE_HDD
 
-    # hdd and ssd should be split manually cause a raid must stand with same disk type
-    avail_ssd_physical_disks = [x for x in avail_physical_disks
-                                if _get_disk_type(x.media_type)
-                                    == mega.DISK_TYPE_SSD]
-    avail_hdd_physical_disks = [x for x in avail_physical_disks
-                                if _get_disk_type(x.media_type)
-                                    == mega.DISK_TYPE_HDD]
+
+def _choose_disks(avail_physical_disks, virtual_driver_config):
+    """
+    Choose the physical disks of a virtual driver among available ones
+    :param avail_physical_disks: dict of disk type to available disks
+    :param virtual_driver_config: virtual driver
+    :return: chosen physical disks
+    """
+    size_gb, number_of_physical_disks = _requirements(virtual_driver_config)
+    disk_type = virtual_driver_config.get('disk_type', None)
+    avail_ssd_physical_disks = avail_physical_disks[mega.DISK_TYPE_SSD]
+    avail_hdd_physical_disks = avail_physical_disks[mega.DISK_TYPE_HDD]
 
     LOG.info('there are %d ssd and %d hdd available' %
              (len(avail_ssd_physical_disks), len(avail_hdd_physical_disks)))
@@ -69,12 +93,262 @@ def allocate_disks(adapter_id, virtual_driver_config):
         target_physical_disks = avail_hdd_physical_disks
     if not target_physical_disks:
         raise PhysicalDisksNotFoundError()
+    return target_physical_disks[:number_of_physical_disks]
+
+
+def _is_available(pd, size_gb):
+    return 'Online' not in pd.firmware_state and pd.raw_size >= size_gb
+
+
+def select_disks(physical_disks, virtual_driver_config, used=()):
+    """
+    Select physical disks of a virtual driver, without querying the adapter
+    :param physical_disks: physical disks of the adapter
+    :param virtual_driver_config: virtual driver
+    :param used: 'enclosure:slot' of disks already taken by other virtual
+                 drivers
+    :return: chosen physical disks
+    """
+    size_gb, _ = _requirements(virtual_driver_config)
+    avail_physical_disks = {mega.DISK_TYPE_SSD: [], mega.DISK_TYPE_HDD: []}
+    for pd in physical_disks:
+        if not _is_available(pd, size_gb) or \
+                '%s:%s' % (pd.enclosure, pd.slot) in used:
+            continue
+        avail_physical_disks[_get_disk_type(pd.media_type)].append(pd)
+    return _choose_disks(avail_physical_disks, virtual_driver_config)
+
+
+def allocate_disks(adapter_id, virtual_driver_config):
+    """
+    Allocate physical disks to a virtual driver
+    :param adapter: physical disk should be managed with adapter
+    :param virtual_driver_config: virtual driver 
+    :return: 
+    """
+    size_gb, number_of_physical_disks = _requirements(virtual_driver_config)
+    preferred_type = _preferred_type(virtual_driver_config)
+
+    # hdd and ssd should be split manually cause a raid must stand with same disk type
+    avail_physical_disks = {mega.DISK_TYPE_SSD: [], mega.DISK_TYPE_HDD: []}
+
+    # stop reading megacli output as soon as the preferred type is satisfied
+    pds = PhysicalDisk(adapter=adapter_id).iter_physical_disks()
+    try:
+        for pd in pds:
+            if not _is_available(pd, size_gb):
+                continue
+            avail_physical_disks[_get_disk_type(pd.media_type)].append(pd)
+            if len(avail_physical_disks[preferred_type]) >= \
+                    number_of_physical_disks:
+                break
+    finally:
+        pds.close()
+
+    target_physical_disks = _choose_disks(avail_physical_disks,
+                                          virtual_driver_config)
     virtual_driver_config['physical_disks'] = \
-        ["%s:%s" % (x.enclosure, x.slot)
-            for x in target_physical_disks][:number_of_physical_disks]
+        ["%s:%s" % (x.enclosure, x.slot) for x in target_physical_disks]
     LOG.debug('physical driver raid schema created: %s' %
               virtual_driver_config['physical_disks'])
 
 
 def _get_disk_type(interface):
-    return mega.DISK_TYPE_MAP[interface]
\ No newline at end of file
+    return mega.DISK_TYPE_MAP[interface]
+
+
+class DiskIndex(object):
+    """Available physical disks of an adapter sorted by size per disk type"""
+
+    def __init__(self, physical_disks, used=()):
+        """
+        :param physical_disks: physical disks of the adapter
+        :param used: 'enclosure:slot' of disks which are not available
+        """
+        self._keys = {mega.DISK_TYPE_SSD: [], mega.DISK_TYPE_HDD: []}
+        self._disks = {mega.DISK_TYPE_SSD: [], mega.DISK_TYPE_HDD: []}
+        entries = []
+        for sequence, pd in enumerate(physical_disks):
+            if 'Online' in pd.firmware_state or \
+                    '%s:%s' % (pd.enclosure, pd.slot) in used:
+                continue
+            entries.append(((pd.raw_size, sequence), pd))
+        for key, pd in sorted(entries, key=lambda entry: entry[0]):
+            disk_type = _get_disk_type(pd.media_type)
+            self._keys[disk_type].append(key)
+            self._disks[disk_type].append(pd)
+
+    def count(self, disk_type, size_gb=0):
+        """
+        :return: number of available disks of a type holding size_gb
+        """
+        keys = self._keys[disk_type]
+        return len(keys) - bisect.bisect_left(keys, (size_gb,))
+
+    def take(self, disk_type, size_gb, number, largest=False,
+             balanced=False):
+        """
+        Take the smallest disks of a type holding size_gb
+        :param disk_type: disk type
+        :param size_gb: minimal disk size
+        :param number: number of disks
+        :param largest: take the largest disks instead
+        :param balanced: spread the disks across enclosures and connected
+                         ports, see balance_disks
+        :return: list of (key, physical disk), None when not enough disks
+        """
+        keys = self._keys[disk_type]
+        disks = self._disks[disk_type]
+        start = bisect.bisect_left(keys, (size_gb,))
+        if len(keys) - start < number:
+            return None
+        if balanced:
+            offsets = list(range(start, len(keys)))
+            if largest:
+                offsets.reverse()
+            offsets = balance_disks(offsets, number,
+                                    domain=lambda o: _domain(disks[o]))
+            taken = [(keys[o], disks[o]) for o in offsets]
+            for offset in sorted(offsets, reverse=True):
+                del keys[offset]
+                del disks[offset]
+            return taken
+        if largest:
+            start = len(keys) - number
+        taken = list(zip(keys[start:start + number],
+                         disks[start:start + number]))
+        del keys[start:start + number]
+        del disks[start:start + number]
+        return taken
+
+    def put_back(self, disk_type, taken):
+        keys = self._keys[disk_type]
+        disks = self._disks[disk_type]
+        for key, pd in taken:
+            offset = bisect.bisect_left(keys, key)
+            keys.insert(offset, key)
+            disks.insert(offset, pd)
+
+
+def _domain(pd):
+    # '1(path0) ' -> '1', disks behind one wide port share its bandwidth
+    port = str(pd.connected_port_number).split('(', 1)[0].strip()
+    return pd.enclosure, port
+
+
+def _natural(value):
+    value = str(value)
+    return (0, int(value), '') if value.isdigit() else (1, 0, value)
+
+
+def balance_disks(candidates, number, domain=_domain):
+    """
+    Pick disks round robin across enclosures and connected ports
+    Consecutive disks come from different enclosures and ports when the
+    topology allows it, so the mirrors and spans create() builds from
+    consecutive disks do not share a wide port.
+    :param candidates: disks in order of preference
+    :param number: number of disks to pick
+    :param domain: callable returning the (enclosure, port) of a disk
+    :return: picked disks in placement order
+    """
+    groups = {}
+    for candidate in candidates:
+        groups.setdefault(domain(candidate), []).append(candidate)
+    # interleave enclosures first: (8, 0), (9, 2), (8, 1), (9, 3)
+    rank = {}
+    order = []
+    for key in sorted(groups, key=lambda key: (_natural(key[0]),
+                                               _natural(key[1]))):
+        position = rank.get(key[0], 0)
+        rank[key[0]] = position + 1
+        order.append(((position, _natural(key[0])), key))
+    queues = [groups[key] for _, key in
+              sorted(order, key=lambda entry: entry[0])]
+
+    picked = []
+    while len(picked) < number and queues:
+        for queue in list(queues):
+            picked.append(queue.pop(0))
+            if not queue:
+                queues.remove(queue)
+            if len(picked) == number:
+                break
+    return picked
+
+
+def _candidate_types(virtual_driver_config):
+    # same preferences as _choose_disks, hdd volumes may fall back to ssd
+    disk_type = virtual_driver_config.get('disk_type', None)
+    if disk_type:
+        return [disk_type]
+    if virtual_driver_config.get('is_root_volume', False):
+        return [mega.DISK_TYPE_SSD]
+    return [mega.DISK_TYPE_HDD, mega.DISK_TYPE_SSD]
+
+
+def disk_size_gb(virtual_driver_config, number_of_physical_disks):
+    """
+    Get the capacity every disk of a virtual driver must hold
+    :param virtual_driver_config: virtual driver
+    :param number_of_physical_disks: number of disks of the virtual driver
+    :return: size in GB, 0 for 'MAX'
+    """
+    if virtual_driver_config['size_gb'] == 'MAX':
+        return 0
+    data_disks = DATA_DISKS[virtual_driver_config['raid_level']](
+        number_of_physical_disks)
+    return virtual_driver_config['size_gb'] / float(max(data_disks, 1))
+
+
+def allocate_jointly(physical_disks, virtual_driver_configs, used=()):
+    """
+    Allocate physical disks to several virtual drivers of an adapter at once
+    Virtual drivers needing the largest disks choose first and take the
+    smallest disks big enough for them, 'MAX' virtual drivers take the
+    largest disks left. When a virtual driver may use either disk type the
+    alternatives are searched until every virtual driver is satisfied.
+    Virtual drivers with placement 'balanced' spread their disks across
+    enclosures and connected ports.
+    :param physical_disks: physical disks of the adapter
+    :param virtual_driver_configs: virtual drivers without physical disks
+    :param used: 'enclosure:slot' of disks already taken
+    :return: list of chosen physical disks, in virtual_driver_configs order
+    """
+    index = DiskIndex(physical_disks, used)
+    requests = []
+    for position, config in enumerate(virtual_driver_configs):
+        size_gb, number = _requirements(config)
+        requests.append((position, config, number, size_gb))
+    # 'MAX' last, then the largest disks and the fewest alternatives first
+    requests.sort(key=lambda request: (
+        request[1]['size_gb'] == 'MAX', -request[3],
+        len(_candidate_types(request[1])), request[0]))
+
+    chosen = [None] * len(requests)
+    steps = [0]
+
+    def solve(offset):
+        if offset == len(requests):
+            return True
+        position, config, number, size_gb = requests[offset]
+        for disk_type in _candidate_types(config):
+            steps[0] += 1
+            if steps[0] > MAX_SEARCH_STEPS:
+                return False
+            taken = index.take(
+                disk_type, size_gb, number,
+                largest=config['size_gb'] == 'MAX',
+                balanced=config.get('placement') == PLACEMENT_BALANCED)
+            if taken is None:
+                continue
+            chosen[position] = [pd for _, pd in taken]
+            if solve(offset + 1):
+                return True
+            index.put_back(disk_type, taken)
+            chosen[position] = None
+        return False
+
+    if not solve(0):
+        raise PhysicalDisksNotFoundError()
+    return chosen
@@ -0,0 +1,144 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Virtual driver initialization
+
+Starts the initialization of a virtual driver and returns a handle whose
+progress is read from the controller, so several virtual drivers can
+initialize at the same time.
+"""
+
+import time
+
+from megautils import exception
+from megautils.raid import operations
+
+INIT_NONE = 'none'
+INIT_FAST = 'fast'
+INIT_FULL = 'full'
+INIT_BACKGROUND = 'background'
+INIT_MODES = (INIT_NONE, INIT_FAST, INIT_FULL, INIT_BACKGROUND)
+
+# seconds between two progress queries of wait()
+POLL_INTERVAL = 10
+
+
+def parse_progress(lines):
+    """
+    Parse the output of a '-ShowProg' query of a single virtual driver
+    :param lines: output lines like 'Initialization on VD #0 (target id
+                  #0) Completed 24% in 1 Minutes.'
+    :return: completed percent, 100 when the controller reports the
+             operation not in progress, None when the output has no
+             progress line
+    """
+    for _, percent in operations.parse_progress(lines):
+        return 100 if percent is None else percent
+    return None
+
+
+class InitHandle(object):
+    """Initialization of a virtual driver running on the controller"""
+
+    def __init__(self, virtual_driver, mode):
+        """
+        :param virtual_driver: initializing VirtualDriver
+        :param mode: one of INIT_MODES, None for the controller default
+        """
+        self.virtual_driver = virtual_driver
+        self.mode = mode
+        self._done = mode in (None, INIT_NONE)
+
+    def _query(self):
+        if self.mode == INIT_BACKGROUND:
+            return '-LDBI -ShowProg -L%s -a%s'
+        return '-LDInit -ShowProg -L%s -a%s'
+
+    def start(self):
+        """
+        Start the initialization, returns as soon as the controller took it
+        :return: self
+        """
+        vd = self.virtual_driver
+        if self.mode == INIT_NONE:
+            # keep the controller from starting a background init by itself
+            cmd = '-LDBI -Dsbl -L%s -a%s'
+        elif self.mode == INIT_FAST:
+            cmd = '-LDInit -Start -L%s -a%s'
+        elif self.mode == INIT_FULL:
+            cmd = '-LDInit -Start -full -L%s -a%s'
+        elif self.mode == INIT_BACKGROUND:
+            cmd = '-LDBI -Enbl -L%s -a%s'
+        elif self.mode is None:
+            return self
+        else:
+            raise exception.InvalidParameterValue(
+                'init mode must be one of %s' % ', '.join(INIT_MODES))
+        vd._get_client().command(cmd % (vd.id, vd.adapter))
+        return self
+
+    def progress(self):
+        """
+        Get the completed percent of the initialization
+        :return: 0 to 100
+        """
+        if self._done:
+            return 100
+        vd = self.virtual_driver
+        ret = vd._get_client().command(self._query() % (vd.id, vd.adapter))
+        percent = parse_progress(ret)
+        if percent is None:
+            # nothing reported, e.g. the controller did not start it yet
+            return 0
+        if percent >= 100:
+            self._done = True
+        return percent
+
+    def done(self):
+        return self.progress() >= 100
+
+    def wait(self, timeout=None, interval=POLL_INTERVAL):
+        """
+        Wait for the initialization to complete
+        :param timeout: seconds, None waits forever
+        :param interval: seconds between two progress queries
+        :return: True when completed, False on timeout
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.done():
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(interval if deadline is None else
+                       max(0, min(interval, deadline - time.time())))
+        return True
+
+
+def wait_all(handles, timeout=None, interval=POLL_INTERVAL):
+    """
+    Wait for several initializations to complete
+    :param handles: InitHandle list
+    :param timeout: seconds, None waits forever
+    :param interval: seconds between two rounds of progress queries
+    :return: True when all completed, False on timeout
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    pending = list(handles)
+    while True:
+        pending = [handle for handle in pending if not handle.done()]
+        if not pending:
+            return True
+        if deadline is not None and time.time() >= deadline:
+            return False
+        time.sleep(interval if deadline is None else
+                   max(0, min(interval, deadline - time.time())))
@@ -0,0 +1,177 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Raid inventory
+
+Collects adapters, physical disks, virtual drivers and the virtual driver
+to physical disk mapping of every adapter with one MegaCli call per kind,
+instead of one call per adapter. The SMART data of the physical disks comes
+from smartctl, see megautils.smart.
+"""
+
+from megautils import smart
+from megautils.raid.mega import Mega
+from megautils.raid.adapter import Adapter
+from megautils.raid.physical_disk import PhysicalDisk
+from megautils.raid.virtual_driver import VirtualDriver
+
+
+def split_adapters(retstr):
+    """
+    Split a '-aALL' output into per adapter blocks
+    :param retstr: megacli output lines
+    :return: list of (adapter id, lines) tuples in output order
+    """
+    blocks = []
+    lines = None
+    for line in retstr:
+        if line.startswith('Adapter #'):
+            lines = []
+            blocks.append((int(line[9:].strip()), lines))
+        elif lines is not None:
+            lines.append(line)
+    return blocks
+
+
+def _handle_members(lines):
+    """
+    Get physical disks of every virtual driver from '-LdPdInfo' output
+    :param lines: '-LdPdInfo' output lines of one adapter
+    :return: dict of virtual driver id to 'enclosure:slot' list
+    """
+    members = {}
+    vd_id = None
+    enclosure = None
+    for line in lines:
+        if line.startswith('Virtual Drive'):
+            delim = line.find('(')
+            offset = line.find(':')
+            vd_id = int(line[offset + 1:delim].strip())
+            members[vd_id] = []
+        elif line.startswith('Enclosure Device ID'):
+            offset = line.find(':')
+            enclosure = line[offset + 1:].strip()
+        elif line.startswith('Slot Number') and vd_id is not None:
+            offset = line.find(':')
+            members[vd_id].append(
+                '%s:%s' % (enclosure, line[offset + 1:].strip()))
+    return members
+
+
+class Inventory(object):
+
+    def __init__(self):
+        self.adapters = []
+        self.physical_disks = {}
+        self.virtual_drivers = {}
+        self.members = {}
+        self.health = {}
+
+    def _get_client(self):
+        return Mega()
+
+    def collect_adapters(self):
+        """
+        Get all adapters with a single '-AdpAllInfo -aALL'
+        :return: adapters
+        """
+        ret = self._get_client().command('-AdpAllInfo -aALL')
+        self.adapters = Adapter()._handle(ret)
+        return self.adapters
+
+    def collect_physical_disks(self):
+        """
+        Get physical disks of all adapters with a single '-PdList -aALL'
+        :return: dict of adapter id to physical disks
+        """
+        ret = self._get_client().command('-PdList -aALL')
+        self.physical_disks = {}
+        for adapter_id, lines in split_adapters(ret):
+            self.physical_disks[adapter_id] = \
+                PhysicalDisk(adapter=adapter_id)._handle(lines)
+        return self.physical_disks
+
+    def collect_virtual_drivers(self):
+        """
+        Get virtual drivers of all adapters and their physical disks with
+        a single '-LdPdInfo -aALL'
+        :return: dict of adapter id to virtual drivers
+        """
+        ret = self._get_client().command('-LdPdInfo -aALL')
+        self.virtual_drivers = {}
+        self.members = {}
+        for adapter_id, lines in split_adapters(ret):
+            self.virtual_drivers[adapter_id] = \
+                VirtualDriver(adapter_id=adapter_id)._handle(lines,
+                                                             multi_vd=True)
+            self.members[adapter_id] = _handle_members(lines)
+        return self.virtual_drivers
+
+    def collect_health(self, workers=smart.DEFAULT_WORKERS):
+        """
+        Read the SMART data of the physical disks of all adapters, one
+        smartctl call per disk on at most workers threads. The physical
+        disks must be collected first.
+        :param workers: maximum number of concurrent smartctl calls
+        :return: dict of (adapter id, 'enclosure:slot') to health dict
+        """
+        targets = []
+        for adapter_id in sorted(self.physical_disks):
+            targets.extend(smart.megaraid_targets(
+                adapter_id, self.physical_disks[adapter_id]))
+        self.health = smart.collect(targets, workers)
+        return self.health
+
+    def collect(self):
+        """
+        Collect the whole inventory, three megacli calls in total
+        :return: self
+        """
+        self.collect_adapters()
+        self.collect_physical_disks()
+        self.collect_virtual_drivers()
+        return self
+
+    def get_physical_drivers(self, adapter_id):
+        return self.physical_disks.get(adapter_id, [])
+
+    def get_virtual_drivers(self, adapter_id):
+        return self.virtual_drivers.get(adapter_id, [])
+
+    def get_members(self, adapter_id, vd_id):
+        """
+        Get physical disks of a virtual driver
+        :param adapter_id: adapter id
+        :param vd_id: virtual driver id
+        :return: 'enclosure:slot' list
+        """
+        return self.members.get(adapter_id, {}).get(vd_id, [])
+
+    def get_health(self, adapter_id, pd):
+        """
+        Get the SMART data of a physical disk
+        :param adapter_id: adapter id
+        :param pd: physical disk
+        :return: health dict, None when it was not collected
+        """
+        return self.health.get(smart.disk_key(adapter_id, pd.enclosure,
+                                              pd.slot))
+
+    def all_physical_disks(self):
+        return [pd for adapter_id in sorted(self.physical_disks)
+                for pd in self.physical_disks[adapter_id]]
+
+    def all_virtual_drivers(self):
+        return [vd for adapter_id in sorted(self.virtual_drivers)
+                for vd in self.virtual_drivers[adapter_id]]
@@ -15,11 +15,15 @@
 import os
 import re
 import subprocess
+import tempfile
 
 from oslo_log import log
 from megautils import exception
+from megautils import instrumentation
+from megautils.cache import get_cache
 
-MEGACLI_PATH = '/opt/MegaRAID/MegaCli/MegaCli64'
+MEGACLI_PATH = os.environ.get('MEGAUTILS_MEGACLI_PATH',
+                              '/opt/MegaRAID/MegaCli/MegaCli64')
 LOG = log.getLogger()
 
 RAID_0 = '0'
@@ -44,6 +48,26 @@ DISK_TYPE_SSD = 'ssd'
 DISK_TYPE_MAP = {'Hard Disk Device': DISK_TYPE_HDD,
                  'Solid State Device': DISK_TYPE_SSD}
 
+WRITE_POLICIES = ('WT', 'WB')
+READ_POLICIES = ('NORA', 'RA', 'ADRA')
+IO_POLICIES = ('Direct', 'Cached')
+STRIPE_SIZES_KB = (8, 16, 32, 64, 128, 256, 512, 1024)
+
+DISK_CACHE_ENABLE = 'enable'
+DISK_CACHE_DISABLE = 'disable'
+DISK_CACHE_DEFAULT = 'default'
+
+# virtual driver policies chosen from the media type of the members
+DEFAULT_POLICIES = {
+    DISK_TYPE_SSD: {'write_policy': 'WT',
+                    'read_policy': 'NORA',
+                    'io_policy': 'Direct'},
+    DISK_TYPE_HDD: {'write_policy': 'WB',
+                    'read_policy': 'RA',
+                    'io_policy': 'Direct',
+                    'stripe_size_kb': 256},
+}
+
 RAID_LEVEL_INPUT_MAPPING = {
     '0': '0',
     '1': '1',
@@ -54,6 +78,43 @@ RAID_LEVEL_INPUT_MAPPING = {
     '6+0': '60'
 }
 
+# Commands which do not change the controller state, their output is cached.
+# MegaCli options are case insensitive, verbs are compared lower cased.
+READ_COMMANDS = ('-adpallinfo', '-adpcount', '-adpgetprop',
+                 '-cfgcachecadedsply', '-cfgdsply', '-encinfo', '-ldinfo',
+                 '-ldpdinfo', '-pdinfo', '-pdlist')
+
+ADAPTER_PATTERN = re.compile(r'-a(\d+|ALL)\s*$', re.IGNORECASE)
+# adapter of commands run against every adapter, or against none
+ALL_ADAPTERS = 'ALL'
+
+# progress queries of running operations, their output changes every call so
+# it is not cached, and they do not change the controller state
+PROGRESS_PATTERN = re.compile(r'\s-ShowProg\b', re.IGNORECASE)
+
+
+def parse_command(cmd):
+    """
+    Get the verb and the target adapter of a megacli command
+    :param cmd: command string
+    :return: (verb, adapter) tuple, verb is lower cased and adapter is
+             'ALL' when not specified
+    """
+    verb = cmd.split(None, 1)[0].lower() if cmd.strip() else ''
+    match = ADAPTER_PATTERN.search(cmd)
+    adapter = match.group(1).upper() if match else ALL_ADAPTERS
+    return verb, adapter
+
+
+def is_progress_query(cmd):
+    return PROGRESS_PATTERN.search(cmd) is not None
+
+
+def _verb(cmd):
+    # verb as written, instrumentation reports '-PdList' rather than '-pdlist'
+    return cmd.split(None, 1)[0] if cmd.strip() else ''
+
+
 class Mega(object):
 
     def __init__(self, path=MEGACLI_PATH):
@@ -66,21 +127,99 @@ class Mega(object):
         """
         Execute a megacli command
         :param cmd: command string 
-        :return: command output
+        :return: command output lines
         """
+        verb, adapter = parse_command(cmd)
+        cache = get_cache()
+        is_read = verb in READ_COMMANDS
+        if is_read:
+            lines = cache.get(adapter, cmd)
+            if lines is not None:
+                LOG.debug("Using cached output of 'MegaCli64 %s'" % cmd)
+                if instrumentation.enabled:
+                    instrumentation.record_cache_hit('megacli', _verb(cmd))
+                return list(lines)
+        generation = cache.generation
+        mutating = not is_read and not is_progress_query(cmd)
+
         LOG.debug("Excuting megacli 'MegaCli64 %s' "% cmd)
-        proc = subprocess.Popen("{0} {1} -NoLog".
+        if instrumentation.enabled:
+            start = instrumentation.timer()
+        proc = self._spawn(cmd, subprocess.PIPE)
+        out, err = proc.communicate()
+        if instrumentation.enabled:
+            instrumentation.record('megacli', _verb(cmd),
+                                   instrumentation.timer() - start,
+                                   len(out), proc.returncode)
+        if mutating:
+            cache.invalidate(adapter)
+
+        if proc.returncode:
+            self._raise(proc.returncode, err)
+        lines = out.splitlines(True)
+        if is_read:
+            cache.set(adapter, cmd, tuple(lines), generation)
+        return lines
+
+    def stream(self, cmd):
+        """
+        Execute a megacli command and yield its output lines while it runs
+        Closing the generator early kills and reaps the megacli process.
+        :param cmd: command string
+        :return: generator of output lines
+        """
+        verb, adapter = parse_command(cmd)
+        is_read = verb in READ_COMMANDS
+        if is_read:
+            lines = get_cache().get(adapter, cmd)
+            if lines is not None:
+                LOG.debug("Using cached output of 'MegaCli64 %s'" % cmd)
+                if instrumentation.enabled:
+                    instrumentation.record_cache_hit('megacli', _verb(cmd))
+                for line in lines:
+                    yield line
+                return
+
+        LOG.debug("Streaming megacli 'MegaCli64 %s'" % cmd)
+        errfile = tempfile.TemporaryFile(mode='w+')
+        if instrumentation.enabled:
+            start = instrumentation.timer()
+        proc = self._spawn(cmd, errfile)
+        finished = False
+        output_bytes = 0
+        try:
+            for line in iter(proc.stdout.readline, ''):
+                output_bytes += len(line)
+                yield line
+            finished = True
+        finally:
+            proc.stdout.close()
+            if not finished and proc.poll() is None:
+                proc.kill()
+            proc.wait()
+            if instrumentation.enabled:
+                instrumentation.record('megacli', _verb(cmd),
+                                       instrumentation.timer() - start,
+                                       output_bytes, proc.returncode)
+            if not is_read and not is_progress_query(cmd):
+                get_cache().invalidate(adapter)
+            errfile.seek(0)
+            err = errfile.read()
+            errfile.close()
+
+        if proc.returncode:
+            self._raise(proc.returncode, err)
+
+    def _spawn(self, cmd, stderr):
+        return subprocess.Popen("{0} {1} -NoLog".
                                 format(self.cli_path, cmd),
                                 shell=True,
                                 stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE)
-        out = proc.stdout
-
-        if proc.returncode:
-            err = proc.stderr
-            LOG.error(err)
-            ex = exception.MegaCLIError("MegaCli execute error!")
-            ex.exitcode = proc.returncode
-            raise ex
-        return out
+                                stderr=stderr,
+                                universal_newlines=True)
 
+    def _raise(self, returncode, err):
+        LOG.error(err)
+        ex = exception.MegaCLIError("MegaCli execute error!")
+        ex.exitcode = returncode
+        raise ex
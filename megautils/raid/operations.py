@@ -0,0 +1,322 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tracker of long running controller operations
+
+Rebuilds, consistency checks, initializations and disk clears run on the
+controller after the command starting them returned. The tracker finds them
+on every adapter and polls their progress in a single loop, with one
+'-ShowProg' query per adapter and operation kind. The poll interval follows
+the progress rate: fast operations are polled often, slow ones rarely.
+"""
+
+import re
+import time
+
+from oslo_log import log
+
+from megautils import exception
+from megautils.raid.mega import Mega
+
+LOG = log.getLogger(__name__)
+
+REBUILD = 'rebuild'
+CLEAR = 'clear'
+CONSISTENCY_CHECK = 'consistency_check'
+BACKGROUND_INIT = 'background_init'
+INIT = 'init'
+
+# progress query of every virtual driver or physical disk of an adapter
+LD_QUERIES = {CONSISTENCY_CHECK: '-LDCC -ShowProg -LALL -a%s',
+              BACKGROUND_INIT: '-LDBI -ShowProg -LALL -a%s',
+              INIT: '-LDInit -ShowProg -LALL -a%s'}
+PD_QUERIES = {REBUILD: '-PDRbld -ShowProg -PhysDrv[%s] -a%s',
+              CLEAR: '-PDClear -ShowProg -PhysDrv[%s] -a%s'}
+
+MIN_INTERVAL = 2
+MAX_INTERVAL = 60
+# poll again when the fastest operation should have advanced that much
+TARGET_STEP_PERCENT = 1.0
+# sweep every kind of every adapter for new operations that often
+DISCOVERY_INTERVAL = 300
+
+PROGRESS_PATTERN = re.compile(r'Completed\s+(\d+)%')
+VD_PATTERN = re.compile(r'VD\s*#\s*(\d+)')
+PD_PATTERN = re.compile(r'Encl(?:osure)?[\s-]*(\d+),?\s*Slot[\s-]*(\d+)',
+                        re.IGNORECASE)
+
+
+def parse_progress_line(line):
+    """
+    Parse a line of a '-ShowProg' query
+    :param line: line like 'Rebuild Progress on Device at Enclosure 8,
+                 Slot 2 Completed 45% in 12 Minutes.'
+    :return: (target, percent) tuple, target is the virtual driver id or
+             'enclosure:slot' and None when the line names none, percent is
+             None when the operation is not running, None for lines without
+             progress
+    """
+    match = PROGRESS_PATTERN.search(line)
+    if match:
+        percent = int(match.group(1))
+    elif 'not in' in line.lower():
+        percent = None
+    else:
+        return None
+    pd = PD_PATTERN.search(line)
+    if pd:
+        return '%s:%s' % pd.groups(), percent
+    vd = VD_PATTERN.search(line)
+    return (int(vd.group(1)) if vd else None), percent
+
+
+def parse_progress(lines):
+    """
+    Parse a '-ShowProg' query
+    :param lines: output lines
+    :return: list of (target, percent) tuples
+    """
+    progress = []
+    for line in lines:
+        parsed = parse_progress_line(line)
+        if parsed is not None:
+            progress.append(parsed)
+    return progress
+
+
+class Operation(object):
+    """An operation running on the controller"""
+
+    def __init__(self, adapter, kind, target, percent, timer=time.time):
+        self.adapter = adapter
+        self.kind = kind
+        self.target = target
+        self.percent = percent
+        self.done = False
+        self.rate = None
+        self._timer = timer
+        self._first = (timer(), percent)
+        self._last = self._first
+
+    @property
+    def key(self):
+        return self.adapter, self.kind, self.target
+
+    def update(self, percent):
+        """
+        Record a progress sample
+        :param percent: completed percent, None when the operation ended
+        :return: True when the progress changed
+        """
+        if percent is None:
+            changed = not self.done
+            self.done = True
+            self.percent = 100
+            return changed
+        now = self._timer()
+        changed = percent != self.percent
+        if percent > self._first[1] and now > self._first[0]:
+            # rate over the whole observation, steadier than the last step
+            self.rate = (percent - self._first[1]) / (now - self._first[0])
+        self.percent = percent
+        self._last = (now, percent)
+        return changed
+
+    def eta(self):
+        """
+        Estimate the seconds left
+        :return: seconds, None while the rate is unknown
+        """
+        if self.done:
+            return 0
+        if not self.rate:
+            return None
+        return (100 - self.percent) / self.rate
+
+    def to_dict(self):
+        return {'adapter': self.adapter,
+                'kind': self.kind,
+                'target': self.target,
+                'percent': self.percent,
+                'percent_per_second': self.rate,
+                'eta_seconds': self.eta(),
+                'done': self.done}
+
+
+class OperationTracker(object):
+
+    def __init__(self, on_progress=None, on_complete=None,
+                 timer=time.time, sleep=time.sleep):
+        """
+        :param on_progress: called with an Operation when it progressed
+        :param on_complete: called with an Operation when it ended
+        """
+        self.operations = {}
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.interval = MIN_INTERVAL
+        self._timer = timer
+        self._sleep = sleep
+        self._disks = {}
+        self._discovered = None
+
+    def _get_client(self):
+        return Mega()
+
+    def _adapters(self):
+        # inventory imports virtual_driver which imports this module
+        from megautils.raid.inventory import Inventory
+        inventory = Inventory()
+        inventory.collect_physical_disks()
+        self._disks = dict(
+            (adapter_id, ['%s:%s' % (pd.enclosure, pd.slot) for pd in pds])
+            for adapter_id, pds in inventory.physical_disks.items())
+        return sorted(self._disks)
+
+    def _has_virtual_drivers(self, adapter):
+        try:
+            ret = self._get_client().command('-LdPdInfo -a%s' % adapter)
+        except exception.MegaCLIError:
+            # unknown, keep the operations of the adapter
+            return True
+        return any(line.startswith('Virtual Drive') for line in ret)
+
+    def _query(self, adapter, kind):
+        """
+        Query the progress of an operation kind on an adapter
+        :param adapter: adapter id
+        :param kind: operation kind
+        :return: list of (target, percent) tuples, None when the query failed
+        """
+        if kind in LD_QUERIES:
+            cmd = LD_QUERIES[kind] % adapter
+        else:
+            disks = self._disks.get(adapter)
+            if not disks:
+                return []
+            cmd = PD_QUERIES[kind] % (','.join(disks), adapter)
+        try:
+            return parse_progress(self._get_client().command(cmd))
+        except exception.MegaCLIError:
+            # adapters without virtual drivers reject the -LALL queries
+            if kind in LD_QUERIES and not self._has_virtual_drivers(adapter):
+                LOG.debug('no %s progress on adapter %s' % (kind, adapter))
+                return []
+            LOG.warning('%s progress query failed on adapter %s' %
+                        (kind, adapter))
+            return None
+
+    def _apply(self, adapter, kind, progress):
+        if progress is None:
+            # nothing is known, a failed query ends no operation
+            return
+        seen = set()
+        for target, percent in progress:
+            if target is None:
+                continue
+            key = (adapter, kind, target)
+            seen.add(key)
+            operation = self.operations.get(key)
+            if operation is None:
+                if percent is None:
+                    continue
+                operation = Operation(adapter, kind, target, percent,
+                                      self._timer)
+                self.operations[key] = operation
+                LOG.info('tracking %s of %s on adapter %s' %
+                         (kind, target, adapter))
+                if self.on_progress:
+                    self.on_progress(operation)
+                continue
+            self._update(operation, percent)
+        # operations the query does not mention any more have ended
+        for key, operation in list(self.operations.items()):
+            if key[:2] == (adapter, kind) and key not in seen:
+                self._update(operation, None)
+
+    def _update(self, operation, percent):
+        if operation.done:
+            return
+        if operation.update(percent):
+            if operation.done:
+                del self.operations[operation.key]
+                if self.on_complete:
+                    self.on_complete(operation)
+            elif self.on_progress:
+                self.on_progress(operation)
+
+    def discover(self):
+        """
+        Query every operation kind of every adapter
+        :return: running operations
+        """
+        for adapter in self._adapters():
+            for kind in sorted(LD_QUERIES) + sorted(PD_QUERIES):
+                self._apply(adapter, kind, self._query(adapter, kind))
+        self._discovered = self._timer()
+        return self.running()
+
+    def poll(self):
+        """
+        Query the progress of the known operations, one query per adapter
+        and kind, sweeping for new operations every DISCOVERY_INTERVAL
+        :return: running operations
+        """
+        if self._discovered is None or \
+                self._timer() - self._discovered >= DISCOVERY_INTERVAL:
+            return self.discover()
+        for adapter, kind in sorted(set(key[:2] for key in self.operations)):
+            self._apply(adapter, kind, self._query(adapter, kind))
+        return self.running()
+
+    def running(self):
+        return [self.operations[key] for key in sorted(self.operations)]
+
+    def next_interval(self):
+        """
+        Get the seconds until the next poll, the time the fastest operation
+        needs to advance TARGET_STEP_PERCENT, backing off while no rate is
+        known
+        """
+        rates = [op.rate for op in self.operations.values() if op.rate]
+        if rates:
+            self.interval = TARGET_STEP_PERCENT / max(rates)
+        else:
+            self.interval = self.interval * 2
+        self.interval = max(MIN_INTERVAL, min(MAX_INTERVAL, self.interval))
+        return self.interval
+
+    def run(self, timeout=None):
+        """
+        Poll until every operation ended
+        :param timeout: seconds, None waits forever
+        :return: True when no operation is running, False on timeout
+        """
+        deadline = None if timeout is None else self._timer() + timeout
+        self.interval = MIN_INTERVAL
+        while self.poll():
+            interval = self.next_interval()
+            if deadline is not None:
+                left = deadline - self._timer()
+                if left <= 0:
+                    return False
+                interval = min(interval, left)
+            self._sleep(interval)
+        return True
+
+    def stats(self):
+        """
+        :return: list of operation dicts with progress, rate and ETA
+        """
+        return [operation.to_dict() for operation in self.running()]
@@ -18,36 +18,75 @@ import copy
 
 from megautils.raid.mega import Mega
 from megautils import exception
+from megautils.parser import Field, TableParser, to_int, to_size_gb
+from megautils.record import RecordFacade, record_type
 
-class PhysicalDisk(object):
+PD_PARSER = TableParser([
+    Field('Enclosure Device ID', 'enclosure', to_int),
+    Field('Slot Number', 'slot', to_int),
+    Field('Device Id', 'id', to_int),
+    Field('WWN', 'wwn'),
+    Field('Sequence Number', 'sequence_number', to_int),
+    Field('Media Error Count', 'media_errors', to_int),
+    Field('Other Error Count', 'other_errors', to_int),
+    Field('Predictive Failure Count', 'predictive_failures', to_int),
+    Field('Last Predictive Failure Event Seq Number',
+          'last_predictive_seq_number', to_int),
+    Field('PD Type', 'pd_type'),
+    Field('Raw Size', 'raw_size', to_size_gb),
+    Field('Non Coerced Size', 'non_coerced_size', to_size_gb),
+    Field('Coerced Size', 'coerced_size', to_size_gb),
+    Field('Firmware state', 'firmware_state'),
+    Field('SAS Address', 'sas_address'),
+    Field('SAS Address(0)', 'sas_address'),
+    Field('Connected Port Number', 'connected_port_number'),
+    Field('Inquiry Data', 'inquiry_data'),
+    Field('FDE Capable', 'fde_capable'),
+    Field('FDE Enable', 'fde_enable'),
+    Field('Secured', 'secured'),
+    Field('Locked', 'locked'),
+    Field('Foreign State', 'foreign_state'),
+    Field('Device Speed', 'device_speed'),
+    Field('Link Speed', 'link_speed'),
+    Field('Media Type', 'media_type'),
+], start='Enclosure Device ID')
+
+
+PhysicalDiskRecord = record_type('PhysicalDiskRecord', [
+    ('adapter', None),
+    ('slot', None),
+    ('id', None),
+    ('enclosure', None),
+    ('sequence_number', 0),
+    ('media_errors', 0),
+    ('other_errors', 0),
+    ('predictive_failures', 0),
+    ('last_predictive_seq_number', 0),
+    ('pd_type', ''),
+    ('raw_size', ''),
+    ('non_coerced_size', ''),
+    ('wwn', ''),
+    ('coerced_size', ''),
+    ('firmware_state', ''),
+    ('sas_address', ''),
+    ('connected_port_number', ''),
+    ('inquiry_data', ''),
+    ('fde_capable', ''),
+    ('fde_enable', ''),
+    ('secured', ''),
+    ('locked', ''),
+    ('foreign_state', ''),
+    ('device_speed', ''),
+    ('link_speed', ''),
+    ('media_type', ''),
+])
+
+
+class PhysicalDisk(RecordFacade):
 
     def __init__(self, enclosure=None, slot=None, adapter=None):
-        self.adapter = adapter
-        self.slot = slot
-        self.id = None
-        self.enclosure = enclosure
-        self.sequence_number = 0
-        self.media_errors = 0
-        self.other_errors = 0
-        self.predictive_failures = 0
-        self.last_predictive_seq_number = 0
-        self.pd_type = ''
-        self.raw_size = ''
-        self.non_coerced_size = ''
-        self.wwn = ''
-        self.coerced_size = ''
-        self.firmware_state = ''
-        self.sas_address = ''
-        self.connected_port_number = ''
-        self.inquiry_data = ''
-        self.fde_capable = ''
-        self.fde_enable = ''
-        self.secured = ''
-        self.locked = ''
-        self.foreign_state = ''
-        self.device_speed = ''
-        self.link_speed = ''
-        self.media_type = ''
+        self._record = PhysicalDiskRecord(adapter=adapter, slot=slot,
+                                          enclosure=enclosure)
 
     def _get_client(self):
         return Mega()
@@ -58,108 +97,54 @@ class PhysicalDisk(object):
         
         cmd = '-PdInfo -PhysDrv [%s:%s] -a%s' % (self.enclosure, self.slot, self.adapter)
         ret = self._get_client().command(cmd)
-        self._handle(ret, multi_pd=True)
-
-    def get_physical_disks(self):
+        for record in self._iter_records(ret):
+            self._load(record)
 
+    def _list_command(self):
         if self.adapter == None:
-            cmd = '-PdList -aALL'
+            return '-PdList -aALL'
         elif self.enclosure != None and self.slot != None:
-            cmd = '-PdInfo -PhysDrv [%s:%s] -a%s' % (self.enclosure, self.slot, self.adapter)
+            return '-PdInfo -PhysDrv [%s:%s] -a%s' % (self.enclosure, self.slot, self.adapter)
         else:
-            cmd = '-PdList -a%s' % self.adapter
+            return '-PdList -a%s' % self.adapter
 
-        ret = self._get_client().command(cmd)
+    def get_physical_disks(self):
+        ret = self._get_client().command(self._list_command())
         return self._handle(ret)
-            
+
+    def iter_physical_disks(self):
+        """
+        Yield physical disks one by one while megacli is still printing
+        Stopping the iteration early kills the megacli process.
+        :return: physical disk generator
+        """
+        lines = self._get_client().stream(self._list_command())
+        try:
+            for pd in self._iter_handle(lines):
+                yield pd
+        finally:
+            lines.close()
+
+    def _iter_records(self, retstr):
+        adapter = self.adapter
+
+        def build(values):
+            if 'id' not in values:
+                return None
+            return PhysicalDiskRecord(adapter=adapter, **values)
+
+        return PD_PARSER.parse(retstr, on_record=build)
+
+    def _iter_handle(self, retstr):
+        for record in self._iter_records(retstr):
+            yield PhysicalDisk.from_record(record)
 
     def _handle(self, retstr, multi_pd=True):
         pds = []
-        for line in retstr.readlines():
-            if line.startswith('Enclosure Device ID'):
-                if not multi_pd and len(pds) > 0:
-                    return pds[0]
-                if self.id is not None:
-                    pds.append(self.copy())
-                offset = line.find(':')
-                self.enclosure = int(line[offset + 1:].strip())
-            if line.startswith('Slot Number'):
-                offset = line.find(':')
-                self.slot = int(line[offset + 1:].strip())
-            elif line.startswith('Device Id'):
-                offset = line.find(':')
-                self.id = int(line[offset + 1:].strip())
-            elif line.startswith('WWN'):
-                offset = line.find(':')
-                self.wwn = line[offset + 1:].strip()
-            elif line.startswith('Sequence Number'):
-                offset = line.find(':')
-                self.sequence_number = int(line[offset + 1:].strip())
-            elif line.startswith('Media Error Count'):
-                offset = line.find(':')
-                self.media_errors = int(line[offset + 1:].strip())
-            elif line.startswith('Other Error Count'):
-                offset = line.find(':')
-                self.other_errors = int(line[offset + 1:].strip())
-            elif line.startswith('Predictive Failure Count'):
-                offset = line.find(':')
-                self.predictive_failures = int(line[offset + 1:].strip())
-            elif line.startswith('Last Predictive Failure Event Seq Number'):
-                offset = line.find(':')
-                self.last_predictive_seq_number = int(line[offset + 1:].strip())
-            elif line.startswith('PD Type'):
-                offset = line.find(':')
-                self.pd_type = line[offset + 1:].strip()
-            elif line.startswith('Raw Size'):
-                offset = line.find(':')
-                delim = line.find('[') - 4
-                self.raw_size = float(line[offset + 1:delim].strip())
-            elif line.startswith('Non Coerced Size'):
-                offset = line.find(':')
-                delim = line.find('[') - 4
-                self.non_coerced_size = float(line[offset + 1:delim].strip())
-            elif line.startswith('Coerced Size'):
-                offset = line.find(':')
-                delim = line.find('[') - 4
-                self.coerced_size = float(line[offset + 1:delim].strip())
-            elif line.startswith('Firmware state'):
-                offset = line.find(':')
-                self.firmware_state = line[offset + 1:].strip()
-            elif line.startswith('SAS Address'):
-                offset = line.find(':')
-                self.sas_address = line[offset + 1:].strip()
-            elif line.startswith('Connected Port Number'):
-                offset = line.find(':')
-                self.connected_port_number = line[offset + 1:].strip()
-            elif line.startswith('Inquiry Data'):
-                offset = line.find(':')
-                self.inquiry_data = line[offset + 1:].strip()
-            elif line.startswith('FDE Capable'):
-                offset = line.find(':')
-                self.fde_capable = line[offset + 1:].strip()
-            elif line.startswith('FDE Enable'):
-                offset = line.find(':')
-                self.fde_enable = line[offset + 1:].strip()
-            elif line.startswith('Secured'):
-                offset = line.find(':')
-                self.secured = line[offset + 1:].strip()
-            elif line.startswith('Locked'):
-                offset = line.find(':')
-                self.locked = line[offset + 1:].strip()
-            elif line.startswith('Foreign State'):
-                offset = line.find(':')
-                self.foreign_state = line[offset + 1:].strip()
-            elif line.startswith('Device Speed'):
-                offset = line.find(':')
-                self.device_speed = line[offset + 1:].strip()
-            elif line.startswith('Link Speed'):
-                offset = line.find(':')
-                self.link_speed = line[offset + 1:].strip()
-            elif line.startswith('Media Type'):
-                offset = line.find(':')
-                self.media_type = line[offset + 1:].strip()
-        if self.id is not None:
-            pds.append(self.copy())
+        for pd in self._iter_handle(retstr):
+            if not multi_pd and len(pds) > 0:
+                return pds[0]
+            pds.append(pd)
         return pds
 
     def copy(self):
@@ -0,0 +1,253 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Raid configuration planner
+
+Assigns physical disks to every logical disk of a target raid config from a
+single physical disk inventory, solving all logical disks of an adapter
+together. Executing the plan then runs only the create commands.
+"""
+
+from oslo_log import log
+
+from megautils.raid import mega
+from megautils.raid.cachecade import CacheCade
+from megautils.raid.disk_allocator import allocate_jointly
+from megautils.raid.initialization import INIT_FAST, INIT_FULL, wait_all
+from megautils.raid.inventory import Inventory
+from megautils.raid.virtual_driver import VirtualDriver
+from megautils.raid.virtual_driver import volume_policy
+from megautils.record import record_type
+
+LOG = log.getLogger(__name__)
+
+# seconds execute_plan waits for initializations, they go on afterwards
+INIT_WAIT_TIMEOUT = 3600
+
+
+PlannedVolume = record_type('PlannedVolume', [
+    ('adapter', 0),
+    ('raid_level', None),
+    ('physical_disks', ()),
+    ('is_root_volume', False),
+    ('logical_disk', None),
+    ('policy', None),
+    ('cachecade', None),
+    ('logical_disk_index', 0),
+])
+
+
+def sort_logical_disks(logical_disks):
+    """
+    Order logical disks for allocation, largest first and 'MAX' last
+    :param logical_disks: target raid config logical disks
+    :return: sorted logical disks
+    """
+    return (sorted((x for x in logical_disks if x['size_gb'] != 'MAX'),
+                   reverse=True,
+                   key=lambda x: x['size_gb']) +
+            [x for x in logical_disks if x['size_gb'] == 'MAX'])
+
+
+class Plan(object):
+
+    def __init__(self, volumes=None):
+        self.volumes = volumes or []
+
+    def to_dict(self):
+        return {'volumes': [{'adapter': volume.adapter,
+                             'raid_level': volume.raid_level,
+                             'physical_disks': list(volume.physical_disks),
+                             'is_root_volume': volume.is_root_volume,
+                             'policy': volume.policy,
+                             'cachecade': volume.cachecade}
+                            for volume in self.volumes]}
+
+    def logical_disks(self):
+        """
+        Get the logical disks of the plan, one per planned volume and
+        without 'count', so applying them again creates the same volumes
+        :return: logical disks with their physical disks and the ones of
+                 their CacheCade volumes filled, in the order of the target
+                 raid config
+        """
+        logical_disks = []
+        for volume in sorted(self.volumes,
+                             key=lambda x: x.logical_disk_index):
+            logical_disk = dict(volume.logical_disk,
+                                physical_disks=list(volume.physical_disks))
+            logical_disk.pop('count', None)
+            if volume.cachecade:
+                logical_disk['cachecade'] = dict(
+                    volume.logical_disk['cachecade'],
+                    physical_disks=list(volume.cachecade['physical_disks']))
+            logical_disks.append(logical_disk)
+        return logical_disks
+
+
+def cachecade_request(logical_disk):
+    """
+    Get the allocation request of the CacheCade volume of a logical disk
+    :param logical_disk: logical disk with a 'cachecade' option
+    :return: virtual driver config of the ssds to allocate
+    """
+    cachecade = logical_disk['cachecade']
+    raid_level = cachecade.get('raid_level', mega.RAID_0)
+    return {'raid_level': raid_level,
+            'size_gb': 'MAX',
+            'disk_type': mega.DISK_TYPE_SSD,
+            'number_of_physical_disks': cachecade.get(
+                'number_of_physical_disks',
+                mega.RAID_LEVEL_MIN_DISKS[raid_level])}
+
+
+def _cachecade_volume(cachecade, physical_disks):
+    return {'raid_level': cachecade.get('raid_level', mega.RAID_0),
+            'physical_disks': list(physical_disks),
+            'write_policy': cachecade.get('write_policy', 'WT')}
+
+
+def plan_configuration(target_raid_config, inventory=None):
+    """
+    Assign physical disks to all logical disks of a target raid config
+    :param target_raid_config: validated target raid config
+    :param inventory: Inventory with physical disks collected, collected
+                      with a single megacli call when not specified
+    :return: Plan
+    """
+    if inventory is None:
+        inventory = Inventory()
+        inventory.collect_physical_disks()
+
+    # expand counts, then solve the disks of every adapter at once
+    volumes = []
+    indexes = []
+    logical_disks = target_raid_config['logical_disks']
+    for logical_disk in sort_logical_disks(logical_disks):
+        count = logical_disk.get('count', 1)
+        index = [i for i, x in enumerate(logical_disks)
+                 if x is logical_disk][0]
+        for i in range(0, count):
+            volumes.append((logical_disk, count))
+            indexes.append(index)
+
+    assignments = [None] * len(volumes)
+    caches = [None] * len(volumes)
+    adapters = sorted(set(logical_disk.get('controller', 0)
+                          for logical_disk, _ in volumes))
+    for adapter in adapters:
+        used = set()
+        pending = []
+        for position, (logical_disk, _) in enumerate(volumes):
+            if logical_disk.get('controller', 0) != adapter:
+                continue
+            if 'physical_disks' in logical_disk:
+                assignments[position] = list(logical_disk['physical_disks'])
+                used.update(logical_disk['physical_disks'])
+            else:
+                pending.append(position)
+        # ssds of CacheCade volumes are solved with the arrays
+        cached = []
+        for position, (logical_disk, _) in enumerate(volumes):
+            cachecade = logical_disk.get('cachecade')
+            if logical_disk.get('controller', 0) != adapter or \
+                    cachecade is None:
+                continue
+            if 'physical_disks' in cachecade:
+                caches[position] = _cachecade_volume(
+                    cachecade, cachecade['physical_disks'])
+                used.update(cachecade['physical_disks'])
+            else:
+                cached.append(position)
+        chosen = allocate_jointly(
+            inventory.get_physical_drivers(adapter),
+            [volumes[position][0] for position in pending] +
+            [cachecade_request(volumes[position][0])
+             for position in cached], used)
+        for position, pds in zip(pending, chosen):
+            assignments[position] = ['%s:%s' % (pd.enclosure, pd.slot)
+                                     for pd in pds]
+        for position, pds in zip(cached, chosen[len(pending):]):
+            caches[position] = _cachecade_volume(
+                volumes[position][0]['cachecade'],
+                ['%s:%s' % (pd.enclosure, pd.slot) for pd in pds])
+
+    media = {}
+    for adapter in adapters:
+        for pd in inventory.get_physical_drivers(adapter):
+            media[(adapter, '%s:%s' % (pd.enclosure, pd.slot))] = \
+                mega.DISK_TYPE_MAP.get(pd.media_type)
+
+    plan = Plan()
+    for (logical_disk, count), disks, cachecade, index in zip(
+            volumes, assignments, caches, indexes):
+        adapter = logical_disk.get('controller', 0)
+        disk_types = set(media.get((adapter, disk)) for disk in disks)
+        disk_type = disk_types.pop() if len(disk_types) == 1 else None
+        plan.volumes.append(PlannedVolume(
+            adapter=adapter,
+            raid_level=logical_disk['raid_level'],
+            physical_disks=tuple(disks),
+            is_root_volume=bool(logical_disk.get('is_root_volume')) and
+            count == 1,
+            logical_disk=logical_disk,
+            policy=volume_policy(logical_disk, disk_type),
+            cachecade=cachecade,
+            logical_disk_index=index))
+    return plan
+
+
+def execute_plan(plan, dry_run=False, wait=False, timeout=INIT_WAIT_TIMEOUT):
+    """
+    Create the virtual drivers of a plan
+    The initialization of every virtual driver starts right after it is
+    created, so they all initialize at the same time.
+    :param plan: Plan
+    :param dry_run: only log the commands which would run
+    :param wait: wait for 'fast' and 'full' initializations to complete,
+                 otherwise they run on after it returns
+    :param timeout: seconds to wait for them, None waits forever
+    :return: created virtual drivers, without their properties queried
+    """
+    vds = []
+    handles = []
+    for volume in plan.volumes:
+        if dry_run:
+            LOG.info('would create raid %s of %s on adapter %s with %s' %
+                     (volume.raid_level, ','.join(volume.physical_disks),
+                      volume.adapter, volume.policy))
+            if volume.cachecade:
+                LOG.info('would cache it with CacheCade %s' %
+                         volume.cachecade)
+            continue
+        vd = VirtualDriver(adapter_id=volume.adapter)
+        handles.append(vd.create(
+            volume.raid_level, volume.physical_disks, flush=False,
+            init_mode=volume.logical_disk.get('init_mode'),
+            **(volume.policy or {})))
+        if volume.cachecade:
+            CacheCade(adapter_id=volume.adapter).create(
+                volume.cachecade['raid_level'],
+                volume.cachecade['physical_disks'],
+                virtual_drivers=[vd.id],
+                write_policy=volume.cachecade['write_policy'])
+        if volume.is_root_volume:
+            vd.set_boot_able(flush=False)
+        vds.append(vd)
+    if wait and not wait_all([handle for handle in handles
+                              if handle.mode in (INIT_FAST, INIT_FULL)],
+                             timeout):
+        LOG.warning('initializations still running after %s seconds' %
+                    timeout)
+    return vds
@@ -18,33 +18,118 @@ import copy
 import re
 import os
 import json
-import jsonschema
-from jsonschema import exceptions as json_schema_exc
 
 from megautils.raid import mega
 from megautils import exception
+from megautils.parser import Field, TableParser, to_int
+from megautils.raid.initialization import INIT_MODES, InitHandle
+from megautils.record import RecordFacade, record_type
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 RAID_CONFIG_SCHEMA = os.path.join(CURRENT_DIR, "raid_config_schema.json")
 
 
-class VirtualDriver(object):
+def _vd_ids(value):
+    """
+    Parse the 'Virtual Drive' value
+    :param value: raw value like '0 (Target Id: 0)'
+    :return: (virtual driver id, target id) tuple
+    """
+    vd_id, _, target = value.partition('(')
+    target = target.partition(':')[2].strip().rstrip(')').strip()
+    return int(vd_id.strip()), int(target) if target else int(vd_id)
+
+
+def _strip_unit(unit):
+    def converter(value):
+        value = value.strip()
+        if value.endswith(unit):
+            value = value[:-len(unit)].strip()
+        return value
+    return converter
+
+
+VD_PARSER = TableParser([
+    Field('Virtual Drive', 'ids', _vd_ids),
+    Field('Name', 'name'),
+    Field('RAID Level', 'raid_level'),
+    Field('Size', 'size', _strip_unit('GB')),
+    Field('State', 'state'),
+    Field('Strip Size', 'stripe_size', _strip_unit('KB')),
+    Field('Number Of Drives', 'number_of_drives', to_int),
+    Field('Number Of Drives per span', 'number_of_drives', to_int),
+    Field('Span Depth', 'span_depth', to_int),
+    Field('Default Cache Policy', 'default_cache_policy'),
+    Field('Current Cache Policy', 'current_cache_policy'),
+    Field('Current Access Policy', 'access_policy'),
+    Field('Disk Cache Policy', 'disk_cache_policy'),
+    Field('Encryption', 'encryption'),
+    Field('Encryption Type', 'encryption'),
+], start='Virtual Drive')
+
+
+VirtualDriveRecord = record_type('VirtualDriveRecord', [
+    ('adapter', None),
+    ('id', None),
+    ('target_id', None),
+    ('name', ''),
+    ('raid_level', ''),
+    ('size', ''),
+    ('state', ''),
+    ('stripe_size', ''),
+    ('number_of_drives', 0),
+    ('span_depth', 0),
+    ('default_cache_policy', ''),
+    ('current_cache_policy', ''),
+    ('access_policy', ''),
+    ('disk_cache_policy', ''),
+    ('encryption', ''),
+])
+
+
+# policy of spanned virtual drivers created without an explicit policy
+SPAN_POLICY = ' Direct RA WB'
+
+
+def _policy_args(write_policy, read_policy, io_policy, stripe_size_kb):
+    args = ''
+    for value, allowed in ((write_policy, mega.WRITE_POLICIES),
+                           (read_policy, mega.READ_POLICIES),
+                           (io_policy, mega.IO_POLICIES)):
+        if value is None:
+            continue
+        if value not in allowed:
+            raise exception.InvalidParameterValue(
+                '%s is not one of %s' % (value, ', '.join(allowed)))
+        args += ' %s' % value
+    if stripe_size_kb is not None:
+        if int(stripe_size_kb) not in mega.STRIPE_SIZES_KB:
+            raise exception.InvalidParameterValue(
+                'invalid stripe size %s KB' % stripe_size_kb)
+        args += ' -strpsz%d' % int(stripe_size_kb)
+    return args
+
+
+def volume_policy(virtual_driver_config, disk_type):
+    """
+    Get the cache and strip policy of a virtual driver
+    :param virtual_driver_config: virtual driver of target_raid_config
+    :param disk_type: media type of the members, 'ssd' or 'hdd'
+    :return: dict of create() policy arguments, values of the virtual
+             driver win over the defaults of the media type
+    """
+    policy = dict(mega.DEFAULT_POLICIES.get(disk_type, {}))
+    for key in ('write_policy', 'read_policy', 'io_policy',
+                'disk_cache_policy', 'stripe_size_kb'):
+        if key in virtual_driver_config:
+            policy[key] = virtual_driver_config[key]
+    return policy
+
+
+class VirtualDriver(RecordFacade):
 
     def __init__(self, adapter_id=None, id=None):
-        self.adapter = adapter_id
-        self.id = id
-        self.name = ''
-        self.raid_level = ''
-        self.size = ''
-        self.state = ''
-        self.stripe_size = ''
-        self.number_of_drives = 0
-        self.span_depth = 0
-        self.default_cache_policy = ''
-        self.current_cache_policy = ''
-        self.access_policy = ''
-        self.disk_cache_policy = ''
-        self.encryption = ''
+        self._record = VirtualDriveRecord(adapter=adapter_id, id=id)
 
     def __flush__(self):
         if self.adapter == None or self.id == None:
@@ -52,128 +137,135 @@ class VirtualDriver(object):
 
         cmd = '-LdInfo -L%s -a%s' % (self.id, self.adapter)
         ret = self._get_client().command(cmd)
-        self._handle(ret, multi_vd=False)
-        
+        for record in self._iter_records(ret):
+            self._load(record)
+            break
 
     def _get_client(self):
         return mega.Mega()
 
+    def _iter_records(self, retstr):
+        adapter = self.adapter
+
+        def build(values):
+            values['id'], values['target_id'] = values.pop('ids')
+            return VirtualDriveRecord(adapter=adapter, **values)
+
+        return VD_PARSER.parse(retstr, on_record=build)
+
+    def _iter_handle(self, retstr):
+        for record in self._iter_records(retstr):
+            yield VirtualDriver.from_record(record)
+
     def _handle(self, retstr, multi_vd=False):
         vds = []
-        for line in retstr:
-            if line.startswith('Virtual Drive'):
-                if not multi_vd and len(vds) > 0:
-                    return vds[0]
-                if self.id is not None:
-                    vds.append(self.copy())
-                delim = line.find('(')
-                offset = line.find(':')
-                self.id = int(line[offset + 1:delim].strip())
-            if line.startswith('Name'):
-                offset = line.find(':')
-                self.name = line[offset + 1:].strip()
-            elif line.startswith('RAID Level'):
-                offset = line.find(':')
-                self.raid_level = line[offset + 1:].strip()
-            elif line.startswith('Size'):
-                delim = line.find(' GB')
-                offset = line.find(':')
-                self.size = line[offset + 1:delim].strip()
-            elif line.startswith('State'):
-                offset = line.find(':')
-                self.state = line[offset + 1:].strip()
-            elif line.startswith('Strip Size'):
-                delim = line.find(' KB')
-                offset = line.find(':')
-                self.stripe_size = line[offset + 1:delim].strip()
-            elif line.startswith('Number Of Drives'):
-                offset = line.find(':')
-                self.number_of_drives = int(line[offset + 1:].strip())
-            elif line.startswith('Span Depth'):
-                offset = line.find(':')
-                self.span_depth = int(line[offset + 1:].strip())
-            elif line.startswith('Default Cache Policy'):
-                offset = line.find(':')
-                self.default_cache_policy = line[offset + 1:].strip()
-            elif line.startswith('Current Cache Policy'):
-                offset = line.find(':')
-                self.current_cache_policy = line[offset + 1:].strip()
-            elif line.startswith('Current Access Policy'):
-                offset = line.find(':')
-                self.access_policy = line[offset + 1:].strip()
-            elif line.startswith('Disk Cache Policy'):
-                offset = line.find(':')
-                self.disk_cache_policy = line[offset + 1:].strip()
-            elif line.startswith('Encryption'):
-                offset = line.find(':')
-                self.encryption = line[offset + 1:].strip()
-        if self.id is not None:
-            vds.append(self.copy())
+        for vd in self._iter_handle(retstr):
+            if not multi_vd and len(vds) > 0:
+                return vds[0]
+            vds.append(vd)
 
         return vds
 
     def copy(self):
         return copy.deepcopy(self)
 
-    def create(self, raid_level, disks):
+    def create(self, raid_level, disks, flush=True, write_policy=None,
+               read_policy=None, io_policy=None, disk_cache_policy=None,
+               stripe_size_kb=None, init_mode=None):
         """
         Create a virtual driver with disks
         :param raid_level: raid level
         :param disks: lsi mega raid create disk schema
-        :return: 
+        :param flush: query the created virtual driver, otherwise only its
+                      id is known
+        :param write_policy: 'WT' or 'WB'
+        :param read_policy: 'NORA', 'RA' or 'ADRA'
+        :param io_policy: 'Direct' or 'Cached'
+        :param disk_cache_policy: 'enable', 'disable' or 'default'
+        :param stripe_size_kb: strip size in KB
+        :param init_mode: 'none', 'fast', 'full' or 'background', None
+                          leaves it to the controller
+        :return: InitHandle of the started initialization
         """
+        if init_mode is not None and init_mode not in INIT_MODES:
+            raise exception.InvalidParameterValue(
+                'init mode must be one of %s' % ', '.join(INIT_MODES))
 
         disk_formater = re.compile(r'^[0-9]+:[0-9]+$')
         for disk in disks:
             if not re.match(disk_formater, disk):
                 raise exception.InvalidDiskFormater(disk=disk)
 
+        disks = list(disks)
+        policy = _policy_args(write_policy, read_policy, io_policy,
+                              stripe_size_kb)
         if raid_level in [mega.RAID_0, mega.RAID_1, mega.RAID_5, mega.RAID_6]:
-            cmd = '-CfgLdAdd -r%s [%s] -a%s' % \
+            cmd = '-CfgLdAdd -r%s [%s]%s -a%s' % \
                   (mega.RAID_LEVEL_INPUT_MAPPING.get(raid_level),
-                   ','.join(disks), self.adapter)
+                   ','.join(disks), policy, self.adapter)
         elif raid_level == mega.RAID_10:
             arrays = ''
-            for i in range(len(disks) / 2):
+            for i in range(len(disks) // 2):
                 arrays += ' -Array%s[%s,%s]' % (i, disks.pop(0), disks.pop(0))
-            cmd = '-CfgSpanAdd -r%s %s Direct RA WB -a%s' % \
+            cmd = '-CfgSpanAdd -r%s %s%s -a%s' % \
                   (mega.RAID_LEVEL_INPUT_MAPPING.get(raid_level),
-                   arrays, self.adapter)
+                   arrays, policy or SPAN_POLICY, self.adapter)
         elif raid_level == mega.RAID_50:
             arrays = ''
-            for i in range(len(disks) / 3):
+            for i in range(len(disks) // 3):
                 arrays += ' -Array%s[%s,%s,%s]' % \
                           (i, disks.pop(0), disks.pop(0), disks.pop(0))
-            cmd = '-CfgSpanAdd -r%s %s Direct RA WB -a%s' % \
+            cmd = '-CfgSpanAdd -r%s %s%s -a%s' % \
                   (mega.RAID_LEVEL_INPUT_MAPPING.get(raid_level),
-                   arrays, self.adapter)
+                   arrays, policy or SPAN_POLICY, self.adapter)
         else:
             arrays = ''
-            for i in range(len(disks) / 4):
+            for i in range(len(disks) // 4):
                 arrays += ' -Array%s[%s,%s,%s,%s]' % \
                           (i, disks.pop(0), disks.pop(0), disks.pop(0), disks.pop(0))
-            cmd = '-CfgSpanAdd -r%s %s Direct RA WB -a%s' %\
-                  (mega.RAID_LEVEL_INPUT_MAPPING.get(raid_level), arrays, self.adapter)
+            cmd = '-CfgSpanAdd -r%s %s%s -a%s' %\
+                  (mega.RAID_LEVEL_INPUT_MAPPING.get(raid_level), arrays,
+                   policy or SPAN_POLICY, self.adapter)
 
 
         ret = self._get_client().command(cmd)
         self.id = None
-        for line in ret.readlines():
+        for line in ret:
             offset = line.find('Created VD')
             if offset < 0:
                 continue
-            self.id = line[offset + 11:]
+            self.id = line[offset + 11:].strip()
             break
         if not self.id:
             raise exception.MegaCLIError()
-        self.__flush__()
+        if disk_cache_policy in (mega.DISK_CACHE_ENABLE,
+                                 mega.DISK_CACHE_DISABLE):
+            self.set_disk_cache(disk_cache_policy == mega.DISK_CACHE_ENABLE)
+        handle = InitHandle(self, init_mode).start()
+        if flush:
+            self.__flush__()
+        return handle
+
+    def set_disk_cache(self, enable):
+        """
+        Enable or disable the caches of the member disks
+        :param enable: True to enable
+        """
+        if self.adapter == None or self.id == None:
+            raise exception.InvalidParameterValue()
+
+        cmd = '-LDSetProp %s -L%s -a%s' % (
+            '-EnDskCache' if enable else '-DisDskCache', self.id, self.adapter)
+        self._get_client().command(cmd)
 
-    def destroy(self):
+    def destroy(self, flush=True):
         """
         Delete this raid
+        :param flush: query the virtual driver first
         :return: 
         """
-        self.__flush__()
+        if flush:
+            self.__flush__()
 
         cmd = '-CfgLdDel -L%s -Force -a%s' % (self.id, self.adapter)
         self._get_client().command(cmd)
@@ -191,12 +283,30 @@ class VirtualDriver(object):
         ret = self._get_client().command(cmd)
         return self._handle(ret, multi_vd=True)
 
-    def set_boot_able(self):
+    def iter_virtual_drivers(self):
+        """
+        Yield virtual drivers one by one while megacli is still printing
+        Stopping the iteration early kills the megacli process.
+        :return: virtual driver generator
+        """
+        if self.adapter == None:
+            raise exception.InvalidParameterValue()
+
+        lines = self._get_client().stream('-LdInfo -LALL -a%s' % self.adapter)
+        try:
+            for vd in self._iter_handle(lines):
+                yield vd
+        finally:
+            lines.close()
+
+    def set_boot_able(self, flush=True):
         """
         Set current virtual driver bootable
+        :param flush: query the virtual driver first
         :return:
         """
-        self.__flush__()
+        if flush:
+            self.__flush__()
 
         cmd = '-AdpBootDrive -set -L%s -a%s' % (self.id, self.adapter)
         self._get_client().command(cmd)
@@ -211,6 +321,10 @@ def validate_raid_schema(raid_config):
     :param raid_config: The RAID configuration to be validated.
     :raises: InvalidInputError, if validation of the input fails.
     """
+    # jsonschema is only needed by the raid clean steps
+    import jsonschema
+    from jsonschema import exceptions as json_schema_exc
+
     raid_schema_fobj = open(RAID_CONFIG_SCHEMA, 'r')
     raid_config_schema = json.load(raid_schema_fobj)
     try:
@@ -242,3 +356,12 @@ def validate_raid_schema(raid_config):
                    "disks." % {'raid_level': raid_level,
                                'number': min_disks_reqd})
             raise exception.InvalidParameterValue(msg)
+
+        cachecade = logical_disk.get('cachecade') or {}
+        cache_level = cachecade.get('raid_level', mega.RAID_0)
+        if cachecade.get('number_of_physical_disks',
+                         mega.RAID_LEVEL_MIN_DISKS[cache_level]) < \
+                mega.RAID_LEVEL_MIN_DISKS[cache_level]:
+            msg = ("CacheCade RAID level %s requires at least %s disks." %
+                   (cache_level, mega.RAID_LEVEL_MIN_DISKS[cache_level]))
+            raise exception.InvalidParameterValue(msg)
@@ -16,11 +16,16 @@
 
 import copy
 
+from oslo_log import log
+
 from megautils.raid_ircu.mega import Mega
 from megautils import exception
 from megautils.raid_ircu.virtual_driver import VirtualDriver
 from megautils.raid_ircu.physical_disk import PhysicalDisk
 
+LOG = log.getLogger(__name__)
+
+
 class Adapter(object):
 
     def __init__(self, id=None):
@@ -30,10 +35,13 @@ class Adapter(object):
         if self.id == None:
             raise exception.InvalidParameterValue()
 
-        cmd = '%s DISPLAY' % self.id
-
-        ret = self._get_client().command(cmd)
-        return self._handle(ret, multi_adapter=False)
+        adapter_id = int(self.id)
+        for adapter in Adapter().get_adapters():
+            if adapter.id == adapter_id:
+                self.__dict__.update(adapter.__dict__)
+                return adapter
+        raise exception.InvalidParameterValue(
+            'adapter %s not found' % self.id)
 
     def _get_client(self):
         return Mega()
@@ -44,23 +52,28 @@ class Adapter(object):
         ret = self._get_client().command(cmd)
         return self._handle(ret)
 
-    def _handle(self, retstr, multi_adapter=True):
+    def _handle(self, retstr):
+        """
+        Get the adapters of a LIST output
+        :param retstr: LIST output lines
+        :return: adapters
+        """
         adapters = []
-        ready = 2 # display value played under 2 line from Index-key
-        for line in retstr.readlines():
-            if not multi_adapter and len(adapters) > 0:
-                return adapters[0]
-            if line.startswith(' Index'):
-                ready-= 1
-            elif ready == 1:
-                ready-= 1
-            elif ready == 0 and not line.startswith('SAS3IRU'):
-                values = [i for i in line.split(' ') if i]
-                if not multi_adapter and values[0] != self.id:
-                    continue
-                self.id, self.adp_type, self.vender_id, self.device_id, self.pci_address, self.subsysven_id, self.subsysdev_id = valuedds.pop()
-            if self.id is not None:
-                adapters.append(self.copy())
+        in_table = False
+        for line in retstr:
+            # the rows follow the ' -----  ----' line under the header
+            if line.strip().startswith('-----'):
+                in_table = True
+                continue
+            if not in_table:
+                continue
+            values = line.split()
+            if len(values) != 7 or not values[0].isdigit():
+                break
+            (self.id, self.adp_type, self.vender_id, self.device_id,
+             self.pci_address, self.subsysven_id, self.subsysdev_id) = values
+            self.id = int(self.id)
+            adapters.append(self.copy())
 
         return adapters
 
@@ -82,5 +95,31 @@ class Adapter(object):
         vds = VirtualDriver(adapter_id=self.id).getall_virtual_drivers()
         return vds
 
+    def destroy_virtual_drivers(self, virtual_drivers=None):
+        """
+        Delete virtual drivers of the adapter
+        :param virtual_drivers: virtual drivers to delete one by one, all
+                                volumes are deleted with a single sas3ircu
+                                call when not specified
+        """
+        if self.id == None:
+            raise exception.InvalidParameterValue()
+
+        if virtual_drivers is None:
+            try:
+                self._get_client().command('%s DELETE noprompt' % self.id)
+                return
+            except exception.MegaCLIError:
+                pass
+            LOG.warning('bulk delete failed on adapter %s, deleting '
+                        'volumes one by one' % self.id)
+            virtual_drivers = VirtualDriver(
+                adapter_id=self.id).getall_virtual_drivers()
+
+        for virtual_driver in virtual_drivers:
+            LOG.debug('deleting virtual driver %s of adapter %s' %
+                      (virtual_driver.id, self.id))
+            virtual_driver.destroy(flush=False)
+
     def copy(self):
         return copy.deepcopy(self)
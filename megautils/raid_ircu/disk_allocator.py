@@ -20,6 +20,25 @@ from megautils.raid_ircu.adapter import Adapter
 
 LOG = log.getLogger(__name__)
 
+# number of disks holding data for a raid level and a disk count
+DATA_DISKS = {mega.RAID_0: lambda n: n,
+              mega.RAID_1: lambda n: max(n // 2, 1),
+              mega.RAID_10: lambda n: n // 2}
+
+
+def disk_size_gb(virtual_driver_config, number_of_physical_disks):
+    """
+    Get the capacity every disk of a volume must hold
+    :param virtual_driver_config: virtual driver
+    :param number_of_physical_disks: number of disks of the volume
+    :return: size in GB, 0 for 'MAX'
+    """
+    if virtual_driver_config['size_gb'] == 'MAX':
+        return 0
+    data_disks = DATA_DISKS[virtual_driver_config['raid_level']](
+        number_of_physical_disks)
+    return virtual_driver_config['size_gb'] / float(max(data_disks, 1))
+
 
 def allocate_disks(adapter_id, virtual_driver_config):
     """
@@ -29,15 +48,15 @@ def allocate_disks(adapter_id, virtual_driver_config):
     :return:
     """
     adapter = Adapter(id=adapter_id)
-    size_gb = 1 if virtual_driver_config['size_gb'] == 'MAX' \
-        else virtual_driver_config['size_gb']
     raid_level = virtual_driver_config['raid_level']
     number_of_physical_disks = virtual_driver_config.get(
         'number_of_physical_disks', mega.RAID_LEVEL_MIN_DISKS[raid_level])
+    size_gb = disk_size_gb(virtual_driver_config, number_of_physical_disks)
     disk_type = virtual_driver_config.get('disk_type', None)
+    # sas3ircu reports disk sizes in MB
     avail_physical_disks = [x for x in adapter.get_physical_drivers()
                             if 'Online' not in x.firmware_state
-                            and x.size >= size_gb]
+                            and x.size / 1024.0 >= size_gb]
 
     # hdd and ssd should be split manually cause a raid must stand with same disk type
     avail_ssd_physical_disks = [x for x in avail_physical_disks
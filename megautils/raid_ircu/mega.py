@@ -13,14 +13,15 @@
 # limitations under the License.
 
 import os
-import re
-import subprocess
-import pexpect
 
 from oslo_log import log
 from megautils import exception
+from megautils import instrumentation
+from megautils import utils
+from megautils.cache import get_cache
 
-MEGACLI_PATH = '/opt/MegaRAID/MegaCli/sas3ircu'
+MEGACLI_PATH = os.environ.get('MEGAUTILS_SAS3IRCU_PATH',
+                              '/opt/MegaRAID/MegaCli/sas3ircu')
 LOG = log.getLogger()
 
 RAID_0 = '0'
@@ -31,15 +32,23 @@ RAID_6 = '6'
 RAID_50 = '5+0'
 RAID_60 = '6+0'
 
-RAID_LEVEL_MIN_DISKS = {RAID_0: 'RAID0',
-                        RAID_1: 'RAID1',
-                        RAID_10: 'RAID10'}
+RAID_LEVEL_MIN_DISKS = {RAID_0: 2,
+                        RAID_1: 2,
+                        RAID_10: 4}
 
-DISK_TYPE_HDD = 'SATA_HDD'
-DISK_TYPE_SSD = 'SATA_SSD'
+# raid levels to sas3ircu volume types
+VOLUME_TYPES = {RAID_0: 'RAID0',
+                RAID_1: 'RAID1',
+                RAID_10: 'RAID10'}
 
-DISK_TYPE_MAP = {'Hard Disk Device': DISK_TYPE_HDD,
-                 'Solid State Device': DISK_TYPE_SSD}
+DISK_TYPE_HDD = 'hdd'
+DISK_TYPE_SSD = 'ssd'
+
+# 'Drive Type' of DISPLAY
+DISK_TYPE_MAP = {'SAS_HDD': DISK_TYPE_HDD,
+                 'SATA_HDD': DISK_TYPE_HDD,
+                 'SAS_SSD': DISK_TYPE_SSD,
+                 'SATA_SSD': DISK_TYPE_SSD}
 
 RAID_LEVEL_INPUT_MAPPING = {
     '0': '0',
@@ -51,6 +60,29 @@ RAID_LEVEL_INPUT_MAPPING = {
     '6+0': '60'
 }
 
+# Commands which do not change the controller state, their output is cached
+READ_COMMANDS = ('LIST', 'DISPLAY', 'STATUS')
+
+# Commands asking for confirmation unless run with 'noprompt'
+DESTRUCTIVE_VERBS = ('CREATE', 'DELETE', 'DELETEVOLUME', 'HOTSPARE')
+
+# seconds before a command is killed
+READ_TIMEOUT = 60
+WRITE_TIMEOUT = 600
+
+
+def parse_command(cmd):
+    """
+    Get the verb and the target controller of a sas3ircu command
+    :param cmd: command string
+    :return: (verb, adapter) tuple, adapter is 'ALL' when not specified
+    """
+    args = cmd.split()
+    if args and args[0].isdigit():
+        return (args[1].upper() if len(args) > 1 else ''), args[0]
+    return (args[0].upper() if args else ''), 'ALL'
+
+
 class Mega(object):
 
     def __init__(self, path=MEGACLI_PATH):
@@ -59,27 +91,60 @@ class Mega(object):
         if not os.path.exists(path):
             raise exception.PathNotFound('path {0} not found'.format(path))
 
-    def command(self, cmd):
+    def command(self, cmd, timeout=None):
         """
-        Execute a megacli command
+        Execute a sas3ircu command
+        Destructive commands run with 'noprompt', sas3ircu never waits for
+        an answer.
         :param cmd: command string
-        :return: command output
+        :param timeout: seconds before sas3ircu is killed, READ_TIMEOUT or
+                        WRITE_TIMEOUT by default
+        :return: command output lines
         """
-        LOG.debug("Excuting megacli 'sas3ircu %s' "% cmd)
-        proc = pexpect.spawn("{0} {1}".
-                                format(self.cli_path, cmd))
-        try:
-            get_yes = proc.expect(['(YES/NO)'])
-            proc.send('YES')
-            get_yes = proc.expect(['(YES/NO)'])
-            proc.send('NO')
-            stdout = proc.before
-        except pexpect.EOF:
-            stdout = p.before
-        except pexpect.TIMEOUT:
-            stdout = 'command execute time out'
-        except Exception as e:
-            stdout = e.message
-
-        return stdout
+        verb, adapter = parse_command(cmd)
+        cache = get_cache()
+        is_read = verb in READ_COMMANDS
+        if is_read:
+            lines = cache.get(adapter, cmd)
+            if lines is not None:
+                LOG.debug("Using cached output of 'sas3ircu %s'" % cmd)
+                if instrumentation.enabled:
+                    instrumentation.record_cache_hit('sas3ircu', verb)
+                return list(lines)
+        generation = cache.generation
+
+        args = cmd.split()
+        if verb in DESTRUCTIVE_VERBS and \
+                'noprompt' not in [a.lower() for a in args]:
+            args.append('noprompt')
+        if timeout is None:
+            timeout = READ_TIMEOUT if is_read else WRITE_TIMEOUT
+
+        LOG.debug("Excuting sas3ircu 'sas3ircu %s'" % ' '.join(args))
+        if instrumentation.enabled:
+            start = instrumentation.timer()
+        returncode, out, err, timed_out = utils.execute(
+            [self.cli_path] + args, timeout)
+        if instrumentation.enabled:
+            instrumentation.record('sas3ircu', verb,
+                                   instrumentation.timer() - start,
+                                   len(out), returncode)
+        if not is_read:
+            cache.invalidate(adapter)
+
+        if timed_out:
+            self._raise(returncode, "'sas3ircu %s' timed out after %s "
+                                    "seconds" % (cmd, timeout))
+        if returncode:
+            # sas3ircu prints its errors to stdout
+            self._raise(returncode, err or out)
+        lines = out.splitlines(True)
+        if is_read:
+            cache.set(adapter, cmd, tuple(lines), generation)
+        return lines
 
+    def _raise(self, returncode, err):
+        LOG.error(err)
+        ex = exception.MegaCLIError("sas3ircu execute error!")
+        ex.exitcode = returncode
+        raise ex
@@ -16,8 +16,33 @@
 
 import copy
 
-from megautils.raid.mega import Mega
+from megautils.raid_ircu.mega import Mega
 from megautils import exception
+from megautils.parser import Field, TableParser, to_int
+
+
+def _size_mb(value):
+    # '915715/1875385007'
+    return int(value.split('/', 1)[0].strip())
+
+
+PD_PARSER = TableParser([
+    Field('Enclosure #', 'enclosure', to_int),
+    Field('Slot #', 'slot', to_int),
+    Field('PI Supported', 'pi_supported'),
+    Field('SAS Address', 'sas_address'),
+    Field('State', 'state'),
+    Field('Size (in MB)/(in sectors)', 'size', _size_mb),
+    Field('Manufacturer', 'manufacturer'),
+    Field('Model Number', 'model_number'),
+    Field('Firmware Revision', 'firmware_revision'),
+    Field('Serial No', 'serial_no'),
+    Field('Unit Serial No(VPD)', 'unit_serial_no'),
+    Field('GUID', 'guid'),
+    Field('Protocol', 'protocol'),
+    Field('Drive Type', 'drive_type'),
+], start='Enclosure #')
+
 
 class PhysicalDisk(object):
 
@@ -36,6 +61,7 @@ class PhysicalDisk(object):
         self.guid = ''
         self.protocol = ''
         self.drive_type = ''
+        self.state = ''
         self.firmware_state = 'Online'
 
     def _get_client(self):
@@ -45,69 +71,30 @@ class PhysicalDisk(object):
         if self.adapter == None:
             raise exception.InvalidParameterValue()
 
-        cmd = '%s LIST' % self.adapter
+        cmd = '%s DISPLAY' % self.adapter
         ret = self._get_client().command(cmd)
         self._handle(ret, multi_pd=False)
 
     def get_physical_disks(self):
-        cmd = '%s LIST' % self.adapter
+        cmd = '%s DISPLAY' % self.adapter
         ret = self._get_client().command(cmd)
         return self._handle(ret)
 
     def _handle(self, retstr, multi_pd=True):
         pds = []
-        i = 0
-        for line in retstr.readlines():
-            if line.startswith('  Enclosure'):
-                if not multi_pd and len(pds) > 0:
-                    return pds[0]
-                if self.id is not None:
-                    pds.append(self.copy())
-                self.id = i
-                i+= 1
-                offset = line.find(':')
-                self.enclosure = int(line[offset + 1:].strip())
-            if line.startswith('  Slot'):
-                offset = line.find(':')
-                self.slot = int(line[offset + 1:].strip())
-            elif line.startswith('  PI Supported'):
-                offset = line.find(':')
-                self.pi_supported = int(line[offset + 1:].strip())
-            elif line.startswith('  SAS Address'):
-                offset = line.find(':')
-                self.sas_address = line[offset + 1:].strip()
-            elif line.startswith('  Size'):
-                offset = line.find(':')
-                end = line.find('/')
-                self.size = int(line[offset + 1:end].strip())
-            elif line.startswith('  Manufacturer'):
-                offset = line.find(':')
-                self.manufacturer = int(line[offset + 1:].strip())
-            elif line.startswith('  Model Number'):
-                offset = line.find(':')
-                self.model_number = int(line[offset + 1:].strip())
-            elif line.startswith('  Firmware Revision'):
-                offset = line.find(':')
-                self.firmware_revision = int(line[offset + 1:].strip())
-            elif line.startswith('  Serial No'):
-                offset = line.find(':')
-                self.serial_no = int(line[offset + 1:].strip())
-            elif line.startswith('  Unit Serial No'):
-                offset = line.find(':')
-                self.unit_serial_no = line[offset + 1:].strip()
-            elif line.startswith('  GUID'):
-                offset = line.find(':')
-                self.guid = line[offset + 1:].strip()
-            elif line.startswith('  Protocol'):
-                offset = line.find(':')
-                self.protocol = line[offset + 1:].strip()
-            elif line.startswith('  Drive Type'):
-                offset = line.find(':')
-                self.drive_type = line[offset + 1:delim].strip()
-            if self.id is not None:
-                pds.append(self.copy())
-            if line.startswith('Device is a Enclosure'):
-                break
+        for values in PD_PARSER.parse(retstr):
+            # enclosure services devices carry no drive type
+            if 'drive_type' not in values:
+                continue
+            if not multi_pd and len(pds) > 0:
+                return pds[0]
+            self.__dict__.update(values)
+            self.id = len(pds)
+            # only 'Ready (RDY)' disks can join a new volume, the others are
+            # reported like online MegaCli disks so allocation skips them
+            self.firmware_state = 'Unconfigured(good)' \
+                if self.state.startswith('Ready') else 'Online'
+            pds.append(self.copy())
         return pds
 
     def copy(self):
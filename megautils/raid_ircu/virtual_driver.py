@@ -18,16 +18,40 @@ import copy
 import re
 import os
 import json
-import jsonschema
-from jsonschema import exceptions as json_schema_exc
 
 from megautils.raid_ircu import mega
 from megautils import exception
+from megautils.parser import Field, TableParser, split_field, to_int
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 RAID_CONFIG_SCHEMA = os.path.join(CURRENT_DIR, "raid_config_schema.json")
 
 
+def _split_line(line):
+    # 'IR volume 1' and 'PHY[0] Enclosure#/Slot#   : 1:0' have no plain key
+    if line.startswith('IR volume'):
+        return 'IR volume', line[9:]
+    if line.startswith('Physical device information'):
+        return 'Physical device information', ''
+    key, value = split_field(line)
+    if key is not None and key.startswith('PHY['):
+        return 'PHY', value
+    return key, value
+
+
+VD_PARSER = TableParser([
+    Field('IR volume', 'id', to_int),
+    Field('Volume ID', 'volume_id', to_int),
+    Field('PI Supported', 'pi_supported'),
+    Field('Status of volume', 'status_of_volume'),
+    Field('Volume wwid', 'volume_wwid'),
+    Field('RAID level', 'raid_level'),
+    Field('Size (in MB)', 'size', to_int),
+    Field('PHY', 'physical_hard_disks', multi=True),
+], start='IR volume', stop='Physical device information',
+    splitter=_split_line)
+
+
 class VirtualDriver(object):
 
     def __init__(self, adapter_id=None, id=None):
@@ -45,52 +69,27 @@ class VirtualDriver(object):
         if self.adapter == None or self.id == None:
             raise exception.InvalidParameterValue()
 
-        cmd = '%s LIST| grep -w 1000 "IR volume %s"' % (self.adapter, self.id)
+        vd_id = int(self.id)
+        cmd = '%s DISPLAY' % self.adapter
         ret = self._get_client().command(cmd)
-        self._handle(ret, multi_vd=False)
+        for vd in VirtualDriver(adapter_id=self.adapter)._handle(ret):
+            if vd.id == vd_id:
+                self.__dict__.update(vd.__dict__)
+                return
+        raise exception.InvalidParameterValue(
+            'volume %s of adapter %s not found' % (self.id, self.adapter))
 
     def _get_client(self):
         return mega.Mega()
 
     def _handle(self, retstr, multi_vd=True):
         vds = []
-        for line in retstr:
-            if line.startswith('IR volume'):
-                if not multi_vd and len(vds) > 0:
-                    return vds[0]
-                offset = line.split(' ')
-                self.id = int(offset[-1])
-                if self.id is not None and multi_vd:
-                    vds.append(self.copy())
-                offset = line.split(' ')
-                self.id = int(offset[-1])
-            if line.startswith('  Volume ID'):
-                offset = line.find(':')
-                self.volume_id = int(line[offset + 1:].strip())
-            elif line.startswith('  PI Supported'):
-                offset = line.find(':')
-                self.pi_supported = line[offset + 1:].strip()
-            elif line.startswith('  Status of volume'):
-                offset = line.find(':')
-                self.status_of_volume = line[offset + 1:].strip()
-            elif line.startswith('  Volume wwid'):
-                offset = line.find(':')
-                self.volume_wwid = line[offset + 1:].strip()
-            elif line.startswith('  RAID level'):
-                offset = line.find(':')
-                self.raid_level = line[offset + 1:delim].strip()
-            elif line.startswith('  Size'):
-                offset = line.find(':')
-                self.size = int(line[offset + 1:].strip())
-            elif line.startswith('  Physical hard disks'):
-                offset = line.find(':')
-                if not self.physical_hard_disks:
-                    self.physical_hard_disks = []
-            elif line.startswith('  PHY'):
-                offset = line.find(':')
-                self.physical_hard_disks.append(line[offset + 1:].strip())
-            if self.id is not None:
-                vds.append(self.copy())
+        for values in VD_PARSER.parse(retstr):
+            if not multi_vd and len(vds) > 0:
+                return vds[0]
+            self.physical_hard_disks = None
+            self.__dict__.update(values)
+            vds.append(self.copy())
 
         return vds
 
@@ -108,30 +107,33 @@ class VirtualDriver(object):
         for disk in disks:
             if not re.match(disk_formater, disk):
                 raise exception.InvalidDiskFormater(disk=disk)
+        if raid_level not in mega.VOLUME_TYPES:
+            raise exception.InvalidParameterValue(
+                'sas3ircu supports raid levels %s only' %
+                ', '.join(sorted(mega.VOLUME_TYPES)))
 
-        if raid_level in [mega.RAID_0, mega.RAID_1, mega.mega.RAID_10]:
-            cmd = '%s CREATE %s MAX %s' % \
-                  (self.adapter, mega.RAID_LEVEL_INPUT_MAPPING.get(raid_level),
-                   ' '.join(disks))
-
-        ret = self._get_client().command(cmd)
-        self.id = None
-        for line in ret.readlines():
-            offset = line.find('Created VD')
-            if offset < 0:
-                continue
-            self.id = line[offset + 11:]
-            break
-        if not self.id:
-            raise exception.MegaCLIError()
-        self.__flush__()
+        cmd = '%s CREATE %s MAX %s noprompt' % \
+              (self.adapter, mega.VOLUME_TYPES[raid_level], ' '.join(disks))
+        self._get_client().command(cmd)
 
-    def destroy(self):
+        # sas3ircu does not print the id of the new volume, it is the one
+        # built of exactly these disks
+        cmd = '%s DISPLAY' % self.adapter
+        for vd in VirtualDriver(adapter_id=self.adapter)._handle(
+                self._get_client().command(cmd)):
+            if set(vd.physical_hard_disks or []) == set(disks):
+                self.__dict__.update(vd.__dict__)
+                return
+        raise exception.MegaCLIError()
+
+    def destroy(self, flush=True):
         """
         Delete this raid
+        :param flush: query the virtual driver first
         :return:
         """
-        self.__flush__()
+        if flush:
+            self.__flush__()
 
         cmd = '%s DELETEVOLUME %s' % (self.adapter, self.volume_id)
         self._get_client().command(cmd)
@@ -145,7 +147,7 @@ class VirtualDriver(object):
         if self.adapter == None:
             raise exception.InvalidParameterValue()
 
-        cmd = '%s LIST' % self.adapter
+        cmd = '%s DISPLAY' % self.adapter
         ret = self._get_client().command(cmd)
         return self._handle(ret, multi_vd=True)
 
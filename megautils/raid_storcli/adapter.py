@@ -0,0 +1,126 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+
+from oslo_log import log
+
+from megautils.raid_storcli import mega
+from megautils.raid import str2bool
+from megautils import exception
+from megautils.raid.adapter import AdapterRecord
+from megautils.record import RecordFacade
+from megautils.raid_storcli.physical_disk import PhysicalDisk
+from megautils.raid_storcli.virtual_driver import VirtualDriver
+
+LOG = log.getLogger(__name__)
+
+
+def adapter_record(adapter, response):
+    """
+    Build the record of a controller
+    :param adapter: controller id
+    :param response: response data of '/cN show all'
+    :return: AdapterRecord
+    """
+    basics = response.get('Basics', {})
+    version = response.get('Version', {})
+    hw_cfg = response.get('HwCfg', {})
+    return AdapterRecord(
+        id=adapter,
+        product_name=basics.get('Model', ''),
+        serial_number=basics.get('Serial Number', ''),
+        fw_package_build=version.get('Firmware Package Build', ''),
+        fw_version=version.get('Firmware Version', ''),
+        bios_version=version.get('Bios Version', ''),
+        webbios_version=version.get('WebBIOS Version', ''),
+        preboot_cli_version=version.get('Preboot CLI Version', ''),
+        boot_block_version=version.get('Boot Block Version', ''),
+        sas_address=basics.get('SAS Address', ''),
+        bbu_present=str2bool(hw_cfg.get('BBU', '')),
+        alarm_present=str2bool(hw_cfg.get('Alarm', '')),
+        nvram_present=str2bool(hw_cfg.get('NVRAM', '')),
+        serial_debugger_present=str2bool(hw_cfg.get('Serial Debugger', '')),
+        flash_present=str2bool(hw_cfg.get('Flash', '')),
+        memory_size=hw_cfg.get('On Board Memory Size', ''))
+
+
+class Adapter(RecordFacade):
+
+    def __init__(self, id=None):
+        self._record = AdapterRecord(id=id)
+
+    def __flush__(self):
+        if self.id is None:
+            raise exception.InvalidParameterValue()
+
+        data = self._get_client().command('/c%s show all' % self.id)
+        adapters = self._handle(data)
+        if adapters:
+            self._load(adapters[0]._record)
+            return adapters[0]
+        return None
+
+    def _get_client(self):
+        return mega.Mega()
+
+    def get_adapters(self):
+        data = self._get_client().command('/call show all')
+        return self._handle(data)
+
+    def _handle(self, data):
+        return [Adapter.from_record(adapter_record(adapter, response))
+                for adapter, response in mega.responses(data)]
+
+    def get_physical_drivers(self):
+        """
+        get all physical drivers which belongs to zhe adapter
+        :return: physical drivers
+        """
+        return PhysicalDisk(adapter=self.id).get_physical_disks()
+
+    def get_virtual_drivers(self):
+        """
+        get all virtual drivers which belongs to zhe adapter
+        :return: virtual drivers
+        """
+        return VirtualDriver(adapter_id=self.id).getall_virtual_drivers()
+
+    def destroy_virtual_drivers(self, virtual_drivers=None):
+        """
+        Delete virtual drivers of the adapter
+        :param virtual_drivers: virtual drivers to delete one by one, all
+                                virtual drivers are deleted with a single
+                                storcli call when not specified
+        """
+        if self.id is None:
+            raise exception.InvalidParameterValue()
+
+        if virtual_drivers is None:
+            try:
+                self._get_client().command('/c%s/vall del force' % self.id)
+                return
+            except exception.MegaCLIError:
+                LOG.warning('bulk delete failed on adapter %s, deleting '
+                            'virtual drivers one by one' % self.id)
+            virtual_drivers = VirtualDriver(
+                adapter_id=self.id).getall_virtual_drivers()
+
+        for virtual_driver in virtual_drivers:
+            LOG.debug('deleting virtual driver %s of adapter %s' %
+                      (virtual_driver.id, self.id))
+            virtual_driver.destroy(flush=False)
+
+    def copy(self):
+        return copy.deepcopy(self)
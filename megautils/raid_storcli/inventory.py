@@ -0,0 +1,133 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Raid inventory through storcli
+
+Same interface as megautils.raid.inventory, every kind of object of all
+controllers comes from a single storcli call.
+"""
+
+from megautils import smart
+from megautils.raid_storcli.mega import Mega
+from megautils.raid_storcli.adapter import Adapter
+from megautils.raid_storcli.physical_disk import PhysicalDisk
+from megautils.raid_storcli.virtual_driver import VirtualDriver
+from megautils.raid_storcli.virtual_driver import vd_records
+
+
+class Inventory(object):
+
+    def __init__(self):
+        self.adapters = []
+        self.physical_disks = {}
+        self.virtual_drivers = {}
+        self.members = {}
+        self.health = {}
+
+    def _get_client(self):
+        return Mega()
+
+    def collect_adapters(self):
+        """
+        Get all adapters with a single '/call show all'
+        :return: adapters
+        """
+        data = self._get_client().command('/call show all')
+        self.adapters = Adapter()._handle(data)
+        return self.adapters
+
+    def collect_physical_disks(self):
+        """
+        Get physical disks of all adapters with a single
+        '/call/eall/sall show all'
+        :return: dict of adapter id to physical disks
+        """
+        data = self._get_client().command('/call/eall/sall show all')
+        self.physical_disks = {}
+        for pd in PhysicalDisk()._handle(data):
+            self.physical_disks.setdefault(pd.adapter, []).append(pd)
+        return self.physical_disks
+
+    def collect_virtual_drivers(self):
+        """
+        Get virtual drivers of all adapters and their physical disks with
+        a single '/call/vall show all'
+        :return: dict of adapter id to virtual drivers
+        """
+        data = self._get_client().command('/call/vall show all')
+        self.virtual_drivers = {}
+        self.members = {}
+        for record, members in vd_records(data):
+            self.virtual_drivers.setdefault(record.adapter, []).append(
+                VirtualDriver.from_record(record))
+            self.members.setdefault(record.adapter, {})[record.id] = members
+        return self.virtual_drivers
+
+    def collect_health(self, workers=smart.DEFAULT_WORKERS):
+        """
+        Read the SMART data of the physical disks of all adapters, one
+        smartctl call per disk on at most workers threads. The physical
+        disks must be collected first.
+        :param workers: maximum number of concurrent smartctl calls
+        :return: dict of (adapter id, 'enclosure:slot') to health dict
+        """
+        targets = []
+        for adapter_id in sorted(self.physical_disks):
+            targets.extend(smart.megaraid_targets(
+                adapter_id, self.physical_disks[adapter_id]))
+        self.health = smart.collect(targets, workers)
+        return self.health
+
+    def collect(self):
+        """
+        Collect the whole inventory, three storcli calls in total
+        :return: self
+        """
+        self.collect_adapters()
+        self.collect_physical_disks()
+        self.collect_virtual_drivers()
+        return self
+
+    def get_physical_drivers(self, adapter_id):
+        return self.physical_disks.get(adapter_id, [])
+
+    def get_virtual_drivers(self, adapter_id):
+        return self.virtual_drivers.get(adapter_id, [])
+
+    def get_members(self, adapter_id, vd_id):
+        """
+        Get physical disks of a virtual driver
+        :param adapter_id: adapter id
+        :param vd_id: virtual driver id
+        :return: 'enclosure:slot' list
+        """
+        return self.members.get(adapter_id, {}).get(vd_id, [])
+
+    def get_health(self, adapter_id, pd):
+        """
+        Get the SMART data of a physical disk
+        :param adapter_id: adapter id
+        :param pd: physical disk
+        :return: health dict, None when it was not collected
+        """
+        return self.health.get(smart.disk_key(adapter_id, pd.enclosure,
+                                              pd.slot))
+
+    def all_physical_disks(self):
+        return [pd for adapter_id in sorted(self.physical_disks)
+                for pd in self.physical_disks[adapter_id]]
+
+    def all_virtual_drivers(self):
+        return [vd for adapter_id in sorted(self.virtual_drivers)
+                for vd in self.virtual_drivers[adapter_id]]
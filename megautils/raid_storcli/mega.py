@@ -0,0 +1,222 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""storcli executor
+
+storcli prints json with 'J' appended to a command. One call covers all
+controllers with /call, so the whole tree takes three calls: controllers,
+drives and virtual drives.
+
+The hardware managers still drive MegaCli, megautils.raid_storcli is a
+library for callers which have storcli only, with the API of
+megautils.raid.
+"""
+
+import json
+import os
+import re
+import subprocess
+
+from oslo_log import log
+from megautils import exception
+from megautils import instrumentation
+from megautils.cache import get_cache
+
+STORCLI_PATH = os.environ.get('MEGAUTILS_STORCLI_PATH',
+                              '/opt/MegaRAID/storcli/storcli64')
+LOG = log.getLogger()
+
+RAID_0 = '0'
+RAID_1 = '1'
+RAID_10 = '1+0'
+RAID_5 = '5'
+RAID_6 = '6'
+RAID_50 = '5+0'
+RAID_60 = '6+0'
+
+RAID_LEVEL_MIN_DISKS = {RAID_0: 1,
+                        RAID_1: 2,
+                        RAID_5: 3,
+                        RAID_6: 4,
+                        RAID_10: 4,
+                        RAID_50: 6,
+                        RAID_60: 8}
+
+RAID_LEVEL_INPUT_MAPPING = {
+    '0': 'r0',
+    '1': 'r1',
+    '5': 'r5',
+    '6': 'r6',
+    '1+0': 'r10',
+    '5+0': 'r50',
+    '6+0': 'r60'
+}
+
+# disks of a span of the spanned levels
+SPAN_DISKS = {RAID_10: 2, RAID_50: 3, RAID_60: 4}
+
+# storcli names to the MegaCli names of the megautils.raid records
+RAID_LEVEL_NAMES = {
+    'RAID0': 'Primary-0, Secondary-0, RAID Level Qualifier-0',
+    'RAID1': 'Primary-1, Secondary-0, RAID Level Qualifier-0',
+    'RAID5': 'Primary-5, Secondary-0, RAID Level Qualifier-3',
+    'RAID6': 'Primary-6, Secondary-0, RAID Level Qualifier-3',
+    'RAID10': 'Primary-1, Secondary-3, RAID Level Qualifier-0',
+    'RAID50': 'Primary-5, Secondary-3, RAID Level Qualifier-3',
+    'RAID60': 'Primary-6, Secondary-3, RAID Level Qualifier-3',
+}
+
+DRIVE_STATES = {'UGood': 'Unconfigured(good)',
+                'UGUnsp': 'Unconfigured(good)',
+                'UBad': 'Unconfigured(bad)',
+                'UBUnsp': 'Unconfigured(bad)',
+                'Onln': 'Online',
+                'Offln': 'Offline',
+                'GHS': 'Hotspare',
+                'DHS': 'Hotspare',
+                'Rbld': 'Rebuild',
+                'Cpybck': 'Copyback',
+                'JBOD': 'JBOD',
+                'Failed': 'Failed',
+                'Msng': 'Missing'}
+
+MEDIA_TYPES = {'HDD': 'Hard Disk Device',
+               'SSD': 'Solid State Device'}
+
+VD_STATES = {'Optl': 'Optimal',
+             'OfLn': 'Offline',
+             'Pdgd': 'Partially Degraded',
+             'Dgrd': 'Degraded',
+             'Rec': 'Recovery'}
+
+ACCESS_POLICIES = {'RW': 'Read/Write', 'R': 'Read Only', 'B': 'Blocked'}
+
+WRITE_POLICIES = {'WT': 'wt', 'WB': 'wb'}
+READ_POLICIES = {'NORA': 'nora', 'RA': 'ra', 'ADRA': 'ra'}
+IO_POLICIES = {'Direct': 'direct', 'Cached': 'cached'}
+
+OBJECT_PATTERN = re.compile(r'^/c(\d+|all)\b', re.IGNORECASE)
+
+STATUS_SUCCESS = 'Success'
+
+
+def parse_command(cmd):
+    """
+    Get the verb and the target controller of a storcli command
+    :param cmd: command string, e.g. '/c0/vall show all J'
+    :return: (verb, adapter) tuple, verb is lower cased and adapter is
+             'ALL' for /call
+    """
+    args = cmd.split()
+    verb = args[1].lower() if len(args) > 1 else ''
+    match = OBJECT_PATTERN.match(args[0]) if args else None
+    adapter = match.group(1).upper() if match else 'ALL'
+    return verb, adapter
+
+
+def responses(data):
+    """
+    Get the response data of every controller
+    :param data: parsed storcli output
+    :return: list of (controller id, response data) tuples
+    """
+    result = []
+    for controller in data.get('Controllers', []):
+        status = controller.get('Command Status', {})
+        result.append((status.get('Controller'),
+                       controller.get('Response Data', {})))
+    return result
+
+
+def cache_policy(value):
+    """
+    Convert a storcli cache code to the MegaCli cache policy
+    :param value: e.g. 'RWBD' or 'NRWTC'
+    :return: e.g. 'WriteBack, ReadAhead, Direct'
+    """
+    read = 'ReadAheadNone' if value.startswith('NR') else 'ReadAhead'
+    value = value[2:] if value.startswith('NR') else value[1:]
+    if value.startswith('AWB'):
+        write, value = 'Always WriteBack', value[3:]
+    elif value.startswith('WB'):
+        write, value = 'WriteBack', value[2:]
+    else:
+        write, value = 'WriteThrough', value[2:]
+    io = 'Cached' if value.startswith('C') else 'Direct'
+    return '%s, %s, %s' % (write, read, io)
+
+
+class Mega(object):
+
+    def __init__(self, path=STORCLI_PATH):
+        self.cli_path = path
+
+        if not os.path.exists(path):
+            raise exception.PathNotFound('path {0} not found'.format(path))
+
+    def command(self, cmd):
+        """
+        Execute a storcli command, 'J' is appended
+        :param cmd: command string
+        :return: parsed json output
+        """
+        verb, adapter = parse_command(cmd)
+        cache = get_cache()
+        is_read = verb == 'show'
+        if is_read:
+            out = cache.get(adapter, cmd)
+            if out is not None:
+                LOG.debug("Using cached output of 'storcli64 %s'" % cmd)
+                if instrumentation.enabled:
+                    instrumentation.record_cache_hit('storcli', verb)
+                return json.loads(out)
+        generation = cache.generation
+
+        LOG.debug("Excuting storcli 'storcli64 %s J'" % cmd)
+        if instrumentation.enabled:
+            start = instrumentation.timer()
+        proc = subprocess.Popen("{0} {1} J".format(self.cli_path, cmd),
+                                shell=True,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        out, err = proc.communicate()
+        if instrumentation.enabled:
+            instrumentation.record('storcli', verb,
+                                   instrumentation.timer() - start,
+                                   len(out), proc.returncode)
+        if not is_read:
+            cache.invalidate(adapter)
+
+        try:
+            data = json.loads(out)
+        except ValueError:
+            self._raise(proc.returncode, err)
+        for controller in data.get('Controllers', []):
+            status = controller.get('Command Status', {})
+            if status.get('Status') != STATUS_SUCCESS:
+                self._raise(proc.returncode, 'storcli %s failed: %s' % (
+                    cmd, status.get('Description')))
+        if proc.returncode:
+            self._raise(proc.returncode, err)
+
+        if is_read:
+            cache.set(adapter, cmd, out, generation)
+        return data
+
+    def _raise(self, returncode, err):
+        LOG.error(err)
+        ex = exception.MegaCLIError("storcli execute error!")
+        ex.exitcode = returncode
+        raise ex
@@ -0,0 +1,137 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import re
+
+from megautils.raid_storcli import mega
+from megautils import exception
+from megautils.parser import to_size_gb
+from megautils.raid.physical_disk import PhysicalDiskRecord
+from megautils.record import RecordFacade
+
+# 'Drive /c0/e252/s0', drives attached without enclosure have no /e
+DRIVE_KEY = re.compile(r'^Drive /c(\d+)(?:/e(\d+))?/s(\d+)$')
+
+
+def _size(value):
+    return to_size_gb(value) if value else ''
+
+
+def firmware_state(summary):
+    """
+    Get the MegaCli firmware state of a drive
+    :param summary: drive entry of a storcli drive list
+    :return: e.g. 'Unconfigured(good), Spun Up'
+    """
+    state = mega.DRIVE_STATES.get(summary.get('State'), summary.get('State'))
+    spin = summary.get('Sp')
+    if spin == 'U':
+        return '%s, Spun Up' % state
+    if spin == 'D':
+        return '%s, Spun down' % state
+    return state
+
+
+def drive_record(adapter, key, response):
+    """
+    Build the record of a drive
+    :param adapter: controller id
+    :param key: 'Drive /cN/eN/sN' key of the response data
+    :param response: response data of the controller
+    :return: PhysicalDiskRecord, None when key is not a drive
+    """
+    match = DRIVE_KEY.match(key)
+    if not match or not response[key]:
+        return None
+    summary = response[key][0]
+    details = response.get('%s - Detailed Information' % key, {})
+    state = details.get('%s State' % key, {})
+    attributes = details.get('%s Device attributes' % key, {})
+    policies = details.get('%s Policies/Settings' % key, {})
+    ports = policies.get('Port Information') or [{}]
+    return PhysicalDiskRecord(
+        adapter=adapter,
+        enclosure=int(match.group(2)) if match.group(2) else None,
+        slot=int(match.group(3)),
+        id=summary.get('DID'),
+        wwn=attributes.get('WWN', ''),
+        sequence_number=policies.get('Sequence Number', 0),
+        media_errors=state.get('Media Error Count', 0),
+        other_errors=state.get('Other Error Count', 0),
+        predictive_failures=state.get('Predictive Failure Count', 0),
+        last_predictive_seq_number=policies.get(
+            'Last Predictive Failure Event Sequence Number', 0),
+        pd_type=summary.get('Intf', ''),
+        raw_size=_size(attributes.get('Raw size') or summary.get('Size')),
+        non_coerced_size=_size(attributes.get('Non Coerced size')),
+        coerced_size=_size(attributes.get('Coerced size')),
+        firmware_state=firmware_state(summary),
+        sas_address=ports[0].get('SAS address', ''),
+        connected_port_number=policies.get('Connected Port Number',
+                                           '').strip(),
+        inquiry_data=details.get('Inquiry Data', ''),
+        fde_capable=policies.get('SED Capable', ''),
+        fde_enable=policies.get('SED Enabled', ''),
+        secured=policies.get('Secured', ''),
+        locked=policies.get('Locked', ''),
+        device_speed=attributes.get('Device Speed', ''),
+        link_speed=attributes.get('Link Speed', ''),
+        media_type=mega.MEDIA_TYPES.get(summary.get('Med'), ''))
+
+
+class PhysicalDisk(RecordFacade):
+
+    def __init__(self, enclosure=None, slot=None, adapter=None):
+        self._record = PhysicalDiskRecord(adapter=adapter, slot=slot,
+                                          enclosure=enclosure)
+
+    def _get_client(self):
+        return mega.Mega()
+
+    def __flush__(self):
+        if self.enclosure is None or self.slot is None or self.adapter is None:
+            raise exception.InvalidParameterValue()
+
+        data = self._get_client().command(self._list_command())
+        for record in self._iter_records(data):
+            self._load(record)
+
+    def _list_command(self):
+        if self.adapter is None:
+            return '/call/eall/sall show all'
+        elif self.enclosure is not None and self.slot is not None:
+            return '/c%s/e%s/s%s show all' % (self.adapter, self.enclosure,
+                                              self.slot)
+        else:
+            return '/c%s/eall/sall show all' % self.adapter
+
+    def get_physical_disks(self):
+        data = self._get_client().command(self._list_command())
+        return self._handle(data)
+
+    def _iter_records(self, data):
+        for adapter, response in mega.responses(data):
+            records = [drive_record(adapter, key, response)
+                       for key in response]
+            for record in sorted((r for r in records if r is not None),
+                                 key=lambda r: (r.enclosure, r.slot)):
+                yield record
+
+    def _handle(self, data):
+        return [PhysicalDisk.from_record(record)
+                for record in self._iter_records(data)]
+
+    def copy(self):
+        return copy.deepcopy(self)
@@ -0,0 +1,191 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import re
+
+from megautils.raid_storcli import mega
+from megautils import exception
+from megautils.raid.virtual_driver import VirtualDriveRecord
+from megautils.record import RecordFacade
+
+# '/c0/v1'
+VD_KEY = re.compile(r'^/c(\d+)/v(\d+)$')
+
+
+def _strip_unit(value, unit):
+    value = str(value).strip()
+    if value.endswith(unit):
+        value = value[:-len(unit)].strip()
+    return value
+
+
+def vd_records(data):
+    """
+    Build the records of the virtual drives of a 'show all' output
+    :param data: parsed storcli output
+    :return: list of (VirtualDriveRecord, 'enclosure:slot' list) tuples
+             ordered by controller and virtual drive
+    """
+    result = []
+    for adapter, response in mega.responses(data):
+        for key in response:
+            match = VD_KEY.match(key)
+            if not match or not response[key]:
+                continue
+            vd_id = int(match.group(2))
+            summary = response[key][0]
+            properties = response.get('VD%d Properties' % vd_id, {})
+            cache = mega.cache_policy(summary.get('Cache', ''))
+            record = VirtualDriveRecord(
+                adapter=adapter,
+                id=vd_id,
+                # storcli addresses virtual drives by their target id
+                target_id=vd_id,
+                name=summary.get('Name', ''),
+                raid_level=mega.RAID_LEVEL_NAMES.get(summary.get('TYPE'),
+                                                     summary.get('TYPE')),
+                size=_strip_unit(summary.get('Size', ''), 'GB'),
+                state=mega.VD_STATES.get(summary.get('State'),
+                                         summary.get('State')),
+                stripe_size=_strip_unit(properties.get('Strip Size', ''),
+                                        'KB'),
+                number_of_drives=properties.get('Number of Drives Per Span',
+                                                0),
+                span_depth=properties.get('Span Depth', 0),
+                default_cache_policy=cache,
+                current_cache_policy=cache,
+                access_policy=mega.ACCESS_POLICIES.get(
+                    summary.get('Access'), summary.get('Access')),
+                disk_cache_policy=properties.get('Disk Cache Policy', ''),
+                encryption=properties.get('Encryption', ''))
+            members = [pd['EID:Slt'] for pd in
+                       response.get('PDs for VD %d' % vd_id, [])]
+            result.append((record, members))
+    result.sort(key=lambda x: (x[0].adapter, x[0].id))
+    return result
+
+
+def _policy_args(write_policy, read_policy, io_policy, stripe_size_kb):
+    args = ''
+    for value, allowed in ((write_policy, mega.WRITE_POLICIES),
+                           (read_policy, mega.READ_POLICIES),
+                           (io_policy, mega.IO_POLICIES)):
+        if value is None:
+            continue
+        if value not in allowed:
+            raise exception.InvalidParameterValue(
+                '%s is not one of %s' % (value, ', '.join(sorted(allowed))))
+        args += ' %s' % allowed[value]
+    if stripe_size_kb is not None:
+        args += ' strip=%d' % int(stripe_size_kb)
+    return args
+
+
+class VirtualDriver(RecordFacade):
+
+    def __init__(self, adapter_id=None, id=None):
+        self._record = VirtualDriveRecord(adapter=adapter_id, id=id)
+
+    def __flush__(self):
+        if self.adapter is None or self.id is None:
+            raise exception.InvalidParameterValue()
+
+        cmd = '/c%s/v%s show all' % (self.adapter, self.id)
+        data = self._get_client().command(cmd)
+        for record, _ in vd_records(data):
+            self._load(record)
+            break
+
+    def _get_client(self):
+        return mega.Mega()
+
+    def _handle(self, data):
+        return [VirtualDriver.from_record(record)
+                for record, _ in vd_records(data)]
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+    def create(self, raid_level, disks, write_policy=None, read_policy=None,
+               io_policy=None, stripe_size_kb=None):
+        """
+        Create a virtual driver with disks
+        storcli does not report the id of the new virtual drive, it is the
+        one built of exactly these disks.
+        :param raid_level: raid level
+        :param disks: 'enclosure:slot' list
+        :param write_policy: 'WT' or 'WB'
+        :param read_policy: 'NORA', 'RA' or 'ADRA', storcli has no
+                            adaptive read ahead and uses 'RA' for it
+        :param io_policy: 'Direct' or 'Cached'
+        :param stripe_size_kb: strip size in KB
+        """
+        disk_formater = re.compile(r'^[0-9]+:[0-9]+$')
+        for disk in disks:
+            if not re.match(disk_formater, disk):
+                raise exception.InvalidDiskFormater(disk=disk)
+        if raid_level not in mega.RAID_LEVEL_INPUT_MAPPING:
+            raise exception.InvalidParameterValue(
+                'invalid raid level %s' % raid_level)
+
+        cmd = '/c%s add vd %s drives=%s' % (
+            self.adapter, mega.RAID_LEVEL_INPUT_MAPPING[raid_level],
+            ','.join(disks))
+        if raid_level in mega.SPAN_DISKS:
+            cmd += ' pdperarray=%d' % mega.SPAN_DISKS[raid_level]
+        cmd += _policy_args(write_policy, read_policy, io_policy,
+                            stripe_size_kb)
+        self._get_client().command(cmd)
+
+        data = self._get_client().command('/c%s/vall show all' % self.adapter)
+        for record, members in vd_records(data):
+            if set(members) == set(disks):
+                self._load(record)
+                return
+        raise exception.MegaCLIError()
+
+    def destroy(self, flush=True):
+        """
+        Delete this raid
+        :param flush: query the virtual driver first
+        """
+        if flush:
+            self.__flush__()
+
+        cmd = '/c%s/v%s del force' % (self.adapter, self.id)
+        self._get_client().command(cmd)
+        self.id = None
+
+    def getall_virtual_drivers(self):
+        """
+        Get all virtual drivers
+        :return: virtual drivers
+        """
+        if self.adapter is None:
+            raise exception.InvalidParameterValue()
+
+        cmd = '/c%s/vall show all' % self.adapter
+        return self._handle(self._get_client().command(cmd))
+
+    def set_boot_able(self, flush=True):
+        """
+        Set current virtual driver bootable
+        :param flush: query the virtual driver first
+        """
+        if flush:
+            self.__flush__()
+
+        cmd = '/c%s/v%s set bootdrive=on' % (self.adapter, self.id)
+        self._get_client().command(cmd)
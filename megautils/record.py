@@ -0,0 +1,62 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Immutable parsed records and the objects wrapping them"""
+
+import collections
+import sys
+
+
+def record_type(name, fields):
+    """
+    Build an immutable record type
+    :param name: type name
+    :param fields: list of (attribute, default value) tuples
+    :return: namedtuple type, attributes missing at creation get defaults
+    """
+    cls = collections.namedtuple(name, [attr for attr, _ in fields])
+    cls.__new__.__defaults__ = tuple(default for _, default in fields)
+    # let pickle find the type in the module declaring it
+    cls.__module__ = sys._getframe(1).f_globals.get('__name__', '__main__')
+    return cls
+
+
+class RecordFacade(object):
+    """Object backed by an immutable record
+
+    Attributes are read from the record unless they were set on the object,
+    so parsing builds a record once and never copies it.
+    """
+
+    _record = None
+
+    @classmethod
+    def from_record(cls, record):
+        obj = cls.__new__(cls)
+        obj._record = record
+        return obj
+
+    def _load(self, record):
+        """
+        Replace the record and drop the attributes set on the object
+        :param record: new record
+        """
+        self.__dict__.clear()
+        self._record = record
+
+    def __getattr__(self, name):
+        try:
+            return getattr(self._record, name)
+        except AttributeError:
+            raise AttributeError(name)
@@ -0,0 +1,176 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Stand-in executables of the simulator
+
+megautils-megacli-sim, megautils-storcli-sim, megautils-sas3ircu-sim and
+megautils-smartctl-sim take the arguments of MegaCli64, storcli64, sas3ircu
+and smartctl. Point megautils at them with MEGAUTILS_MEGACLI_PATH,
+MEGAUTILS_STORCLI_PATH, MEGAUTILS_SAS3IRCU_PATH and MEGAUTILS_SMARTCTL_PATH,
+and create their state first with:
+
+    megautils-sim init --controllers 4 --enclosures 2 --disks 64 \\
+        --latency '*=0.5' --latency -PdList=1.5
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from megautils.simulator import megacli
+from megautils.simulator import sas3ircu
+from megautils.simulator import smartctl
+from megautils.simulator import storcli
+from megautils.simulator import topology
+
+
+def _sleep(verb):
+    # outside of the state lock, so commands of concurrent callers overlap
+    delay = topology.latency_of(topology.load_state(), verb)
+    if delay:
+        time.sleep(delay)
+
+
+def megacli_main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    verb = args[0].lower() if args else ''
+    _sleep(verb)
+    with topology.open_state() as state:
+        topology.count_command(state, verb)
+        exitcode, out = megacli.MegaCli(state).run(args)
+    sys.stdout.write(out)
+    sys.stdout.flush()
+    return exitcode
+
+
+def storcli_main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    # '/c0/vall show all J' counts as 'SHOW', like --latency spells it
+    verb = args[1].upper() if len(args) > 1 else ''
+    _sleep(verb)
+    with topology.open_state() as state:
+        topology.count_command(state, verb)
+        exitcode, out = storcli.Storcli(state).run(args)
+    sys.stdout.write(out)
+    sys.stdout.flush()
+    return exitcode
+
+
+def sas3ircu_main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if args and args[0].isdigit():
+        verb = args[1].upper() if len(args) > 1 else ''
+    else:
+        verb = args[0].upper() if args else ''
+
+    answer = [None]
+
+    def confirm():
+        if answer[0] is None:
+            sys.stdout.write('Are you sure you want to continue? (YES/NO)? ')
+            sys.stdout.flush()
+            answer[0] = sys.stdin.readline().strip().upper() == 'YES'
+        return answer[0]
+
+    if verb in sas3ircu.DESTRUCTIVE_VERBS and \
+            'noprompt' not in [a.lower() for a in args]:
+        confirm()
+    _sleep(verb)
+    with topology.open_state() as state:
+        topology.count_command(state, verb)
+        exitcode, out = sas3ircu.Sas3ircu(state).run(args, confirm=confirm)
+    sys.stdout.write(out)
+    sys.stdout.flush()
+    return exitcode
+
+
+def smartctl_main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    # every disk is one call, '--latency SMARTCTL=2' slows them all
+    verb = 'SMARTCTL'
+    _sleep(verb)
+    with topology.open_state() as state:
+        topology.count_command(state, verb)
+        exitcode, out = smartctl.Smartctl(state).run(args)
+    sys.stdout.write(out)
+    sys.stdout.flush()
+    return exitcode
+
+
+def _latency(values):
+    latency = {}
+    for value in values or []:
+        verb, _, seconds = value.partition('=')
+        if verb != '*':
+            verb = verb.lower() if verb.startswith('-') else verb.upper()
+        latency[verb] = float(seconds)
+    return latency
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='megautils-sim')
+    parser.add_argument('--state', help='state file, defaults to $%s or %s'
+                        % (topology.STATE_ENV, topology.DEFAULT_STATE_PATH))
+    commands = parser.add_subparsers(dest='command')
+
+    init = commands.add_parser('init', help='create a topology')
+    init.add_argument('--family', default=topology.FAMILY_MEGARAID,
+                      choices=[topology.FAMILY_MEGARAID, topology.FAMILY_SAS3])
+    init.add_argument('--controllers', type=int, default=1)
+    init.add_argument('--enclosures', type=int, default=1,
+                      help='enclosures per controller')
+    init.add_argument('--disks', type=int, default=24,
+                      help='disks per enclosure')
+    init.add_argument('--ssds', type=int, default=0,
+                      help='ssds among the disks of an enclosure')
+    init.add_argument('--hdd-size', type=float, default=1862.5,
+                      help='hdd size in GB')
+    init.add_argument('--ssd-size', type=float, default=446.625,
+                      help='ssd size in GB')
+    init.add_argument('--latency', action='append', metavar='VERB=SECONDS',
+                      help="per command latency, '*' for every command")
+
+    sysfs = commands.add_parser(
+        'sysfs', help='write the pci devices and scsi hosts of the '
+                      'controllers as a sysfs tree for MEGAUTILS_SYSFS_ROOT')
+    sysfs.add_argument('root', help='directory standing in for /sys')
+
+    commands.add_parser('stats', help='print command counts')
+    commands.add_parser('reset-stats', help='reset command counts')
+
+    args = parser.parse_args(argv)
+    if args.command == 'init':
+        state = topology.build_topology(
+            controllers=args.controllers, enclosures=args.enclosures,
+            disks_per_enclosure=args.disks, ssds_per_enclosure=args.ssds,
+            hdd_size_gb=args.hdd_size, ssd_size_gb=args.ssd_size,
+            family=args.family, latency=_latency(args.latency))
+        topology.save_state(state, args.state)
+    elif args.command == 'sysfs':
+        topology.write_sysfs(topology.load_state(args.state), args.root)
+    elif args.command == 'stats':
+        print(json.dumps(topology.load_state(args.state).get('stats', {}),
+                         indent=2, sort_keys=True))
+    elif args.command == 'reset-stats':
+        with topology.open_state(args.state) as state:
+            state['stats'] = {}
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
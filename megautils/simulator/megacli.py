@@ -0,0 +1,809 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""MegaCli emulation"""
+
+import re
+import time
+
+from megautils.simulator import topology
+
+RAID_LEVELS = {
+    '0': ('0', 'Primary-0, Secondary-0, RAID Level Qualifier-0'),
+    '1': ('1', 'Primary-1, Secondary-0, RAID Level Qualifier-0'),
+    '5': ('5', 'Primary-5, Secondary-0, RAID Level Qualifier-3'),
+    '6': ('6', 'Primary-6, Secondary-0, RAID Level Qualifier-3'),
+    '10': ('1+0', 'Primary-1, Secondary-3, RAID Level Qualifier-0'),
+    '50': ('5+0', 'Primary-5, Secondary-3, RAID Level Qualifier-3'),
+    '60': ('6+0', 'Primary-6, Secondary-3, RAID Level Qualifier-3'),
+}
+
+# minimum disks of an array (a span for spanned levels)
+MIN_ARRAY_DISKS = {'0': 1, '1': 2, '5': 3, '6': 3,
+                   '1+0': 2, '5+0': 3, '6+0': 3}
+
+WRITE_POLICIES = {'WT': 'WriteThrough', 'WB': 'WriteBack'}
+READ_POLICIES = {'NORA': 'ReadAheadNone', 'RA': 'ReadAhead',
+                 'ADRA': 'ReadAdaptive'}
+IO_POLICIES = {'DIRECT': 'Direct', 'CACHED': 'Cached'}
+CACHECADE_WRITE_POLICIES = {'-WT': 'WT', '-WB': 'WB', '-FORCEDWB': 'WB'}
+
+# simulated initialization time, overridden by state['init_seconds_per_gb']
+INIT_SECONDS_PER_GB = {'fast': 0, 'full': 0.002, 'background': 0.001}
+# simulated consistency check, rebuild and clear time, overridden by
+# state['operation_seconds_per_gb']
+OPERATION_SECONDS_PER_GB = {'consistency_check': 0.001, 'rebuild': 0.002,
+                            'clear': 0.002}
+
+DEFAULT_PROPERTIES = {'rebuild_rate': 30, 'cc_rate': 30,
+                      'patrol_read_rate': 30, 'bgi_rate': 30,
+                      'recon_rate': 30, 'cache_flush_interval': 4,
+                      'ncq': True, 'spinup_drive_count': 2,
+                      'spinup_delay': 12}
+# -AdpGetProp argument to (property, printed text)
+PROPERTY_FORMATS = {
+    'rebuildrate': ('rebuild_rate', lambda v: 'Rebuild Rate = %d%%' % v),
+    'ccrate': ('cc_rate', lambda v: 'Check Consistency Rate = %d%%' % v),
+    'patrolreadrate': ('patrol_read_rate',
+                       lambda v: 'Patrol Read Rate = %d%%' % v),
+    'bgirate': ('bgi_rate', lambda v: 'BGI Rate = %d%%' % v),
+    'reconrate': ('recon_rate', lambda v: 'Reconstruction Rate = %d%%' % v),
+    'cacheflushinterval': ('cache_flush_interval',
+                           lambda v: 'Cache Flush Interval = %d Seconds' % v),
+    'ncqdsply': ('ncq',
+                 lambda v: 'NCQ is %s' % ('Enabled' if v else 'Disabled')),
+    'spinupdrivecount': ('spinup_drive_count',
+                         lambda v: 'Spin Up Drive Count = %d' % v),
+    'spinupdelay': ('spinup_delay',
+                    lambda v: 'Spin Up Delay = %d Seconds' % v),
+}
+
+ADAPTER_ARG = re.compile(r'^-a(\d+|ALL)$', re.IGNORECASE)
+LD_ARG = re.compile(r'^-L(\d+|ALL)$', re.IGNORECASE)
+RAID_ARG = re.compile(r'^-r(\d+)$', re.IGNORECASE)
+ARRAY_ARG = re.compile(r'^-Array\d+\[(.*)\]$', re.IGNORECASE)
+STRIP_ARG = re.compile(r'^-strpsz(\d+)$', re.IGNORECASE)
+LD_LIST_ARG = re.compile(r'^-L([\d,]+|ALL)$', re.IGNORECASE)
+PHYSDRV_ARG = re.compile(r'^-Physdrv\[(.*)\]$', re.IGNORECASE)
+
+
+class CommandError(Exception):
+
+    def __init__(self, message, exitcode=1):
+        super(CommandError, self).__init__(message)
+        self.exitcode = exitcode
+
+
+def format_size(size_gb):
+    if size_gb >= 1024:
+        return '%.3f TB' % (size_gb / 1024.0)
+    return '%.3f GB' % size_gb
+
+
+def _sectors(size_gb):
+    return '0x%x' % int(size_gb * 1024 * 1024 * 2)
+
+
+def _data_disks(raid_level, disks):
+    if raid_level in ('0',):
+        return disks
+    if raid_level in ('1', '1+0'):
+        return disks // 2
+    if raid_level in ('5', '5+0'):
+        return disks - 1
+    return disks - 2
+
+
+class MegaCli(object):
+
+    def __init__(self, state):
+        self.state = state
+        self.controllers = topology.controllers_of(
+            state, topology.FAMILY_MEGARAID)
+
+    def run(self, args):
+        """
+        Run a MegaCli command against the state
+        :param args: MegaCli arguments
+        :return: (exit code, output) tuple
+        """
+        args = [a for a in args if a.lower() != '-nolog']
+        if not args:
+            return 1, 'Invalid input at or near token\n\nExit Code: 0x01\n'
+        handler = getattr(self, '_do_' + args[0].lstrip('-').lower(), None)
+        if handler is None:
+            return 1, ('Invalid input at or near token %s\n\n'
+                       'Exit Code: 0x01\n' % args[0])
+        try:
+            out = handler(args[1:])
+        except CommandError as e:
+            return e.exitcode, '%s\n\nExit Code: 0x%02x\n' % (e, e.exitcode)
+        return 0, out + '\nExit Code: 0x00\n'
+
+    def _adapters(self, args):
+        for arg in args:
+            match = ADAPTER_ARG.match(arg)
+            if match:
+                if match.group(1).upper() == 'ALL':
+                    return list(enumerate(self.controllers))
+                index = int(match.group(1))
+                if index >= len(self.controllers):
+                    raise CommandError('Invalid adapter %s' % index)
+                return [(index, self.controllers[index])]
+        raise CommandError('Adapter number is missing')
+
+    def _adapter(self, args):
+        adapters = self._adapters(args)
+        if len(adapters) != 1:
+            raise CommandError('Only a single adapter is supported')
+        return adapters[0]
+
+    def _ld(self, args):
+        for arg in args:
+            match = LD_ARG.match(arg)
+            if match:
+                return match.group(1).upper()
+        raise CommandError('Virtual drive number is missing')
+
+    def _disk(self, controller, spec):
+        enclosure, slot = [int(x) for x in spec.strip().split(':')]
+        for disk in controller['disks']:
+            if disk['enclosure'] == enclosure and disk['slot'] == slot:
+                return disk
+        raise CommandError('Physical drive %s not found' % spec)
+
+    def _volume(self, controller, vd_id):
+        for volume in controller['volumes']:
+            if volume['id'] == vd_id:
+                return volume
+        raise CommandError('Virtual drive %s does not exist' % vd_id)
+
+    def _volumes(self, controller, ld):
+        if ld == 'ALL':
+            return list(controller['volumes'])
+        return [self._volume(controller, int(ld))]
+
+    # queries
+
+    def _do_adpcount(self, args):
+        return '\nController Count: %d.\n' % len(self.controllers)
+
+    def _do_adpallinfo(self, args):
+        out = []
+        for index, controller in self._adapters(args):
+            out.append(
+                '\nAdapter #%d\n\n'
+                '%s\n'
+                '                    Versions\n'
+                '                ================\n'
+                'Product Name    : LSI MegaRAID SAS 9361-8i\n'
+                'Serial No       : %s\n'
+                'FW Package Build: 24.21.0-0097\n\n'
+                '                Image Versions in Flash:\n'
+                '                ================\n'
+                'BIOS Version       : 6.36.00.3_4.19.08.00_0x06180203\n'
+                'WebBIOS Version    : 7.05-02-1\n'
+                'Preboot CLI Version: 01.07-05:#%%0001\n'
+                'FW Version         : 4.740.00-8394\n'
+                'Boot Block Version : 3.07.00.00-0003\n\n'
+                '                PCI Info\n'
+                '                ================\n'
+                'SAS Address      : %s\n'
+                '                HW Configuration\n'
+                '                ================\n'
+                'BBU              : Present\n'
+                'Alarm            : Absent\n'
+                'NVRAM            : Present\n'
+                'Serial Debugger  : Present\n'
+                'Memory           : Present\n'
+                'Flash            : Present\n'
+                'Memory Size      : 1024MB\n\n'
+                '                Device Present\n'
+                '                ================\n'
+                'Virtual Drives    : %d\n'
+                'Disks             : %d\n'
+                % (index, '=' * 78, controller['serial_number'],
+                   controller['sas_address'], len(controller['volumes']),
+                   len(controller['disks'])))
+        return ''.join(out)
+
+    def _render_disk(self, disk):
+        return (
+            'Enclosure Device ID: %(enclosure)d\n'
+            'Slot Number: %(slot)d\n'
+            'Enclosure position: 1\n'
+            'Device Id: %(id)d\n'
+            'WWN: %(wwn)s\n'
+            'Sequence Number: 2\n'
+            'Media Error Count: 0\n'
+            'Other Error Count: 0\n'
+            'Predictive Failure Count: 0\n'
+            'Last Predictive Failure Event Seq Number: 0\n'
+            'PD Type: %(pd_type)s\n\n'
+            'Raw Size: %(raw)s [%(raw_sectors)s Sectors]\n'
+            'Non Coerced Size: %(non_coerced)s '
+            '[%(non_coerced_sectors)s Sectors]\n'
+            'Coerced Size: %(coerced)s [%(coerced_sectors)s Sectors]\n'
+            'Sector Size:  512\n'
+            'Firmware state: %(state)s\n'
+            'Device Firmware Level: SIM1\n'
+            'Shield Counter: 0\n'
+            'Successful diagnostics completion on :  N/A\n'
+            'SAS Address(0): %(sas_address)s\n'
+            'SAS Address(1): 0x0\n'
+            'Connected Port Number: %(port)d(path0) \n'
+            'Inquiry Data: SIMULATED %(media_name)-16s %(serial)s\n'
+            'FDE Capable: Not Capable\n'
+            'FDE Enable: Disable\n'
+            'Secured: Unsecured\n'
+            'Locked: Unlocked\n'
+            'Needs EKM Attention: No\n'
+            'Foreign State: None \n'
+            'Device Speed: 12.0Gb/s \n'
+            'Link Speed: 12.0Gb/s \n'
+            'Media Type: %(media_type)s\n'
+            'Drive Temperature :30C (86.00 F)\n'
+            'PI Eligibility:  No \n'
+            'Drive is formatted for PI information:  No\n'
+            'PI: No PI\n'
+            'Port-0 :\n'
+            'Port status: Active\n'
+            "Port's Linkspeed: 12.0Gb/s \n"
+            'Drive has flagged a S.M.A.R.T alert : No\n\n\n\n'
+            % dict(disk,
+                   pd_type='SATA' if disk['media'] == topology.MEDIA_SSD
+                   else 'SAS',
+                   raw=format_size(disk['size_gb']),
+                   raw_sectors=_sectors(disk['size_gb']),
+                   non_coerced=format_size(disk['size_gb'] - 0.5),
+                   non_coerced_sectors=_sectors(disk['size_gb'] - 0.5),
+                   coerced=format_size(disk['size_gb'] - 0.521),
+                   coerced_sectors=_sectors(disk['size_gb'] - 0.521),
+                   media_name=disk['media'].upper(),
+                   media_type='Solid State Device'
+                   if disk['media'] == topology.MEDIA_SSD
+                   else 'Hard Disk Device'))
+
+    def _do_pdlist(self, args):
+        out = []
+        for index, controller in self._adapters(args):
+            out.append('\nAdapter #%d\n\n' % index)
+            for disk in controller['disks']:
+                out.append(self._render_disk(disk))
+        return ''.join(out)
+
+    def _do_pdinfo(self, args):
+        index, controller = self._adapter(args)
+        specs = [a for a in args if a.startswith('[') or
+                 a.lower().startswith('-physdrv[')]
+        if not specs:
+            raise CommandError('Physical drive is missing')
+        spec = specs[0][specs[0].index('[') + 1:specs[0].index(']')]
+        return '\n' + self._render_disk(self._disk(controller, spec))
+
+    def _render_volume(self, volume):
+        return (
+            'Virtual Drive: %(id)d (Target Id: %(id)d)\n'
+            'Name                :%(name)s\n'
+            'RAID Level          : %(raid_name)s\n'
+            'Size                : %(size)s\n'
+            'Sector Size         : 512\n'
+            'State               : Optimal\n'
+            'Strip Size          : %(strip_kb)d KB\n'
+            '%(drives)s'
+            'Span Depth          : %(span_depth)d\n'
+            'Default Cache Policy: %(cache_policy)s\n'
+            'Current Cache Policy: %(cache_policy)s\n'
+            'Default Access Policy: Read/Write\n'
+            'Current Access Policy: Read/Write\n'
+            'Disk Cache Policy   : %(disk_cache)s\n'
+            'Encryption Type     : None\n'
+            'Bad Blocks Exist: No\n'
+            'Is VD Cached: No\n'
+            % dict(volume,
+                   raid_name=RAID_LEVELS[
+                       _input_level(volume['raid_level'])][1],
+                   size=format_size(volume['size_gb']),
+                   drives=('Number Of Drives per span:%d\n'
+                           % len(volume['spans'][0])
+                           if len(volume['spans']) > 1 else
+                           'Number Of Drives    : %d\n'
+                           % len(volume['spans'][0])),
+                   span_depth=len(volume['spans'])))
+
+    def _do_ldinfo(self, args):
+        ld = self._ld(args)
+        out = []
+        for index, controller in self._adapters(args):
+            out.append('\n\nAdapter %d -- Virtual Drive Information:\n'
+                       % index)
+            for volume in self._volumes(controller, ld):
+                out.append(self._render_volume(volume) + '\n\n')
+        return ''.join(out)
+
+    def _do_ldpdinfo(self, args):
+        out = []
+        for index, controller in self._adapters(args):
+            out.append('\nAdapter #%d\n\nNumber of Virtual Disks: %d\n'
+                       % (index, len(controller['volumes'])))
+            for volume in controller['volumes']:
+                out.append(self._render_volume(volume))
+                out.append('Number of Spans: %d\n' % len(volume['spans']))
+                pd_index = 0
+                for span_index, span in enumerate(volume['spans']):
+                    out.append('Span: %d - Number of PDs: %d\n'
+                               % (span_index, len(span)))
+                    for spec in span:
+                        out.append('\nPD: %d Information\n' % pd_index)
+                        out.append(self._render_disk(
+                            self._disk(controller, spec)))
+                        pd_index += 1
+        return ''.join(out)
+
+    # configuration
+
+    def _free_disks(self, controller, specs):
+        disks = [self._disk(controller, spec) for spec in specs]
+        for disk in disks:
+            if disk['state'] != topology.STATE_UNCONFIGURED:
+                raise CommandError(
+                    'The specified physical disk does not have the '
+                    'appropriate attributes to complete the requested '
+                    'command.', 0x54)
+        if len(set(d['media'] for d in disks)) > 1:
+            raise CommandError('Mixing of SSD and HDD is not supported',
+                               0x54)
+        return disks
+
+    def _add_volume(self, index, controller, raid_level, spans, args):
+        options = [a.upper() for a in args]
+        write = [WRITE_POLICIES[o] for o in options if o in WRITE_POLICIES]
+        read = [READ_POLICIES[o] for o in options if o in READ_POLICIES]
+        io = [IO_POLICIES[o] for o in options if o in IO_POLICIES]
+        strip_kb = 64
+        for arg in args:
+            match = STRIP_ARG.match(arg)
+            if match:
+                strip_kb = int(match.group(1))
+
+        disks = []
+        for span in spans:
+            if len(span) < MIN_ARRAY_DISKS[raid_level]:
+                raise CommandError('Invalid number of physical drives')
+            disks.append(self._free_disks(controller, span))
+        if raid_level in ('1+0', '5+0', '6+0') and len(spans) < 2:
+            raise CommandError('Spanned RAID levels need two arrays at least')
+
+        vd_id = self._next_id(controller)
+        member_size = min(d['size_gb'] for span in disks for d in span)
+        size_gb = sum(_data_disks(raid_level, len(span)) * member_size
+                      for span in disks)
+        for span in disks:
+            for disk in span:
+                disk['state'] = topology.STATE_ONLINE
+        controller['volumes'].append({
+            'id': vd_id,
+            'name': '',
+            'raid_level': raid_level,
+            'spans': [['%d:%d' % (d['enclosure'], d['slot']) for d in span]
+                      for span in disks],
+            'size_gb': size_gb,
+            'strip_kb': strip_kb,
+            'cache_policy': '%s, %s, %s, No Write Cache if Bad BBU' % (
+                (write or ['WriteBack'])[0], (read or ['ReadAdaptive'])[0],
+                (io or ['Direct'])[0]),
+            'disk_cache': "Disk's Default",
+        })
+        controller['volumes'].sort(key=lambda v: v['id'])
+        return ('Adapter %d: Created VD %d\n\n'
+                'Adapter %d: Configured the Adapter!!\n' %
+                (index, vd_id, index))
+
+    def _raid_level(self, args):
+        for arg in args:
+            match = RAID_ARG.match(arg)
+            if match and match.group(1) in RAID_LEVELS:
+                return RAID_LEVELS[match.group(1)][0]
+        raise CommandError('Invalid RAID level')
+
+    def _do_cfgldadd(self, args):
+        index, controller = self._adapter(args)
+        raid_level = self._raid_level(args)
+        if raid_level in ('1+0', '5+0', '6+0'):
+            raise CommandError('Use -CfgSpanAdd for spanned RAID levels')
+        specs = [a for a in args if a.startswith('[')]
+        if not specs:
+            # the disk list may be glued to the level, -r1[8:0,8:1]
+            specs = [a[a.index('['):] for a in args
+                     if RAID_ARG.match(a.split('[')[0]) and '[' in a]
+        if not specs:
+            raise CommandError('Physical drives are missing')
+        span = [s for s in specs[0].strip('[]').split(',') if s]
+        return self._add_volume(index, controller, raid_level, [span], args)
+
+    def _do_cfgspanadd(self, args):
+        index, controller = self._adapter(args)
+        raid_level = self._raid_level(args)
+        if raid_level not in ('1+0', '5+0', '6+0'):
+            raid_level = {'1': '1+0', '5': '5+0', '6': '6+0'}.get(
+                raid_level, raid_level)
+        spans = []
+        for arg in args:
+            match = ARRAY_ARG.match(arg)
+            if match:
+                spans.append([s for s in match.group(1).split(',') if s])
+        if not spans:
+            raise CommandError('Arrays are missing')
+        return self._add_volume(index, controller, raid_level, spans, args)
+
+    def _next_id(self, controller):
+        # CacheCade volumes share the target ids of virtual drives
+        used_ids = set(v['id'] for v in controller['volumes'] +
+                       controller.get('cachecade', []))
+        vd_id = 0
+        while vd_id in used_ids:
+            vd_id += 1
+        return vd_id
+
+    def _release(self, controller, volume):
+        for span in volume['spans']:
+            for spec in span:
+                self._disk(controller, spec)['state'] = \
+                    topology.STATE_UNCONFIGURED
+        controller['volumes'].remove(volume)
+        if controller.get('boot_volume') == volume['id']:
+            controller['boot_volume'] = None
+
+    def _do_cfglddel(self, args):
+        index, controller = self._adapter(args)
+        out = []
+        volumes = self._volumes(controller, self._ld(args))
+        cached = set(vd_id for cache in controller.get('cachecade', [])
+                     for vd_id in cache['volumes'])
+        for volume in volumes:
+            if volume['id'] in cached:
+                raise CommandError('Virtual drive %d is associated with a '
+                                   'CacheCade volume' % volume['id'])
+        for volume in volumes:
+            self._release(controller, volume)
+            out.append('Adapter %d: Deleted Virtual Drive-%d(target id-%d)\n'
+                       % (index, volume['id'], volume['id']))
+        return ''.join(out)
+
+    def _do_ldsetprop(self, args):
+        index, controller = self._adapter(args)
+        options = [a.lower() for a in args]
+        if '-endskcache' in options:
+            disk_cache = 'Enabled'
+        elif '-disdskcache' in options:
+            disk_cache = 'Disabled'
+        else:
+            raise CommandError('Unsupported property')
+        out = []
+        for volume in self._volumes(controller, self._ld(args)):
+            volume['disk_cache'] = disk_cache
+            out.append('Set Disk Cache Policy to %s on Adapter %d, VD %d '
+                       '(target id: %d) success\n' %
+                       (disk_cache, index, volume['id'], volume['id']))
+        return ''.join(out)
+
+    def _do_cfgcachecadeadd(self, args):
+        index, controller = self._adapter(args)
+        raid_level = '0'
+        for arg in args:
+            match = RAID_ARG.match(arg)
+            if match:
+                raid_level = match.group(1)
+        if raid_level not in ('0', '1'):
+            raise CommandError('Invalid CacheCade RAID level')
+        specs = None
+        volumes = []
+        write_policy = 'WT'
+        for position, arg in enumerate(args):
+            option = arg.upper()
+            if option in CACHECADE_WRITE_POLICIES:
+                write_policy = CACHECADE_WRITE_POLICIES[option]
+            elif option in WRITE_POLICIES:
+                # the write policy is an option of -CfgCacheCadeAdd
+                raise CommandError('Invalid input at or near token %s'
+                                   % arg)
+            match = PHYSDRV_ARG.match(arg)
+            if match:
+                specs = [s for s in match.group(1).split(',') if s]
+            match = LD_LIST_ARG.match(arg)
+            if match:
+                # the virtual drivers to cache follow '-assign'
+                if position == 0 or args[position - 1].lower() != '-assign':
+                    raise CommandError('Invalid input at or near token %s'
+                                       % arg)
+                volumes = [v['id'] for v in controller['volumes']] \
+                    if match.group(1).upper() == 'ALL' else \
+                    [int(x) for x in match.group(1).split(',') if x]
+        if not specs or len(specs) < MIN_ARRAY_DISKS[raid_level]:
+            raise CommandError('Invalid number of physical drives')
+        disks = self._free_disks(controller, specs)
+        if any(d['media'] != topology.MEDIA_SSD for d in disks):
+            raise CommandError('CacheCade needs solid state drives', 0x54)
+        for vd_id in volumes:
+            self._volume(controller, vd_id)
+        for disk in disks:
+            disk['state'] = topology.STATE_ONLINE
+        vd_id = self._next_id(controller)
+        member_size = min(d['size_gb'] for d in disks)
+        controller.setdefault('cachecade', []).append({
+            'id': vd_id,
+            'raid_level': raid_level,
+            'disks': specs,
+            'size_gb': _data_disks(raid_level, len(disks)) * member_size,
+            'write_policy': write_policy,
+            'volumes': volumes,
+        })
+        return ('Adapter %d: Created VD %d\n\n'
+                'Adapter %d: Configured the Adapter!!\n' %
+                (index, vd_id, index))
+
+    def _do_cfgcachecadedel(self, args):
+        index, controller = self._adapter(args)
+        match = None
+        for arg in args:
+            match = LD_LIST_ARG.match(arg)
+            if match:
+                break
+        if match is None:
+            raise CommandError('Virtual drive number is missing')
+        caches = controller.get('cachecade', [])
+        if match.group(1).upper() != 'ALL':
+            ids = [int(x) for x in match.group(1).split(',') if x]
+            missing = set(ids) - set(c['id'] for c in caches)
+            if missing:
+                raise CommandError('CacheCade volume %s does not exist' %
+                                   min(missing))
+            caches = [c for c in caches if c['id'] in ids]
+        out = []
+        for cache in list(caches):
+            for spec in cache['disks']:
+                self._disk(controller, spec)['state'] = \
+                    topology.STATE_UNCONFIGURED
+            controller['cachecade'].remove(cache)
+            out.append('Adapter %d: Deleted CacheCade Virtual Drive-%d\n'
+                       % (index, cache['id']))
+        return ''.join(out)
+
+    def _do_cfgcachecadedsply(self, args):
+        out = []
+        for index, controller in self._adapters(args):
+            caches = controller.get('cachecade', [])
+            out.append('\nAdapter %d: CacheCade Configuration Information\n'
+                       'Number of CacheCade Virtual Drives: %d\n'
+                       % (index, len(caches)))
+            for cache in caches:
+                out.append(
+                    '\nCacheCade Virtual Drive: %(id)d (Target Id: %(id)d)\n'
+                    'Name                : \n'
+                    'Cache Type          : %(cache_type)s\n'
+                    'RAID Level          : Primary-%(raid_level)s, '
+                    'Secondary-0, RAID Level Qualifier-0\n'
+                    'Size                : %(size)s\n'
+                    'State               : Optimal\n'
+                    'Target Id of the Associated LDs : %(volumes)s\n'
+                    % dict(cache,
+                           cache_type='Write Back'
+                           if cache['write_policy'] == 'WB'
+                           else 'Write Through',
+                           size=format_size(cache['size_gb']),
+                           volumes=','.join(str(v) for v in cache['volumes'])
+                           or 'None'))
+        return ''.join(out)
+
+    def _start_init(self, volume, kind):
+        rates = dict(INIT_SECONDS_PER_GB,
+                     **self.state.get('init_seconds_per_gb', {}))
+        volume['init'] = {'kind': kind, 'started': time.time(),
+                          'seconds': rates[kind] * volume['size_gb']}
+
+    def _init_progress(self, volume, kinds):
+        init = volume.get('init')
+        if not init or init['kind'] not in kinds:
+            return None
+        elapsed = time.time() - init['started']
+        if elapsed >= init['seconds']:
+            return None
+        return int(100 * elapsed / init['seconds']), int(elapsed // 60)
+
+    def _do_ldinit(self, args):
+        index, controller = self._adapter(args)
+        options = [a.lower() for a in args]
+        out = []
+        for volume in self._volumes(controller, self._ld(args)):
+            if '-showprog' in options:
+                progress = self._init_progress(volume, ('fast', 'full'))
+                if progress is None:
+                    out.append('Initialization on VD #%d is not in Progress.\n'
+                               % volume['id'])
+                else:
+                    out.append('Initialization on VD #%d (target id #%d) '
+                               'Completed %d%% in %d Minutes.\n' %
+                               ((volume['id'], volume['id']) + progress))
+            elif '-start' in options:
+                kind = 'full' if '-full' in options else 'fast'
+                self._start_init(volume, kind)
+                out.append('Start %s Initialization of Virtual Drive %d '
+                           '(target id: %d) Success.\n' %
+                           ('Full' if kind == 'full' else 'Fast',
+                            volume['id'], volume['id']))
+            else:
+                raise CommandError('Unsupported initialization option')
+        return ''.join(out)
+
+    def _do_ldbi(self, args):
+        index, controller = self._adapter(args)
+        options = [a.lower() for a in args]
+        out = []
+        for volume in self._volumes(controller, self._ld(args)):
+            if '-showprog' in options:
+                progress = self._init_progress(volume, ('background',))
+                if progress is None:
+                    out.append('Background Initialization on VD #%d is not '
+                               'in Progress.\n' % volume['id'])
+                else:
+                    out.append('Background Initialization on VD #%d '
+                               '(target id #%d) Completed %d%% in %d '
+                               'Minutes.\n' %
+                               ((volume['id'], volume['id']) + progress))
+            elif '-enbl' in options:
+                volume['bgi'] = True
+                self._start_init(volume, 'background')
+                out.append('Background Initialization enabled on VD #%d\n'
+                           % volume['id'])
+            elif '-dsbl' in options:
+                volume['bgi'] = False
+                volume.pop('init', None)
+                out.append('Background Initialization disabled on VD #%d\n'
+                           % volume['id'])
+            else:
+                raise CommandError('Unsupported background initialization '
+                                   'option')
+        return ''.join(out)
+
+    def _start_operation(self, entry, kind):
+        rates = dict(OPERATION_SECONDS_PER_GB,
+                     **self.state.get('operation_seconds_per_gb', {}))
+        entry.setdefault('operations', {})[kind] = {
+            'started': time.time(), 'seconds': rates[kind] * entry['size_gb']}
+
+    def _operation_progress(self, entry, kind):
+        operation = entry.get('operations', {}).get(kind)
+        if not operation:
+            return None
+        elapsed = time.time() - operation['started']
+        if elapsed >= operation['seconds']:
+            del entry['operations'][kind]
+            return None
+        return int(100 * elapsed / operation['seconds']), int(elapsed // 60)
+
+    def _do_ldcc(self, args):
+        index, controller = self._adapter(args)
+        options = [a.lower() for a in args]
+        out = []
+        for volume in self._volumes(controller, self._ld(args)):
+            if '-showprog' in options:
+                progress = self._operation_progress(volume,
+                                                    'consistency_check')
+                if progress is None:
+                    out.append('Check Consistency on VD #%d is not in '
+                               'Progress.\n' % volume['id'])
+                else:
+                    out.append('Check Consistency on VD #%d (target id #%d) '
+                               'Completed %d%% in %d Minutes.\n' %
+                               ((volume['id'], volume['id']) + progress))
+            elif '-start' in options:
+                self._start_operation(volume, 'consistency_check')
+                out.append('Check Consistency started on VD #%d\n'
+                           % volume['id'])
+            else:
+                raise CommandError('Unsupported consistency check option')
+        return ''.join(out)
+
+    def _physdrvs(self, controller, args):
+        for arg in args:
+            match = PHYSDRV_ARG.match(arg)
+            if match:
+                return [self._disk(controller, spec)
+                        for spec in match.group(1).split(',') if spec]
+        raise CommandError('Physical drives are missing')
+
+    def _pd_operation(self, args, kind, label):
+        index, controller = self._adapter(args)
+        options = [a.lower() for a in args]
+        out = []
+        for disk in self._physdrvs(controller, args):
+            if '-showprog' in options:
+                progress = self._operation_progress(disk, kind)
+                if progress is None:
+                    out.append('Device(Encl-%d Slot-%d) is not in %s '
+                               'process\n' % (disk['enclosure'],
+                                              disk['slot'], kind))
+                else:
+                    out.append('%s Progress on Device at Enclosure %d, Slot '
+                               '%d Completed %d%% in %d Minutes.\n' %
+                               ((label, disk['enclosure'], disk['slot']) +
+                                progress))
+            elif '-start' in options:
+                self._start_operation(disk, kind)
+                out.append('Started %s of Device at Enclosure %d, Slot %d\n'
+                           % (kind, disk['enclosure'], disk['slot']))
+            else:
+                raise CommandError('Unsupported %s option' % kind)
+        return ''.join(out)
+
+    def _do_pdrbld(self, args):
+        return self._pd_operation(args, 'rebuild', 'Rebuild')
+
+    def _do_pdclear(self, args):
+        return self._pd_operation(args, 'clear', 'Clear')
+
+    def _properties(self, controller):
+        properties = dict(DEFAULT_PROPERTIES)
+        properties.update(controller.get('properties', {}))
+        return properties
+
+    def _do_adpgetprop(self, args):
+        if not args:
+            raise CommandError('Property is missing')
+        name = args[0].lower()
+        if name not in PROPERTY_FORMATS:
+            raise CommandError('Unsupported property %s' % args[0])
+        key, text = PROPERTY_FORMATS[name]
+        out = []
+        for index, controller in self._adapters(args):
+            value = self._properties(controller)[key]
+            out.append('\nAdapter %d: %s\n' % (index, text(value)))
+        return ''.join(out)
+
+    def _do_adpsetprop(self, args):
+        if not args:
+            raise CommandError('Property is missing')
+        name = args[0].lower()
+        index, controller = self._adapter(args)
+        properties = controller.setdefault('properties', {})
+        if name in ('ncqenbl', 'ncqdsbl'):
+            properties['ncq'] = name == 'ncqenbl'
+            return ('\nAdapter %d: Set NCQ to %s success.\n' %
+                    (index, 'Enabled' if properties['ncq'] else 'Disabled'))
+        if name not in PROPERTY_FORMATS or name == 'ncqdsply' or \
+                len(args) < 2 or not args[1].lstrip('-').isdigit():
+            raise CommandError('Invalid property %s' % ' '.join(args[:2]))
+        key, _ = PROPERTY_FORMATS[name]
+        properties[key] = int(args[1].lstrip('-'))
+        return ('\nAdapter %d: Set %s to %d success.\n' %
+                (index, args[0], properties[key]))
+
+    def _do_adpbootdrive(self, args):
+        index, controller = self._adapter(args)
+        if '-set' in [a.lower() for a in args]:
+            volume = self._volume(controller, int(self._ld(args)))
+            controller['boot_volume'] = volume['id']
+            return ('Boot Virtual Drive is set to #%d (target id #%d) '
+                    'on Adapter %d\n' % (volume['id'], volume['id'], index))
+        if controller.get('boot_volume') is None:
+            return 'No boot drive set on Adapter %d\n' % index
+        return ('Adapter %d: Boot Virtual Drive - #%d (target id - %d).\n'
+                % (index, controller['boot_volume'],
+                   controller['boot_volume']))
+
+
+def _input_level(raid_level):
+    for key, (level, _) in RAID_LEVELS.items():
+        if level == raid_level:
+            return key
@@ -0,0 +1,254 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""sas3ircu emulation"""
+
+from megautils.simulator import topology
+
+BANNER = ('Avago Technologies SAS3 IR Configuration Utility.\n'
+          'Version 16.00.00.00 (2017.04.26) \n'
+          'Copyright (c) 2009-2017 Avago Technologies. '
+          'All rights reserved. \n\n')
+
+# volume type -> (minimum disks, usable fraction)
+VOLUME_TYPES = {'RAID0': (2, lambda n: n),
+                'RAID1': (2, lambda n: 1),
+                'RAID1E': (3, lambda n: n / 2.0),
+                'RAID10': (4, lambda n: n // 2)}
+
+DESTRUCTIVE_VERBS = ('CREATE', 'DELETE', 'DELETEVOLUME')
+
+FIRST_VOLUME_ID = 286
+
+
+class CommandError(Exception):
+    pass
+
+
+class Sas3ircu(object):
+
+    def __init__(self, state):
+        self.state = state
+        self.controllers = topology.controllers_of(
+            state, topology.FAMILY_SAS3)
+
+    def run(self, args, confirm=None):
+        """
+        Run a sas3ircu command against the state
+        :param args: sas3ircu arguments
+        :param confirm: callable asked to confirm destructive commands run
+                        without 'noprompt', returning True to go on
+        :return: (exit code, output) tuple
+        """
+        noprompt = [a for a in args if a.lower() == 'noprompt']
+        args = [a for a in args if a.lower() != 'noprompt']
+        try:
+            if args and args[0].upper() == 'LIST':
+                return 0, BANNER + self._list()
+            if len(args) < 2 or not args[0].isdigit():
+                raise CommandError('Invalid command line')
+            verb = args[1].upper()
+            handler = getattr(self, '_do_' + verb.lower(), None)
+            if handler is None:
+                raise CommandError('Invalid command %s' % args[1])
+            controller = self._controller(int(args[0]))
+            if verb in DESTRUCTIVE_VERBS and not noprompt:
+                if confirm is None or not confirm():
+                    return 1, (BANNER +
+                               'SAS3IRCU: Operation cancelled by user.\n')
+            out = handler(int(args[0]), controller, args[2:])
+        except CommandError as e:
+            return 1, BANNER + 'SAS3IRCU: %s\n' % e
+        return 0, (BANNER + out +
+                   'SAS3IRCU: Command %s Completed Successfully.\n'
+                   'SAS3IRCU: Utility Completed Successfully.\n' % verb)
+
+    def _controller(self, index):
+        if index >= len(self.controllers):
+            raise CommandError('No Controller Found at index %d.' % index)
+        return self.controllers[index]
+
+    def _list(self):
+        out = ['\n         Adapter      Vendor  Device                       '
+               'SubSys  SubSys \n'
+               ' Index    Type          ID      ID    Pci Address          '
+               'Ven ID  Dev ID \n'
+               ' -----  ------------  ------  ------  -----------------    '
+               '------  ------ \n']
+        for index, controller in enumerate(self.controllers):
+            out.append('   %d     SAS3008     1000h    97h   '
+                       '00h:%02xh:00h:00h      1000h   0097h \n'
+                       % (index, index + 3))
+        out.append('SAS3IRCU: Utility Completed Successfully.\n')
+        return ''.join(out)
+
+    def _disk(self, controller, spec):
+        try:
+            enclosure, slot = [int(x) for x in spec.split(':')]
+        except ValueError:
+            raise CommandError('Invalid Enclosure#:Slot# %s' % spec)
+        for disk in controller['disks']:
+            if disk['enclosure'] == enclosure and disk['slot'] == slot:
+                return disk
+        raise CommandError('Physical disk %s not found' % spec)
+
+    def _volume(self, controller, volume_id):
+        for volume in controller['volumes']:
+            if volume['volume_id'] == volume_id:
+                return volume
+        raise CommandError('Volume %s not found' % volume_id)
+
+    def _do_display(self, index, controller, args):
+        out = ['Read configuration has been initiated for controller %d\n'
+               % index,
+               '-' * 72 + '\nController information\n' + '-' * 72 + '\n',
+               '  Controller type                         : SAS3008\n'
+               '  BIOS version                            : 8.37.00.00\n'
+               '  Firmware version                        : 16.00.01.00\n'
+               '  Channel description                     : '
+               '1 Serial Attached SCSI\n'
+               '  RAID Support                            : Yes\n',
+               '-' * 72 + '\nIR Volume information\n' + '-' * 72 + '\n']
+        for number, volume in enumerate(controller['volumes']):
+            out.append(
+                'IR volume %d\n'
+                '  Volume ID                               : %d\n'
+                '  PI Supported                            : No\n'
+                '  PI Enabled                              : No\n'
+                '  Status of volume                        : Okay (OKY)\n'
+                '  Volume wwid                             : %s\n'
+                '  RAID level                              : %s\n'
+                '  Size (in MB)                            : %d\n'
+                '  Boot                                    : %s\n'
+                '  Physical hard disks                     :\n'
+                % (number + 1, volume['volume_id'], volume['wwid'],
+                   volume['type'], volume['size_mb'],
+                   'Primary' if controller.get('boot_volume') ==
+                   volume['volume_id'] else 'Not Applicable'))
+            for phy, spec in enumerate(volume['members']):
+                out.append('  PHY[%d] Enclosure#/Slot#                 : %s\n'
+                           % (phy, spec))
+        out.append('-' * 72 + '\nPhysical device information\n' +
+                   '-' * 72 + '\nInitiator at ID #0\n\n')
+        for disk in controller['disks']:
+            size_mb = int(disk['size_gb'] * 1024)
+            out.append(
+                'Device is a Hard disk\n'
+                '  Enclosure #                             : %d\n'
+                '  Slot #                                  : %d\n'
+                '  SAS Address                             : %s\n'
+                '  State                                   : %s\n'
+                '  Size (in MB)/(in sectors)               : %d/%d\n'
+                '  Manufacturer                            : ATA\n'
+                '  Model Number                            : SIMULATED %s\n'
+                '  Firmware Revision                       : SIM1\n'
+                '  Serial No                               : %s\n'
+                '  Unit Serial No(VPD)                     : %s\n'
+                '  GUID                                    : %s\n'
+                '  Protocol                                : SATA\n'
+                '  Drive Type                              : SATA_%s\n\n'
+                % (disk['enclosure'], disk['slot'], disk['sas_address'],
+                   'Optimal (OPT)'
+                   if disk['state'] == topology.STATE_ONLINE
+                   else 'Ready (RDY)',
+                   size_mb, size_mb * 2048, disk['media'].upper(),
+                   disk['serial'], disk['serial'], disk['wwn'].lower(),
+                   disk['media'].upper()))
+        out.append('-' * 72 + '\nEnclosure information\n' + '-' * 72 + '\n')
+        for enclosure in sorted(set(d['enclosure']
+                                    for d in controller['disks'])):
+            out.append('  Enclosure#                              : %d\n'
+                       '  Logical ID                              : '
+                       '500605b0:0d0c%04x\n' % (enclosure, enclosure))
+        out.append('-' * 72 + '\n')
+        return ''.join(out)
+
+    def _do_status(self, index, controller, args):
+        out = ['Background command progress status for controller %d...\n'
+               % index]
+        for volume in controller['volumes']:
+            out.append('IR Volume %d\n'
+                       '  Volume ID                               : %d\n'
+                       '  Current operation                       : None\n'
+                       '  Volume status                           : Enabled\n'
+                       '  Volume state                            : Optimal\n'
+                       % (volume['volume_id'] - FIRST_VOLUME_ID + 1,
+                          volume['volume_id']))
+        return ''.join(out)
+
+    def _do_create(self, index, controller, args):
+        if len(args) < 3:
+            raise CommandError('Invalid CREATE command line')
+        volume_type = args[0].upper()
+        if volume_type not in VOLUME_TYPES:
+            raise CommandError('Invalid volume type %s' % args[0])
+        specs = [a for a in args[2:] if ':' in a]
+        names = [a for a in args[2:] if ':' not in a]
+        min_disks, usable = VOLUME_TYPES[volume_type]
+        if len(specs) < min_disks:
+            raise CommandError('Invalid number of disks for %s' % volume_type)
+        disks = [self._disk(controller, spec) for spec in specs]
+        for disk in disks:
+            if disk['state'] != topology.STATE_UNCONFIGURED:
+                raise CommandError('Disk %s is already in use'
+                                   % specs[disks.index(disk)])
+        if len(controller['volumes']) >= 2:
+            raise CommandError('Maximum number of volumes already created')
+
+        max_mb = int(usable(len(disks)) *
+                     min(d['size_gb'] for d in disks) * 1024)
+        size_mb = max_mb if args[1].upper() == 'MAX' else int(args[1])
+        if size_mb > max_mb:
+            raise CommandError('Volume size is too large')
+        used = set(v['volume_id'] for v in controller['volumes'])
+        volume_id = FIRST_VOLUME_ID
+        while volume_id in used:
+            volume_id += 1
+        for disk in disks:
+            disk['state'] = topology.STATE_ONLINE
+        controller['volumes'].append({
+            'volume_id': volume_id,
+            'name': names[0] if names else '',
+            'type': volume_type,
+            'members': specs,
+            'size_mb': size_mb,
+            'wwid': '0a8d4d6e2b8f%04x' % volume_id,
+        })
+        return 'SAS3IRCU: Volume created successfully.\n'
+
+    def _delete(self, controller, volume):
+        for spec in volume['members']:
+            self._disk(controller, spec)['state'] = \
+                topology.STATE_UNCONFIGURED
+        controller['volumes'].remove(volume)
+        if controller.get('boot_volume') == volume['volume_id']:
+            controller['boot_volume'] = None
+
+    def _do_deletevolume(self, index, controller, args):
+        if not args or not args[0].isdigit():
+            raise CommandError('Volume ID is missing')
+        self._delete(controller, self._volume(controller, int(args[0])))
+        return 'SAS3IRCU: Volume deleted successfully.\n'
+
+    def _do_delete(self, index, controller, args):
+        for volume in list(controller['volumes']):
+            self._delete(controller, volume)
+        return 'SAS3IRCU: Volumes deleted successfully.\n'
+
+    def _do_bootir(self, index, controller, args):
+        if not args or not args[0].isdigit():
+            raise CommandError('Volume ID is missing')
+        volume = self._volume(controller, int(args[0]))
+        controller['boot_volume'] = volume['volume_id']
+        return 'SAS3IRCU: Boot device set successfully.\n'
@@ -0,0 +1,140 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""smartctl emulation, json output only
+
+Answers '-d megaraid,N /dev/bus/H' and '-d sat+megaraid,N /dev/bus/H' for
+the disks of controller H, and '-d sat' or '-d scsi' on '/dev/sgN' for the
+scsi generic devices of topology.generic_devices().
+"""
+
+import json
+import os
+import re
+
+from megautils.simulator import topology
+
+SMARTCTL_VERSION = [7, 0]
+
+BUS_DEVICE = re.compile(r'^/dev/bus/(\d+)$')
+GENERIC_DEVICE = re.compile(r'^sg(\d+)$')
+MEGARAID_TYPE = re.compile(r'^(sat\+)?megaraid,(\d+)$')
+
+# exit status bit of a device smartctl could not open
+STATUS_OPEN_FAILED = 0x02
+
+
+class CommandError(Exception):
+
+    def __init__(self, message, exitcode=1):
+        super(CommandError, self).__init__(message)
+        self.exitcode = exitcode
+
+
+def _ata_attributes(disk, hours):
+    return {'revision': 16, 'table': [
+        {'id': 5, 'name': 'Reallocated_Sector_Ct', 'value': 100,
+         'worst': 100, 'thresh': 10, 'when_failed': '',
+         'raw': {'value': 0, 'string': '0'}},
+        {'id': 9, 'name': 'Power_On_Hours', 'value': 97, 'worst': 97,
+         'thresh': 0, 'when_failed': '',
+         'raw': {'value': hours, 'string': str(hours)}},
+        {'id': 194, 'name': 'Temperature_Celsius', 'value': 70,
+         'worst': 60, 'thresh': 0, 'when_failed': '',
+         'raw': {'value': 30 + disk['slot'] % 10,
+                 'string': str(30 + disk['slot'] % 10)}},
+        {'id': 197, 'name': 'Current_Pending_Sector', 'value': 100,
+         'worst': 100, 'thresh': 0, 'when_failed': '',
+         'raw': {'value': 0, 'string': '0'}},
+    ]}
+
+
+class Smartctl(object):
+
+    def __init__(self, state):
+        self.state = state
+
+    def _output(self, exitcode, data=None, message=None):
+        data = dict(data or {})
+        data['json_format_version'] = [1, 0]
+        data['smartctl'] = {'version': SMARTCTL_VERSION,
+                            'exit_status': exitcode}
+        if message:
+            data['smartctl']['messages'] = [{'string': message,
+                                             'severity': 'error'}]
+        return exitcode, json.dumps(data, indent=2) + '\n'
+
+    def _megaraid_disk(self, device, device_id):
+        match = BUS_DEVICE.match(device)
+        controllers = self.state['controllers']
+        if not match or int(match.group(1)) >= len(controllers) or \
+                controllers[int(match.group(1))]['family'] != \
+                topology.FAMILY_MEGARAID:
+            raise CommandError('%s: No such device' % device,
+                               STATUS_OPEN_FAILED)
+        for disk in controllers[int(match.group(1))]['disks']:
+            if disk['id'] == device_id:
+                return disk
+        raise CommandError('%s [megaraid_disk_%02d] failed: INQUIRY failed'
+                           % (device, device_id), STATUS_OPEN_FAILED)
+
+    def _generic_disk(self, device):
+        match = GENERIC_DEVICE.match(os.path.basename(device))
+        disks = topology.generic_devices(self.state)
+        if not match or int(match.group(1)) >= len(disks):
+            raise CommandError('%s: No such device' % device,
+                               STATUS_OPEN_FAILED)
+        return disks[int(match.group(1))][1]
+
+    def run(self, args):
+        """
+        Run a smartctl command against the state
+        :param args: smartctl arguments, '-j' is implied
+        :return: (exit code, json output) tuple
+        """
+        args = list(args)
+        device_type = None
+        if '-d' in args:
+            index = args.index('-d')
+            device_type = args[index + 1] if index + 1 < len(args) else ''
+            del args[index:index + 2]
+        positional = [a for a in args if not a.startswith('-')]
+        if len(positional) != 1:
+            return self._output(1, message='exactly one device expected')
+        device = positional[0]
+
+        try:
+            match = MEGARAID_TYPE.match(device_type or '')
+            if match:
+                disk = self._megaraid_disk(device, int(match.group(2)))
+                ata = bool(match.group(1))
+            elif device_type in ('sat', 'scsi'):
+                disk = self._generic_disk(device)
+                ata = device_type == 'sat'
+            else:
+                raise CommandError('Unknown device type %r' % device_type)
+        except CommandError as e:
+            return self._output(e.exitcode, message=str(e))
+
+        hours = 1000 + disk['id'] * 17
+        data = {'device': {'name': device, 'type': device_type},
+                'serial_number': disk['serial'],
+                'smart_status': {'passed': True},
+                'temperature': {'current': 30 + disk['slot'] % 10},
+                'power_on_time': {'hours': hours}}
+        if ata:
+            data['ata_smart_attributes'] = _ata_attributes(disk, hours)
+        else:
+            data['scsi_grown_defect_list'] = 0
+        return self._output(0, data)
@@ -0,0 +1,315 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""storcli emulation, json output only
+
+Shares the controllers and the state changes of the MegaCli emulation, the
+same state can be driven by both clis.
+"""
+
+import json
+import re
+
+from megautils.simulator import megacli
+from megautils.simulator import topology
+from megautils.simulator.megacli import CommandError, format_size
+
+CLI_VERSION = '007.0709.0000.0000 Aug 14, 2018'
+
+OBJECT_ARG = re.compile(
+    r'^/c(\d+|all)(?:/(e(?:\d+|all)/s(?:\d+|all)|v(?:\d+|all)))?$',
+    re.IGNORECASE)
+RAID_ARG = re.compile(r'^r(\d+)$', re.IGNORECASE)
+
+SPANNED_LEVELS = ('1+0', '5+0', '6+0')
+
+
+def _cache_code(cache_policy):
+    # 'WriteBack, ReadAdaptive, Direct, ...' to 'RWBD'
+    write, read, io = [p.strip() for p in cache_policy.split(',')[:3]]
+    return '%s%s%s' % ('NR' if read == 'ReadAheadNone' else 'R',
+                       'WB' if write == 'WriteBack' else 'WT',
+                       'C' if io == 'Cached' else 'D')
+
+
+class Storcli(megacli.MegaCli):
+
+    def run(self, args):
+        """
+        Run a storcli command against the state
+        :param args: storcli arguments, the trailing 'J' is optional
+        :return: (exit code, json output) tuple
+        """
+        args = list(args)
+        if args and args[-1].upper() == 'J':
+            args.pop()
+        match = OBJECT_ARG.match(args[0]) if args else None
+        if not match or len(args) < 2:
+            return 1, self._output([(None, 'Failure',
+                                     'Invalid command', None)])
+        controller, target = match.group(1).lower(), match.group(2)
+        if controller == 'all':
+            indexes = list(range(len(self.controllers)))
+        elif int(controller) < len(self.controllers):
+            indexes = [int(controller)]
+        else:
+            return 1, self._output([(int(controller), 'Failure',
+                                     'Controller %s not found' % controller,
+                                     None)])
+
+        verb = args[1].lower()
+        if target is None:
+            kind = 'controller'
+        elif target.lower().startswith('e'):
+            kind = 'drive'
+        else:
+            kind = 'vd'
+        handler = getattr(self, '_%s_%s' % (kind, verb), None)
+        if handler is None:
+            return 1, self._output([(None, 'Failure',
+                                     'Invalid command', None)])
+
+        results = []
+        exitcode = 0
+        for index in indexes:
+            try:
+                description, data = handler(index, self.controllers[index],
+                                            target, args[2:])
+                results.append((index, 'Success', description, data))
+            except CommandError as e:
+                exitcode = e.exitcode
+                results.append((index, 'Failure', str(e), None))
+        return exitcode, self._output(results)
+
+    def _output(self, results):
+        controllers = []
+        for index, status, description, data in results:
+            entry = {'Command Status': {
+                'CLI Version': CLI_VERSION,
+                'Operating system': 'Linux',
+                'Controller': index,
+                'Status': status,
+                'Description': description}}
+            if data is not None:
+                entry['Response Data'] = data
+            controllers.append(entry)
+        return json.dumps({'Controllers': controllers}, indent=1) + '\n'
+
+    # controllers
+
+    def _controller_show(self, index, controller, target, args):
+        return 'None', {
+            'Basics': {
+                'Controller': index,
+                'Model': 'AVAGO MegaRAID SAS 9361-8i',
+                'Serial Number': controller['serial_number'],
+                'SAS Address': controller['sas_address'],
+                'PCI Address': '00:%02x:00:00' % (0x10 + index)},
+            'Version': {
+                'Firmware Package Build': '24.21.0-0097',
+                'Firmware Version': '4.740.00-8394',
+                'Bios Version': '6.36.00.3_4.19.08.00_0x06180203',
+                'WebBIOS Version': '7.05-02-1',
+                'Preboot CLI Version': '01.07-05:#%0001',
+                'Boot Block Version': '3.07.00.00-0003',
+                'Driver Name': 'megaraid_sas'},
+            'HwCfg': {
+                'BBU': 'Present',
+                'Alarm': 'Absent',
+                'NVRAM': 'Present',
+                'Serial Debugger': 'Present',
+                'Flash': 'Present',
+                'On Board Memory Size': '1024MB'},
+            'Virtual Drives': len(controller['volumes']),
+            'Physical Drives': len(controller['disks'])}
+
+    def _controller_add(self, index, controller, target, args):
+        if not args or args[0].lower() != 'vd' or len(args) < 3:
+            raise CommandError('Invalid command')
+        match = RAID_ARG.match(args[1])
+        if not match or match.group(1) not in megacli.RAID_LEVELS:
+            raise CommandError('Invalid RAID level')
+        raid_level = megacli.RAID_LEVELS[match.group(1)][0]
+
+        options = {}
+        flags = []
+        for arg in args[2:]:
+            key, sep, value = arg.partition('=')
+            if sep:
+                options[key.lower()] = value
+            else:
+                flags.append(arg)
+        if 'drives' not in options:
+            raise CommandError('Drives are missing')
+        disks = [d for d in options['drives'].split(',') if d]
+        if raid_level in SPANNED_LEVELS:
+            per_array = int(options.get('pdperarray', 2))
+            spans = [disks[i:i + per_array]
+                     for i in range(0, len(disks), per_array)]
+        else:
+            spans = [disks]
+        if 'strip' in options:
+            flags.append('-strpsz%s' % options['strip'])
+        self._add_volume(index, controller, raid_level, spans, flags)
+        return 'Add VD Succeeded', None
+
+    # drives
+
+    def _drive_groups(self, controller):
+        groups = {}
+        for volume in controller['volumes']:
+            for span in volume['spans']:
+                for spec in span:
+                    groups[spec] = volume['id']
+        return groups
+
+    def _drive_summary(self, disk, groups):
+        spec = '%d:%d' % (disk['enclosure'], disk['slot'])
+        online = disk['state'] == topology.STATE_ONLINE
+        return {
+            'EID:Slt': spec,
+            'DID': disk['id'],
+            'State': 'Onln' if online else 'UGood',
+            'DG': groups.get(spec, '-'),
+            'Size': format_size(disk['size_gb'] - 0.521),
+            'Intf': 'SATA' if disk['media'] == topology.MEDIA_SSD
+            else 'SAS',
+            'Med': 'SSD' if disk['media'] == topology.MEDIA_SSD else 'HDD',
+            'SED': 'N',
+            'PI': 'N',
+            'SeSz': '512B',
+            'Model': 'SIMULATED %s' % disk['media'].upper(),
+            'Sp': 'U',
+            'Type': '-'}
+
+    def _drive_details(self, key, disk):
+        return {
+            '%s State' % key: {
+                'Shield Counter': 0,
+                'Media Error Count': 0,
+                'Other Error Count': 0,
+                'Drive Temperature': ' 30C (86.00 F)',
+                'Predictive Failure Count': 0,
+                'S.M.A.R.T alert flagged by drive': 'No'},
+            '%s Device attributes' % key: {
+                'SN': disk['serial'],
+                'Manufacturer Id': 'ATA     ',
+                'Model Number': 'SIMULATED %s' % disk['media'].upper(),
+                'WWN': disk['wwn'],
+                'Firmware Revision': 'SIM1',
+                'Raw size': '%s [%s Sectors]' % (
+                    format_size(disk['size_gb']),
+                    megacli._sectors(disk['size_gb'])),
+                'Coerced size': '%s [%s Sectors]' % (
+                    format_size(disk['size_gb'] - 0.521),
+                    megacli._sectors(disk['size_gb'] - 0.521)),
+                'Non Coerced size': '%s [%s Sectors]' % (
+                    format_size(disk['size_gb'] - 0.5),
+                    megacli._sectors(disk['size_gb'] - 0.5)),
+                'Device Speed': '12.0Gb/s',
+                'Link Speed': '12.0Gb/s',
+                'Logical Sector Size': '512B',
+                'Physical Sector Size': '512B'},
+            '%s Policies/Settings' % key: {
+                'Enclosure position': 1,
+                'Connected Port Number': '%d(path0) ' % disk['port'],
+                'Sequence Number': 2,
+                'Commissioned Spare': 'No',
+                'Emergency Spare': 'No',
+                'Last Predictive Failure Event Sequence Number': 0,
+                'Successful diagnostics completion on': 'N/A',
+                'SED Capable': 'No',
+                'SED Enabled': 'No',
+                'Secured': 'No',
+                'Locked': 'No',
+                'Needs EKM Attention': 'No',
+                'PI Eligible': 'No',
+                'Port Information': [{'Port': 0, 'Status': 'Active',
+                                      'Linkspeed': '12.0Gb/s',
+                                      'SAS address': disk['sas_address']}]},
+            'Inquiry Data': 'SIMULATED %-16s %s' % (
+                disk['media'].upper(), disk['serial'])}
+
+    def _drive_show(self, index, controller, target, args):
+        enclosure, slot = [part[1:] for part in target.lower().split('/')]
+        groups = self._drive_groups(controller)
+        data = {}
+        for disk in controller['disks']:
+            if enclosure != 'all' and disk['enclosure'] != int(enclosure):
+                continue
+            if slot != 'all' and disk['slot'] != int(slot):
+                continue
+            key = 'Drive /c%d/e%d/s%d' % (index, disk['enclosure'],
+                                          disk['slot'])
+            data[key] = [self._drive_summary(disk, groups)]
+            if args and args[0].lower() == 'all':
+                data['%s - Detailed Information' % key] = \
+                    self._drive_details(key, disk)
+        if not data:
+            raise CommandError('No drive found')
+        return 'Show Drive Information Succeeded.', data
+
+    # virtual drives
+
+    def _target_volumes(self, controller, target):
+        vd = target.lower()[1:]
+        if vd == 'all':
+            return list(controller['volumes'])
+        return [self._volume(controller, int(vd))]
+
+    def _vd_show(self, index, controller, target, args):
+        volumes = self._target_volumes(controller, target)
+        if not volumes:
+            return 'No VDs have been configured.', {}
+        groups = self._drive_groups(controller)
+        data = {}
+        for volume in volumes:
+            vd_id = volume['id']
+            data['/c%d/v%d' % (index, vd_id)] = [{
+                'DG/VD': '%d/%d' % (vd_id, vd_id),
+                'TYPE': 'RAID%s' % megacli._input_level(volume['raid_level']),
+                'State': 'Optl',
+                'Access': 'RW',
+                'Consist': 'No',
+                'Cache': _cache_code(volume['cache_policy']),
+                'Cac': '-',
+                'sCC': 'ON',
+                'Size': format_size(volume['size_gb']),
+                'Name': volume['name']}]
+            if args and args[0].lower() == 'all':
+                data['PDs for VD %d' % vd_id] = [
+                    self._drive_summary(self._disk(controller, spec), groups)
+                    for span in volume['spans'] for spec in span]
+                data['VD%d Properties' % vd_id] = {
+                    'Strip Size': '%d KB' % volume['strip_kb'],
+                    'Span Depth': len(volume['spans']),
+                    'Number of Drives Per Span': len(volume['spans'][0]),
+                    'Write Cache(initial setting)':
+                        volume['cache_policy'].split(',')[0],
+                    'Disk Cache Policy': volume['disk_cache'],
+                    'Encryption': 'None',
+                    'Active Operations': 'None',
+                    'Exposed to OS': 'Yes'}
+        return 'None', data
+
+    def _vd_del(self, index, controller, target, args):
+        vd = target.lower()[1:]
+        self._do_cfglddel(['-L%s' % vd.upper(), '-a%d' % index])
+        return 'Delete VD succeeded', None
+
+    def _vd_set(self, index, controller, target, args):
+        if [a.lower() for a in args] != ['bootdrive=on']:
+            raise CommandError('Invalid command')
+        self._do_adpbootdrive(['-set', '-L%s' % target[1:], '-a%d' % index])
+        return 'Set Boot Drive Succeeded.', None
@@ -0,0 +1,243 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Simulated controller topology and its state file"""
+
+import contextlib
+import fcntl
+import json
+import os
+
+STATE_ENV = 'MEGAUTILS_SIM_STATE'
+DEFAULT_STATE_PATH = '/tmp/megautils-sim.json'
+
+FAMILY_MEGARAID = 'megaraid'
+FAMILY_SAS3 = 'sas3'
+
+MEDIA_HDD = 'hdd'
+MEDIA_SSD = 'ssd'
+
+# pci identity of the simulated controllers, see write_sysfs
+PCI_IDENTITY = {FAMILY_MEGARAID: ('0x005d', '0x010400', 'megaraid_sas'),
+                FAMILY_SAS3: ('0x0097', '0x010700', 'mpt3sas')}
+
+STATE_UNCONFIGURED = 'Unconfigured(good), Spun Up'
+STATE_ONLINE = 'Online, Spun Up'
+
+
+def build_topology(controllers=1, enclosures=1, disks_per_enclosure=24,
+                   ssds_per_enclosure=0, hdd_size_gb=1862.5,
+                   ssd_size_gb=446.625, family=FAMILY_MEGARAID,
+                   ports_per_controller=8, latency=None):
+    """
+    Build a simulator state
+    :param controllers: number of controllers
+    :param enclosures: enclosures per controller
+    :param disks_per_enclosure: disks per enclosure
+    :param ssds_per_enclosure: how many of the disks of an enclosure are ssd,
+                               they take the last slots
+    :param hdd_size_gb: raw size of hdd
+    :param ssd_size_gb: raw size of ssd
+    :param family: FAMILY_MEGARAID for MegaCli, FAMILY_SAS3 for sas3ircu
+    :param ports_per_controller: phys of a controller, enclosures are wired
+                                 to them round robin
+    :param latency: dict of verb to seconds slept before answering, '*' is
+                    the default of every verb
+    :return: state dict
+    """
+    state = {'controllers': [], 'latency': dict(latency or {}),
+             'stats': {}}
+    for c in range(controllers):
+        disks = []
+        for e in range(enclosures):
+            enclosure = 8 + e if family == FAMILY_MEGARAID else 2 + e
+            for s in range(disks_per_enclosure):
+                ssd = s >= disks_per_enclosure - ssds_per_enclosure
+                serial = '%02d%02d%03d' % (c, e, s)
+                disks.append({
+                    'enclosure': enclosure,
+                    'slot': s,
+                    'id': len(disks),
+                    'media': MEDIA_SSD if ssd else MEDIA_HDD,
+                    'size_gb': ssd_size_gb if ssd else hdd_size_gb,
+                    'state': STATE_UNCONFIGURED,
+                    'port': e % ports_per_controller,
+                    'wwn': '5000C500%08X' % int(serial),
+                    'sas_address': '0x5000c500%08x' % int(serial),
+                    'serial': 'SIM%s' % serial,
+                })
+        state['controllers'].append({
+            'family': family,
+            'serial_number': 'SIMCTL%04d' % c,
+            'sas_address': '500605b0%08x' % c,
+            'boot_volume': None,
+            'disks': disks,
+            'volumes': [],
+        })
+    return state
+
+
+def controllers_of(state, family):
+    return [c for c in state['controllers'] if c['family'] == family]
+
+
+def state_path(path=None):
+    return path or os.environ.get(STATE_ENV, DEFAULT_STATE_PATH)
+
+
+def save_state(state, path=None):
+    with open_state(path, create=True) as current:
+        current.clear()
+        current.update(state)
+
+
+@contextlib.contextmanager
+def open_state(path=None, create=False):
+    """
+    Lock the state file and yield its state, changes are written back
+    :param path: state file, $MEGAUTILS_SIM_STATE by default
+    :param create: create the state file when missing
+    """
+    path = state_path(path)
+    mode = 'a+' if create else 'r+'
+    with open(path, mode) as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            content = f.read()
+            state = json.loads(content) if content else {}
+            yield state
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f)
+            # readers must not see the file before the state is complete
+            f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_state(path=None):
+    with open(state_path(path)) as f:
+        # open_state rewrites the file in place under an exclusive lock
+        fcntl.flock(f, fcntl.LOCK_SH)
+        try:
+            return json.load(f)
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def generic_devices(state):
+    """
+    Get the disks the kernel sees as scsi generic devices, the members of
+    mpt3sas volumes included
+    :param state: simulator state
+    :return: (controller index, disk) list, /dev/sgN is item N
+    """
+    return [(i, disk) for i, controller in enumerate(state['controllers'])
+            if controller['family'] == FAMILY_SAS3
+            for disk in controller['disks']]
+
+
+def _write(path, value):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write(value + '\n')
+
+
+def _symlink(target, link):
+    if not os.path.isdir(os.path.dirname(link)):
+        os.makedirs(os.path.dirname(link))
+    if os.path.islink(link):
+        os.unlink(link)
+    os.symlink(target, link)
+
+
+def _block_name(number):
+    # sda .. sdz, sdaa ..
+    name = ''
+    number += 1
+    while number:
+        number, rest = divmod(number - 1, 26)
+        name = chr(ord('a') + rest) + name
+    return 'sd' + name
+
+
+def write_sysfs(state, root):
+    """
+    Write the pci devices of the simulated controllers, their scsi hosts,
+    the block devices of their volumes and the scsi generic devices of sas3
+    disks as a sysfs tree, point MEGAUTILS_SYSFS_ROOT at it. Controller i
+    is scsi host i, the block devices are sda, sdb, ... in controller and
+    volume order.
+    :param state: simulator state
+    :param root: directory standing in for /sys
+    :return: block device names
+    """
+    devices = os.path.join(root, 'bus', 'pci', 'devices')
+    if not os.path.isdir(devices):
+        os.makedirs(devices)
+    blocks = []
+    for i, controller in enumerate(state['controllers']):
+        device_id, pci_class, driver = PCI_IDENTITY[controller['family']]
+        path = os.path.join(devices, '0000:%02x:00.0' % (0x10 + i))
+        for name, value in (('vendor', '0x1000'), ('device', device_id),
+                            ('class', pci_class)):
+            _write(os.path.join(path, name), value)
+        driver_dir = os.path.join(root, 'bus', 'pci', 'drivers', driver)
+        if not os.path.isdir(driver_dir):
+            os.makedirs(driver_dir)
+        _symlink(driver_dir, os.path.join(path, 'driver'))
+
+        host = os.path.join(path, 'host%d' % i, 'scsi_host', 'host%d' % i)
+        _write(os.path.join(host, 'proc_name'), driver)
+        _symlink(host, os.path.join(root, 'class', 'scsi_host',
+                                    'host%d' % i))
+
+        # megaraid_sas exposes virtual drives on channel 2 by target id,
+        # mpt3sas volumes on channel 1 with their wwid
+        for volume in controller['volumes']:
+            if controller['family'] == FAMILY_SAS3:
+                address = (i, 1, volume['volume_id'], 0)
+            else:
+                address = (i, 2, volume['id'], 0)
+            scsi = os.path.join(path, 'host%d' % i,
+                                'target%d:%d:%d' % address[:3],
+                                '%d:%d:%d:%d' % address)
+            if not os.path.isdir(scsi):
+                os.makedirs(scsi)
+            if 'wwid' in volume:
+                _write(os.path.join(scsi, 'wwid'), 'naa.6%s' % volume['wwid'])
+            name = _block_name(len(blocks))
+            _symlink(scsi, os.path.join(root, 'block', name, 'device'))
+            blocks.append(name)
+
+    for number, (i, disk) in enumerate(generic_devices(state)):
+        device = os.path.join(root, 'class', 'scsi_device',
+                              '%d:0:%d:0' % (i, disk['id']), 'device')
+        _write(os.path.join(device, 'sas_address'), disk['sas_address'])
+        generic = os.path.join(device, 'scsi_generic', 'sg%d' % number)
+        if not os.path.isdir(generic):
+            os.makedirs(generic)
+    return blocks
+
+
+def latency_of(state, verb):
+    latency = state.get('latency', {})
+    return latency.get(verb, latency.get('*', 0))
+
+
+def count_command(state, verb):
+    stats = state.setdefault('stats', {})
+    stats[verb] = stats.get(verb, 0) + 1
@@ -0,0 +1,192 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""SMART data of the physical disks behind the controllers
+
+smartctl reaches MegaRAID disks through the firmware passthrough, with
+'-d megaraid,<Device Id>' on the '/dev/bus/<scsi host>' of their adapter.
+Disks behind mpt3sas are read through their scsi generic device, '-d sat'
+for SATA disks.
+
+Every disk is one smartctl call, they run on a bounded thread pool and
+each is killed after DISK_TIMEOUT seconds. A disk smartctl cannot read
+gets an error instead of failing the whole collection.
+
+Collection is slow, the hardware managers only add it to the inventory
+when $MEGAUTILS_SMART is set, see ENABLED.
+"""
+
+import json
+import os
+
+from oslo_log import log
+
+from megautils import block_devices
+from megautils import utils
+
+SMARTCTL_PATH = os.environ.get('MEGAUTILS_SMARTCTL_PATH',
+                               '/usr/sbin/smartctl')
+LOG = log.getLogger()
+
+# list_hardware_info collects SMART data, e.g. on inspection ramdisks
+ENABLED = os.environ.get('MEGAUTILS_SMART', '').lower() in (
+    '1', 'true', 'yes')
+DEFAULT_WORKERS = int(os.environ.get('MEGAUTILS_SMART_WORKERS', 8))
+DISK_TIMEOUT = int(os.environ.get('MEGAUTILS_SMART_TIMEOUT', 30))
+
+# exit status bits of smartctl which mean nothing was read, the others
+# report the health of the disk
+FATAL_STATUS = 0x03
+
+
+def disk_key(controller, enclosure, slot):
+    """Key of the health of a disk in the result of collect()"""
+    return controller, '%s:%s' % (enclosure, slot)
+
+
+class Target(object):
+    """A disk as smartctl addresses it"""
+
+    def __init__(self, controller, enclosure, slot, device, device_type):
+        self.controller = controller
+        self.enclosure = enclosure
+        self.slot = slot
+        self.device = device
+        self.device_type = device_type
+
+    def args(self):
+        return ['-H', '-A', '-j', '-d', self.device_type, self.device]
+
+
+def megaraid_targets(adapter_id, pds, root=None):
+    """
+    Get the smartctl targets of MegaCli physical disks
+    :param adapter_id: MegaCli adapter id
+    :param pds: megaraid PhysicalDisk list of the adapter
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :return: Target list, None device when the adapter has no scsi host
+    """
+    hosts = block_devices.scsi_hosts(block_devices.MEGARAID_DRIVER, root)
+    # smartctl takes the host number from the name, it is no device node
+    device = '/dev/bus/%d' % hosts[int(adapter_id)] \
+        if int(adapter_id) < len(hosts) else None
+    targets = []
+    for pd in pds:
+        device_type = 'megaraid,%s' % pd.id
+        if pd.pd_type == 'SATA':
+            device_type = 'sat+' + device_type
+        targets.append(Target(adapter_id, pd.enclosure, pd.slot, device,
+                              device_type))
+    return targets
+
+
+def sas3_targets(adapter_id, pds, root=None, dev_root=None):
+    """
+    Get the smartctl targets of sas3ircu physical disks
+    :param adapter_id: sas3ircu controller id
+    :param pds: sas3ircu PhysicalDisk list of the controller
+    :param root: sysfs mount point, $MEGAUTILS_SYSFS_ROOT or /sys
+    :param dev_root: device directory, $MEGAUTILS_DEV_ROOT or /dev
+    :return: Target list, None device when the kernel does not expose it
+    """
+    return [Target(adapter_id, pd.enclosure, pd.slot,
+                   block_devices.sas_generic_device(pd.sas_address, root,
+                                                    dev_root),
+                   'sat' if pd.protocol == 'SATA' else 'scsi')
+            for pd in pds]
+
+
+def parse(data):
+    """
+    Get the health of a disk from the json output of smartctl
+    :param data: parsed 'smartctl -H -A -j' output
+    :return: health dict
+    """
+    attributes = {}
+    for attribute in data.get('ata_smart_attributes', {}).get('table', []):
+        attributes[attribute['name']] = {
+            'id': attribute['id'],
+            'value': attribute.get('value'),
+            'worst': attribute.get('worst'),
+            'thresh': attribute.get('thresh'),
+            'raw': attribute.get('raw', {}).get('value'),
+            'failed': attribute.get('when_failed') or None,
+        }
+    return {
+        'passed': data.get('smart_status', {}).get('passed'),
+        'temperature': data.get('temperature', {}).get('current'),
+        'power_on_hours': data.get('power_on_time', {}).get('hours'),
+        'grown_defects': data.get('scsi_grown_defect_list'),
+        'attributes': attributes,
+    }
+
+
+def read(target, path=SMARTCTL_PATH, timeout=DISK_TIMEOUT):
+    """
+    Read the SMART data of a disk
+    :param target: Target
+    :param path: smartctl path
+    :param timeout: seconds before smartctl is killed
+    :return: health dict, 'error' is set when nothing was read
+    """
+    health = {'controller': target.controller,
+              'enclosure': target.enclosure,
+              'slot': target.slot,
+              'device': target.device,
+              'error': None}
+    if target.device is None:
+        health['error'] = 'no device of the disk found'
+        return health
+
+    args = target.args()
+    LOG.debug("Excuting smartctl 'smartctl %s'" % ' '.join(args))
+    returncode, out, err, timed_out = utils.execute([path] + args, timeout)
+    if timed_out:
+        health['error'] = 'smartctl timed out after %s seconds' % timeout
+        return health
+    try:
+        data = json.loads(out)
+    except ValueError:
+        data = None
+    if data is None or returncode & FATAL_STATUS:
+        messages = [m.get('string', '') for m in
+                    (data or {}).get('smartctl', {}).get('messages', [])]
+        health['error'] = '; '.join(messages) or err.strip() or \
+            'smartctl exit status %s' % returncode
+        return health
+
+    health.update(parse(data))
+    return health
+
+
+def collect(targets, workers=DEFAULT_WORKERS, timeout=DISK_TIMEOUT,
+            path=SMARTCTL_PATH):
+    """
+    Read the SMART data of many disks concurrently
+    :param targets: Target list
+    :param workers: maximum number of concurrent smartctl calls
+    :param timeout: seconds before a smartctl call is killed
+    :param path: smartctl path
+    :return: dict of disk_key() to health dict, empty
+             when smartctl is not installed
+    """
+    targets = list(targets)
+    if not os.path.exists(path):
+        LOG.info('smartctl %s not found, no SMART data collected' % path)
+        return {}
+
+    healths = utils.map_controllers(
+        lambda target: read(target, path, timeout), targets, workers)
+    return dict((disk_key(target.controller, target.enclosure, target.slot),
+                 health) for target, health in zip(targets, healths))
@@ -0,0 +1,115 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Base test case running the cli backends against the simulator"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import mock
+import testtools
+
+import megautils
+from megautils import cache
+from megautils.raid import mega
+from megautils.raid.physical_disk import PhysicalDisk
+from megautils.raid_ircu import mega as ircu_mega
+from megautils.simulator import megacli
+from megautils.simulator import topology
+
+WRAPPER = """#!/bin/sh
+PYTHONPATH="%(path)s" exec "%(python)s" -c "import sys; \
+from megautils.simulator.cli import %(main)s; sys.exit(%(main)s())" "$@"
+"""
+
+
+def physical_disks(state, adapter_id=0):
+    """
+    Parse the physical disks of a simulated adapter, without a subprocess
+    :param state: simulator state
+    :param adapter_id: adapter id
+    :return: megaraid PhysicalDisk list
+    """
+    _, out = megacli.MegaCli(state).run(['-PdList', '-a%d' % adapter_id])
+    return PhysicalDisk(adapter=adapter_id)._handle(out.splitlines(True))
+
+
+class TestCase(testtools.TestCase):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        # entries cached by an earlier test belong to another topology
+        ttl = cache.get_cache().ttl
+        cache.configure(cache.DEFAULT_TTL)
+        self.addCleanup(cache.configure, ttl)
+
+
+class SimulatorTestCase(TestCase):
+    """Runs MegaCli and sas3ircu through wrappers of the simulator cli"""
+
+    def setUp(self):
+        super(SimulatorTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path, True)
+        self.state_path = os.path.join(self.path, 'state.json')
+
+        environ = mock.patch.dict(os.environ,
+                                  {topology.STATE_ENV: self.state_path})
+        environ.start()
+        self.addCleanup(environ.stop)
+
+        self.megacli = self._wrapper('megacli', 'megacli_main')
+        self.sas3ircu = self._wrapper('sas3ircu', 'sas3ircu_main')
+        self._patch_client(mega.Mega, self.megacli)
+        self._patch_client(ircu_mega.Mega, self.sas3ircu)
+
+    def _wrapper(self, name, main):
+        script = os.path.join(self.path, name)
+        with open(script, 'w') as f:
+            f.write(WRAPPER % {
+                'python': sys.executable,
+                'main': main,
+                'path': os.path.dirname(os.path.dirname(
+                    os.path.abspath(megautils.__file__)))})
+        os.chmod(script, 0o755)
+        return script
+
+    def _patch_client(self, cls, script):
+        def init(client, path=None):
+            client.cli_path = path or script
+
+        client = mock.patch.object(cls, '__init__', init)
+        client.start()
+        self.addCleanup(client.stop)
+
+    def build(self, **kwargs):
+        """
+        Save a new simulated topology
+        :param kwargs: build_topology arguments
+        :return: state dict
+        """
+        state = topology.build_topology(**kwargs)
+        topology.save_state(state, self.state_path)
+        return state
+
+    def load(self):
+        return topology.load_state(self.state_path)
+
+    def commands(self, verb):
+        """
+        :return: number of times the simulator ran a MegaCli verb
+        """
+        return self.load().get('stats', {}).get(verb.lower(), 0)
@@ -0,0 +1,91 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import sys
+
+import testtools
+
+from megautils import cache
+from megautils.raid import mega
+from megautils.tests import base
+
+if sys.version_info >= (3, 5):
+    import asyncio
+
+    from megautils.raid import async_mega
+
+    class PeakMega(async_mega.AsyncMega):
+        """Records the most commands running on each adapter at once"""
+
+        def __init__(self, *args, **kwargs):
+            super(PeakMega, self).__init__(*args, **kwargs)
+            self.peak = {}
+            self.overlapped_all = False
+
+        def _can_run(self, adapter):
+            can_run = super(PeakMega, self)._can_run(adapter)
+            if can_run:
+                running = dict(self._running)
+                running[adapter] = running.get(adapter, 0) + 1
+                self.peak[adapter] = max(self.peak.get(adapter, 0),
+                                         running[adapter])
+                if running.get(mega.ALL_ADAPTERS) and \
+                        sum(running.values()) > 1:
+                    self.overlapped_all = True
+            return can_run
+
+
+@testtools.skipIf(sys.version_info < (3, 5), 'asyncio client needs 3.5')
+class AsyncMegaTestCase(base.SimulatorTestCase):
+
+    def setUp(self):
+        super(AsyncMegaTestCase, self).setUp()
+        # every command runs long enough for the others to queue up
+        self.build(controllers=2, disks_per_enclosure=2,
+                   latency={'-pdlist': 0.2, '-adpallinfo': 0.2})
+        # identical reads must reach the simulator
+        cache.configure(0)
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+        self.addCleanup(asyncio.set_event_loop, None)
+
+    def run_all(self, client, cmds):
+        return self.loop.run_until_complete(asyncio.gather(
+            *[client.command(cmd) for cmd in cmds]))
+
+    def test_concurrency_limit(self):
+        client = PeakMega(self.megacli, concurrency=2)
+        cmds = ['-PdList -a0'] * 5
+        cmds.extend(['-PdList -a1'] * 3)
+        results = self.run_all(client, cmds)
+        self.assertEqual(8, len(results))
+        self.assertEqual({'0': 2, '1': 2}, client.peak)
+        self.assertEqual(8, self.commands('-PdList'))
+
+    def test_single_command_per_adapter(self):
+        client = PeakMega(self.megacli)
+        self.run_all(client, ['-PdList -a0'] * 3)
+        self.assertEqual({'0': 1}, client.peak)
+
+    def test_all_adapters_run_alone(self):
+        client = PeakMega(self.megacli, concurrency=2)
+        self.run_all(client, ['-PdList -a0', '-AdpAllInfo -aALL',
+                              '-PdList -a1', '-PdList -a0'])
+        self.assertEqual(1, client.peak[mega.ALL_ADAPTERS])
+        self.assertFalse(client.overlapped_all)
+
+    def test_get_physical_disks(self):
+        client = async_mega.AsyncMega(self.megacli)
+        pds = self.loop.run_until_complete(client.get_physical_disks())
+        self.assertEqual([0, 0, 1, 1], [pd.adapter for pd in pds])
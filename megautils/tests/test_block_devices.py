@@ -0,0 +1,176 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from megautils import block_devices
+from megautils import exception
+from megautils.raid.virtual_driver import VirtualDriver
+from megautils.raid_ircu.virtual_driver import VirtualDriver \
+    as SASVirtualDriver
+from megautils.simulator import megacli
+from megautils.simulator import sas3ircu
+from megautils.simulator import topology
+from megautils.tests import base
+
+
+class BlockDevicesTestCase(base.TestCase):
+
+    def setUp(self):
+        super(BlockDevicesTestCase, self).setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.sysfs = os.path.join(self.root, 'sys')
+        self.dev = os.path.join(self.root, 'dev')
+        os.makedirs(self.dev)
+
+    def megaraid(self, volumes=1):
+        # virtual drivers 0.. of two disks each on 8:0..
+        state = topology.build_topology(disks_per_enclosure=4)
+        cli = megacli.MegaCli(state)
+        for i in range(volumes):
+            cli.run(['-CfgLdAdd', '-r1', '[8:%d,8:%d]' % (2 * i, 2 * i + 1),
+                     '-a0'])
+        return state
+
+    def sas3(self):
+        state = topology.build_topology(disks_per_enclosure=4,
+                                        family=topology.FAMILY_SAS3)
+        sas3ircu.Sas3ircu(state).run(
+            ['0', 'CREATE', 'RAID1', 'MAX', '2:0', '2:1', 'noprompt'])
+        return state
+
+    def write(self, state, nodes=True):
+        names = topology.write_sysfs(state, self.sysfs)
+        if nodes:
+            for name in names:
+                open(os.path.join(self.dev, name), 'w').close()
+        return names
+
+    def vd(self, target_id):
+        vd = VirtualDriver(adapter_id=0, id=target_id)
+        vd.target_id = target_id
+        return vd
+
+    def sas_vd(self, state):
+        _, out = sas3ircu.Sas3ircu(state).run(['0', 'DISPLAY'])
+        vd, = SASVirtualDriver(adapter_id=0)._handle(out.splitlines(True))
+        return vd
+
+    def test_scsi_hosts(self):
+        topology.write_sysfs(topology.build_topology(controllers=2),
+                             self.sysfs)
+        self.assertEqual([0, 1], block_devices.scsi_hosts(
+            block_devices.MEGARAID_DRIVER, self.sysfs))
+        self.assertEqual([], block_devices.scsi_hosts('mpt3sas', self.sysfs))
+
+    def test_block_devices(self):
+        self.assertEqual(['sda', 'sdb'], self.write(self.megaraid(2)))
+        self.assertEqual({'sda': (0, 2, 0, 0), 'sdb': (0, 2, 1, 0)},
+                         block_devices.block_devices(self.sysfs))
+
+    def test_no_sysfs(self):
+        self.assertEqual({}, block_devices.block_devices(self.sysfs))
+        self.assertIsNone(block_devices.megaraid_device(0, 0, self.sysfs,
+                                                        self.dev))
+
+    def test_megaraid_device(self):
+        self.write(self.megaraid(2))
+        self.assertEqual(os.path.join(self.dev, 'sdb'),
+                         block_devices.megaraid_device(0, 1, self.sysfs,
+                                                       self.dev))
+        self.assertIsNone(block_devices.megaraid_device(0, 2, self.sysfs,
+                                                        self.dev))
+        self.assertIsNone(block_devices.megaraid_device(1, 0, self.sysfs,
+                                                        self.dev))
+
+    def test_find_megaraid(self):
+        self.write(self.megaraid())
+        self.assertEqual(os.path.join(self.dev, 'sda'),
+                         block_devices.find_block_device(
+                             self.vd(0), self.sysfs, self.dev))
+
+    def test_find_without_target_id(self):
+        self.write(self.megaraid())
+        # not queried, only the id of the created virtual driver is known
+        vd = VirtualDriver(adapter_id=0, id=0)
+        self.assertIsNone(block_devices.find_block_device(vd, self.sysfs,
+                                                          self.dev))
+
+    def test_find_by_wwid(self):
+        state = self.sas3()
+        self.write(state)
+        vd = self.sas_vd(state)
+        self.assertTrue(vd.volume_wwid)
+        self.assertEqual(os.path.join(self.dev, 'sda'),
+                         block_devices.find_block_device(vd, self.sysfs,
+                                                         self.dev))
+
+    def test_unknown_wwid(self):
+        self.write(self.sas3())
+        self.assertIsNone(block_devices.wwid_device(
+            '0123456789abcdef', self.sysfs, self.dev))
+        self.assertIsNone(block_devices.wwid_device('0', self.sysfs,
+                                                    self.dev))
+
+    def test_sas_generic_device(self):
+        state = self.sas3()
+        self.write(state)
+        disk = state['controllers'][0]['disks'][2]
+        self.assertEqual(os.path.join(self.dev, 'sg2'),
+                         block_devices.sas_generic_device(
+                             disk['sas_address'], self.sysfs, self.dev))
+        # '0x5000c50000000002' as '5000c50-0-0000-0002'
+        address = disk['sas_address'][2:]
+        dashed = '%s-%s-%s-%s' % (address[:7], address[7], address[8:12],
+                                  address[12:])
+        self.assertEqual(os.path.join(self.dev, 'sg2'),
+                         block_devices.sas_generic_device(
+                             dashed, self.sysfs, self.dev))
+        self.assertIsNone(block_devices.sas_generic_device(
+            '0x5000c500ffffffff', self.sysfs, self.dev))
+
+    def test_wait_for_existing_device(self):
+        self.write(self.megaraid())
+        self.assertEqual(os.path.join(self.dev, 'sda'),
+                         block_devices.wait_for_block_device(
+                             self.vd(0), 0, self.sysfs, self.dev))
+
+    def test_wait_timeout(self):
+        # udev did not create the device node
+        self.write(self.megaraid(), nodes=False)
+        self.assertRaises(exception.BlockDeviceNotFound,
+                          block_devices.wait_for_block_device, self.vd(0),
+                          0, self.sysfs, self.dev)
+
+    def test_wait_without_target_id(self):
+        self.assertRaises(exception.InvalidParameterValue,
+                          block_devices.wait_for_block_device,
+                          VirtualDriver(adapter_id=0, id=0), 10,
+                          self.sysfs, self.dev)
+
+    def test_wait_for_created_node(self):
+        self.write(self.megaraid(), nodes=False)
+        node = os.path.join(self.dev, 'sda')
+        timer = threading.Timer(0.2, lambda: open(node, 'w').close())
+        timer.start()
+        self.addCleanup(timer.cancel)
+        start = time.time()
+        self.assertEqual(node, block_devices.wait_for_block_device(
+            self.vd(0), 30, self.sysfs, self.dev))
+        # woken by the creation, not by the EVENT_TIMEOUT relook
+        self.assertLess(time.time() - start, block_devices.EVENT_TIMEOUT)
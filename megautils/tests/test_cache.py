@@ -0,0 +1,149 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from megautils import cache
+from megautils.raid import mega
+from megautils.raid.inventory import Inventory
+from megautils.raid.physical_disk import PhysicalDisk
+from megautils.raid.virtual_driver import VirtualDriver
+from megautils.tests import base
+
+
+class FakeTimer(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class InventoryCacheTestCase(base.TestCase):
+
+    def setUp(self):
+        super(InventoryCacheTestCase, self).setUp()
+        self.timer = FakeTimer()
+        self.cache = cache.InventoryCache(ttl=30, timer=self.timer)
+
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get(0, '-PdList -a0'))
+        self.cache.set(0, '-PdList -a0', ('out',))
+        self.assertEqual(('out',), self.cache.get(0, '-PdList -a0'))
+        self.assertEqual(('out',), self.cache.get('0', '-PdList -a0'))
+        self.assertIsNone(self.cache.get(1, '-PdList -a0'))
+
+    def test_expiry(self):
+        self.cache.set(0, '-PdList -a0', ('out',))
+        self.timer.now += 29
+        self.assertEqual(('out',), self.cache.get(0, '-PdList -a0'))
+        self.timer.now += 1
+        self.assertIsNone(self.cache.get(0, '-PdList -a0'))
+
+    def test_disabled(self):
+        self.cache.ttl = 0
+        self.cache.set(0, '-PdList -a0', ('out',))
+        self.assertIsNone(self.cache.get(0, '-PdList -a0'))
+
+    def test_invalidate_adapter(self):
+        self.cache.set(0, '-PdList -a0', ('0',))
+        self.cache.set(1, '-PdList -a1', ('1',))
+        self.cache.set('ALL', '-PdList -aALL', ('all',))
+        self.cache.invalidate(0)
+        self.assertIsNone(self.cache.get(0, '-PdList -a0'))
+        # the output of every adapter includes adapter 0
+        self.assertIsNone(self.cache.get('ALL', '-PdList -aALL'))
+        self.assertEqual(('1',), self.cache.get(1, '-PdList -a1'))
+
+    def test_invalidate_all(self):
+        self.cache.set(0, '-PdList -a0', ('0',))
+        self.cache.set(1, '-PdList -a1', ('1',))
+        self.cache.invalidate('ALL')
+        self.assertIsNone(self.cache.get(0, '-PdList -a0'))
+        self.assertIsNone(self.cache.get(1, '-PdList -a1'))
+
+    def test_stale_generation_dropped(self):
+        generation = self.cache.generation
+        self.cache.invalidate(0)
+        self.cache.set(0, '-PdList -a0', ('stale',), generation)
+        self.assertIsNone(self.cache.get(0, '-PdList -a0'))
+        self.cache.set(0, '-PdList -a0', ('out',), self.cache.generation)
+        self.assertEqual(('out',), self.cache.get(0, '-PdList -a0'))
+
+
+class ParseCommandTestCase(base.TestCase):
+
+    def test_parse_command(self):
+        self.assertEqual(('-pdlist', '0'),
+                         mega.parse_command('-PdList -a0'))
+        self.assertEqual(('-ldinfo', 'ALL'),
+                         mega.parse_command('-LdInfo -LALL -aall'))
+        self.assertEqual(('-adpcount', 'ALL'),
+                         mega.parse_command('-adpCount'))
+
+    def test_progress_query(self):
+        self.assertTrue(mega.is_progress_query('-LDInit -ShowProg -L0 -a0'))
+        self.assertFalse(mega.is_progress_query('-LDInit -Start -L0 -a0'))
+
+
+class MegaCacheTestCase(base.SimulatorTestCase):
+
+    def setUp(self):
+        super(MegaCacheTestCase, self).setUp()
+        self.build(controllers=2, enclosures=1, disks_per_enclosure=4)
+
+    def test_queries_cached(self):
+        first = PhysicalDisk(adapter=0).get_physical_disks()
+        second = PhysicalDisk(adapter=0).get_physical_disks()
+        self.assertEqual(1, self.commands('-PdList'))
+        self.assertEqual([pd.slot for pd in first],
+                         [pd.slot for pd in second])
+
+    def test_stream_uses_cache(self):
+        PhysicalDisk(adapter=0).get_physical_disks()
+        pds = list(PhysicalDisk(adapter=0).iter_physical_disks())
+        self.assertEqual(4, len(pds))
+        self.assertEqual(1, self.commands('-PdList'))
+
+    def test_create_invalidates_adapter(self):
+        Inventory().collect_physical_disks()
+        PhysicalDisk(adapter=1).get_physical_disks()
+        VirtualDriver(adapter_id=0).create(mega.RAID_1, ['8:0', '8:1'],
+                                           flush=False)
+
+        inventory = Inventory()
+        inventory.collect_physical_disks()
+        self.assertEqual(3, self.commands('-PdList'))
+        self.assertEqual(['Online, Spun Up'] * 2,
+                         [pd.firmware_state for pd
+                          in inventory.get_physical_drivers(0)[:2]])
+        # other adapters keep their entries
+        PhysicalDisk(adapter=1).get_physical_disks()
+        self.assertEqual(3, self.commands('-PdList'))
+
+    def test_progress_query_not_cached(self):
+        vd = VirtualDriver(adapter_id=0)
+        vd.create(mega.RAID_1, ['8:0', '8:1'], flush=False)
+        PhysicalDisk(adapter=0).get_physical_disks()
+        for _ in range(2):
+            vd._get_client().command('-LDInit -ShowProg -L0 -a0')
+        self.assertEqual(2, self.commands('-LDInit'))
+        # progress queries do not drop cached outputs
+        PhysicalDisk(adapter=0).get_physical_disks()
+        self.assertEqual(1, self.commands('-PdList'))
+
+    def test_configure(self):
+        cache.configure(0)
+        PhysicalDisk(adapter=0).get_physical_disks()
+        PhysicalDisk(adapter=0).get_physical_disks()
+        self.assertEqual(2, self.commands('-PdList'))
@@ -0,0 +1,107 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from megautils import exception
+from megautils.raid import mega
+from megautils.raid.adapter import Adapter
+from megautils.raid.cachecade import CacheCade
+from megautils.raid.virtual_driver import VirtualDriver
+from megautils.simulator import megacli
+from megautils.simulator import topology
+from megautils.tests import base
+
+
+class CacheCadeTestCase(base.SimulatorTestCase):
+
+    def setUp(self):
+        super(CacheCadeTestCase, self).setUp()
+        # 8:0-8:3 are hdd, 8:4 and 8:5 are ssd
+        self.build(disks_per_enclosure=6, ssds_per_enclosure=2)
+
+    def _disk_states(self):
+        controller, = self.load()['controllers']
+        return dict(('%d:%d' % (d['enclosure'], d['slot']), d['state'])
+                    for d in controller['disks'])
+
+    def test_create_write_back(self):
+        vd = VirtualDriver(adapter_id=0)
+        vd.create(mega.RAID_1, ['8:0', '8:1'], flush=False)
+        cachecade = CacheCade(adapter_id=0)
+        cachecade.create(mega.RAID_1, ['8:4', '8:5'],
+                         virtual_drivers=[vd.id], write_policy='WB')
+
+        created, = CacheCade(adapter_id=0).get_cachecade_drivers()
+        self.assertEqual(int(cachecade.id), created.id)
+        self.assertEqual('Write Back', created.cache_type)
+        self.assertEqual((0,), created.virtual_drivers)
+
+    def test_invalid_write_policy(self):
+        self.assertRaises(exception.InvalidParameterValue,
+                          CacheCade(adapter_id=0).create, mega.RAID_0,
+                          ['8:4'], write_policy='ForcedWB')
+
+    def test_destroy_unassigned_cachecade(self):
+        VirtualDriver(adapter_id=0).create(mega.RAID_1, ['8:0', '8:1'],
+                                           flush=False)
+        CacheCade(adapter_id=0).create(mega.RAID_0, ['8:4', '8:5'])
+
+        Adapter(id=0).destroy_virtual_drivers()
+        controller, = self.load()['controllers']
+        self.assertEqual([], controller['volumes'])
+        self.assertEqual([], controller['cachecade'])
+        self.assertEqual(set([topology.STATE_UNCONFIGURED]),
+                         set(self._disk_states().values()))
+
+    def test_destroy_assigned_cachecade(self):
+        vd = VirtualDriver(adapter_id=0)
+        vd.create(mega.RAID_1, ['8:0', '8:1'], flush=False)
+        CacheCade(adapter_id=0).create(mega.RAID_1, ['8:4', '8:5'],
+                                       virtual_drivers=[vd.id])
+
+        Adapter(id=0).destroy_virtual_drivers()
+        controller, = self.load()['controllers']
+        self.assertEqual([], controller['volumes'])
+        self.assertEqual([], controller['cachecade'])
+        # the bulk delete did not fail, nothing was deleted one by one
+        self.assertEqual(1, self.commands('-CfgLdDel'))
+
+
+class SimulatorCacheCadeTestCase(base.TestCase):
+
+    def setUp(self):
+        super(SimulatorCacheCadeTestCase, self).setUp()
+        self.cli = megacli.MegaCli(topology.build_topology(
+            disks_per_enclosure=4, ssds_per_enclosure=2))
+
+    def test_write_policy_flags(self):
+        for policy, cache_type in (('-WB', 'Write Back'),
+                                   ('-ForcedWB', 'Write Back'),
+                                   ('-WT', 'Write Through')):
+            exitcode, _ = self.cli.run(['-CfgCacheCadeAdd', '-r0',
+                                        '-Physdrv[8:2]', policy, '-a0'])
+            self.assertEqual(0, exitcode)
+            _, out = self.cli.run(['-CfgCacheCadeDsply', '-a0'])
+            self.assertIn('Cache Type          : %s' % cache_type, out)
+            self.cli.run(['-CfgCacheCadeDel', '-LALL', '-a0'])
+
+    def test_bare_write_policy_rejected(self):
+        exitcode, out = self.cli.run(['-CfgCacheCadeAdd', '-r0',
+                                      '-Physdrv[8:2]', 'WB', '-a0'])
+        self.assertEqual(1, exitcode)
+        self.assertIn('Invalid input at or near token WB', out)
+
+    def test_ld_list_needs_assign(self):
+        exitcode, _ = self.cli.run(['-CfgCacheCadeAdd', '-r0',
+                                    '-Physdrv[8:2]', '-L0', '-a0'])
+        self.assertEqual(1, exitcode)
@@ -0,0 +1,72 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from megautils import exception
+from megautils.raid import controller_profile
+from megautils.tests import base
+
+
+class GetProfileTestCase(base.TestCase):
+
+    def test_named(self):
+        self.assertEqual(controller_profile.PROFILES['throughput'],
+                         controller_profile.get_profile('throughput'))
+
+    def test_unknown_profile(self):
+        self.assertRaises(exception.InvalidParameterValue,
+                          controller_profile.get_profile, 'fastest')
+
+    def test_unknown_property(self):
+        self.assertRaises(exception.InvalidParameterValue,
+                          controller_profile.get_profile, {'speed': 1})
+
+    def test_invalid_values(self):
+        for profile in ({'rebuild_rate': 101}, {'rebuild_rate': True},
+                        {'ncq': 1}, {'spinup_drive_count': 0}):
+            self.assertRaises(exception.InvalidParameterValue,
+                              controller_profile.get_profile, profile)
+
+
+class ApplyTestCase(base.SimulatorTestCase):
+
+    def setUp(self):
+        super(ApplyTestCase, self).setUp()
+        self.build(controllers=2, disks_per_enclosure=1)
+
+    def test_apply(self):
+        profile = controller_profile.ControllerProfile('fast-rebuild')
+        changes = profile.apply()
+        self.assertEqual([0, 1], sorted(changes))
+        current = profile.current()
+        self.assertEqual(profile.profile, current[0])
+        self.assertEqual(profile.profile, current[1])
+
+        # everything is set already
+        self.assertEqual({}, profile.apply())
+        self.assertEqual({}, profile.diff())
+
+    def test_only_differing_properties_set(self):
+        controller_profile.ControllerProfile(
+            {'rebuild_rate': 90, 'ncq': False}).apply()
+        sets = self.commands('-AdpSetProp')
+        changes = controller_profile.ControllerProfile(
+            {'rebuild_rate': 90, 'cc_rate': 25}).apply()
+        self.assertEqual({0: {'cc_rate': 25}, 1: {'cc_rate': 25}}, changes)
+        # one per adapter
+        self.assertEqual(sets + 2, self.commands('-AdpSetProp'))
+
+    def test_single_query_per_property(self):
+        profile = controller_profile.ControllerProfile('throughput')
+        profile.current()
+        self.assertEqual(len(profile.profile),
+                         self.commands('-AdpGetProp'))
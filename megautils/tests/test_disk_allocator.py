@@ -0,0 +1,189 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from megautils import exception
+from megautils.raid import disk_allocator
+from megautils.raid import mega
+from megautils.simulator import topology
+from megautils.tests import base
+
+
+def _slots(pds):
+    return ['%s:%s' % (pd.enclosure, pd.slot) for pd in pds]
+
+
+class AllocatorTestCase(base.TestCase):
+
+    def setUp(self):
+        super(AllocatorTestCase, self).setUp()
+        # 8:0-8:5 and 9:0-9:5 are hdd, 8:6, 8:7, 9:6 and 9:7 are ssd
+        self.state = topology.build_topology(enclosures=2,
+                                             disks_per_enclosure=8,
+                                             ssds_per_enclosure=2)
+
+    def physical_disks(self, sizes=None, online=()):
+        """
+        :param sizes: dict of 'enclosure:slot' to raw size in GB
+        :param online: 'enclosure:slot' of disks already part of an array
+        :return: physical disks of adapter 0
+        """
+        for disk in self.state['controllers'][0]['disks']:
+            spec = '%d:%d' % (disk['enclosure'], disk['slot'])
+            disk['size_gb'] = (sizes or {}).get(spec, disk['size_gb'])
+            if spec in online:
+                disk['state'] = topology.STATE_ONLINE
+        return base.physical_disks(self.state)
+
+
+class DiskSizeTestCase(base.TestCase):
+
+    def test_max(self):
+        self.assertEqual(0, disk_allocator.disk_size_gb(
+            {'raid_level': mega.RAID_5, 'size_gb': 'MAX'}, 3))
+
+    def test_data_disks(self):
+        for raid_level, disks, size in ((mega.RAID_0, 2, 500),
+                                        (mega.RAID_1, 2, 1000),
+                                        (mega.RAID_5, 3, 500),
+                                        (mega.RAID_6, 4, 500),
+                                        (mega.RAID_10, 4, 500)):
+            self.assertEqual(size, disk_allocator.disk_size_gb(
+                {'raid_level': raid_level, 'size_gb': 1000}, disks))
+
+
+class SelectDisksTestCase(AllocatorTestCase):
+
+    def test_hdd_first(self):
+        pds = disk_allocator.select_disks(
+            self.physical_disks(), {'raid_level': mega.RAID_1,
+                                    'size_gb': 100})
+        self.assertEqual(['8:0', '8:1'], _slots(pds))
+
+    def test_root_volume_on_ssd(self):
+        pds = disk_allocator.select_disks(
+            self.physical_disks(), {'raid_level': mega.RAID_1,
+                                    'size_gb': 100,
+                                    'is_root_volume': True})
+        self.assertEqual(['8:6', '8:7'], _slots(pds))
+
+    def test_used_and_online_skipped(self):
+        pds = disk_allocator.select_disks(
+            self.physical_disks(online=('8:0',)),
+            {'raid_level': mega.RAID_1, 'size_gb': 100}, used=('8:1',))
+        self.assertEqual(['8:2', '8:3'], _slots(pds))
+
+    def test_size_per_disk(self):
+        # 1500 GB of raid 5 need 750 GB on each of its 3 disks
+        pds = disk_allocator.select_disks(
+            self.physical_disks(sizes={'8:0': 700, '8:1': 800}),
+            {'raid_level': mega.RAID_5, 'size_gb': 1500})
+        self.assertEqual(['8:1', '8:2', '8:3'], _slots(pds))
+
+    def test_not_enough_ssd(self):
+        self.assertRaises(exception.PhysicalDisksNotFoundError,
+                          disk_allocator.select_disks,
+                          self.physical_disks(),
+                          {'raid_level': mega.RAID_5, 'size_gb': 100,
+                           'disk_type': mega.DISK_TYPE_SSD,
+                           'number_of_physical_disks': 5})
+
+
+class AllocateJointlyTestCase(AllocatorTestCase):
+
+    def test_smallest_disks_big_enough(self):
+        # the disks of 8:0-8:2 hold 1800 GB of raid 5, the default disks
+        # are left for the larger virtual driver
+        pds = self.physical_disks(sizes={'8:0': 1000, '8:1': 1000,
+                                         '8:2': 1000})
+        small, large = disk_allocator.allocate_jointly(pds, [
+            {'raid_level': mega.RAID_5, 'size_gb': 1800},
+            {'raid_level': mega.RAID_1, 'size_gb': 1800}])
+        self.assertEqual(['8:0', '8:1', '8:2'], _slots(small))
+        self.assertEqual(['8:3', '8:4'], _slots(large))
+
+    def test_size_per_disk(self):
+        # 2 x 1000 GB disks hold 1000 GB of raid 1, not 2000 GB
+        pds = self.physical_disks(sizes={'8:0': 1000, '8:1': 1000})
+        chosen, = disk_allocator.allocate_jointly(pds, [
+            {'raid_level': mega.RAID_1, 'size_gb': 1000}])
+        self.assertEqual(['8:0', '8:1'], _slots(chosen))
+
+    def test_max_takes_largest(self):
+        pds = self.physical_disks(sizes={'9:4': 4000, '9:5': 4000})
+        chosen, = disk_allocator.allocate_jointly(pds, [
+            {'raid_level': mega.RAID_1, 'size_gb': 'MAX'}])
+        self.assertEqual(['9:4', '9:5'], sorted(_slots(chosen)))
+
+    def test_hdd_falls_back_to_ssd(self):
+        pds = self.physical_disks()
+        hdd, other = disk_allocator.allocate_jointly(pds, [
+            {'raid_level': mega.RAID_5, 'size_gb': 100,
+             'number_of_physical_disks': 12},
+            {'raid_level': mega.RAID_1, 'size_gb': 100}])
+        self.assertEqual(12, len(hdd))
+        self.assertEqual(['8:6', '8:7'], _slots(other))
+
+    def test_search_alternatives(self):
+        # the first virtual driver may take hdd or ssd, only the hdd leave
+        # the ssd to the second one
+        pds = self.physical_disks()
+        first, second = disk_allocator.allocate_jointly(pds, [
+            {'raid_level': mega.RAID_1, 'size_gb': 100},
+            {'raid_level': mega.RAID_10, 'size_gb': 100,
+             'disk_type': mega.DISK_TYPE_SSD}])
+        self.assertEqual(['8:0', '8:1'], _slots(first))
+        self.assertEqual(4, len(second))
+
+    def test_used(self):
+        chosen, = disk_allocator.allocate_jointly(
+            self.physical_disks(), [{'raid_level': mega.RAID_1,
+                                     'size_gb': 100}], used=('8:0',))
+        self.assertEqual(['8:1', '8:2'], _slots(chosen))
+
+    def test_balanced(self):
+        chosen, = disk_allocator.allocate_jointly(
+            self.physical_disks(), [{'raid_level': mega.RAID_10,
+                                     'size_gb': 100,
+                                     'placement': 'balanced'}])
+        self.assertEqual(['8:0', '9:0', '8:1', '9:1'], _slots(chosen))
+
+    def test_not_enough(self):
+        self.assertRaises(exception.PhysicalDisksNotFoundError,
+                          disk_allocator.allocate_jointly,
+                          self.physical_disks(),
+                          [{'raid_level': mega.RAID_1, 'size_gb': 100,
+                            'is_root_volume': True},
+                           {'raid_level': mega.RAID_1, 'size_gb': 100,
+                            'disk_type': mega.DISK_TYPE_SSD},
+                           {'raid_level': mega.RAID_1, 'size_gb': 100,
+                            'disk_type': mega.DISK_TYPE_SSD}])
+
+
+class BalanceDisksTestCase(base.TestCase):
+
+    def test_interleave_enclosures_and_ports(self):
+        disks = [('8', '0', 0), ('8', '0', 1), ('8', '1', 2), ('9', '2', 3)]
+        picked = disk_allocator.balance_disks(
+            disks, 4, domain=lambda disk: disk[:2])
+        self.assertEqual([0, 3, 2, 1], [disk[2] for disk in picked])
+
+
+class AllocateDisksTestCase(base.SimulatorTestCase):
+
+    def test_allocate_disks(self):
+        self.build(enclosures=1, disks_per_enclosure=8, ssds_per_enclosure=2)
+        config = {'raid_level': mega.RAID_1, 'size_gb': 100,
+                  'is_root_volume': True}
+        disk_allocator.allocate_disks(0, config)
+        self.assertEqual(['8:6', '8:7'], config['physical_disks'])
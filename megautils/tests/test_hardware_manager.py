@@ -0,0 +1,88 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+
+import mock
+
+from megautils import block_devices
+from megautils.ipa_mega_manager import hardware_manager
+from megautils.simulator import topology
+from megautils.tests import base
+
+
+class HardwareManagerTestCase(base.SimulatorTestCase):
+
+    def setUp(self):
+        super(HardwareManagerTestCase, self).setUp()
+        # 8:0-8:5 are hdd, 8:6 and 8:7 are ssd
+        self.build(disks_per_enclosure=8, ssds_per_enclosure=2)
+        self.sysfs = os.path.join(self.path, 'sys')
+        self.dev = os.path.join(self.path, 'dev')
+        os.makedirs(self.dev)
+        for name, value in (('SYSFS_ROOT', self.sysfs),
+                            ('DEV_ROOT', self.dev)):
+            patcher = mock.patch.object(block_devices, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.manager = hardware_manager.MegaHardwareManager()
+        self.manager.ROOT_DEVICE_TIMEOUT = 0
+        self.devices = []
+        self.wait_for_block_device = block_devices.wait_for_block_device
+
+    def _expose_and_wait(self, vd, timeout):
+        # the kernel exposes the volumes once they are created
+        for name in topology.write_sysfs(self.load(), self.sysfs):
+            open(os.path.join(self.dev, name), 'w').close()
+        device = self.wait_for_block_device(vd, timeout)
+        self.devices.append(device)
+        return device
+
+    def create(self, logical_disks):
+        node = {'uuid': 'node', 'target_raid_config': {
+            'logical_disks': logical_disks}}
+        return self.manager.create_configuration(node, [])
+
+    def test_wait_for_root_device(self):
+        with mock.patch.object(block_devices, 'wait_for_block_device',
+                               side_effect=self._expose_and_wait):
+            # the 100GB volume is created first, the root volume is sdb
+            self.create([{'size_gb': 'MAX', 'raid_level': '1',
+                          'is_root_volume': True},
+                         {'size_gb': 100, 'raid_level': '1'}])
+        self.assertEqual([os.path.join(self.dev, 'sdb')], self.devices)
+
+    def test_root_device_missing(self):
+        # no sysfs, the configuration is created nevertheless
+        with mock.patch.object(hardware_manager.LOG, 'warning') as warning:
+            config = self.create([{'size_gb': 'MAX', 'raid_level': '1',
+                                   'is_root_volume': True}])
+        self.assertEqual(1, warning.call_count)
+        self.assertEqual(1, len(config['logical_disks']))
+        controller, = self.load()['controllers']
+        self.assertEqual(1, len(controller['volumes']))
+
+    def test_logical_disks_in_input_order(self):
+        config = self.create([
+            {'size_gb': 'MAX', 'raid_level': '1'},
+            {'size_gb': 100, 'raid_level': '1',
+             'cachecade': {'raid_level': '1'}}])
+        self.assertEqual(['MAX', 100], [x['size_gb']
+                                        for x in config['logical_disks']])
+        # the ssds the CacheCade volume was built of
+        controller, = self.load()['controllers']
+        cache, = controller['cachecade']
+        self.assertEqual(['8:6', '8:7'], sorted(cache['disks']))
+        self.assertEqual({'raid_level': '1',
+                          'physical_disks': cache['disks']},
+                         config['logical_disks'][1]['cachecade'])
@@ -0,0 +1,122 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import shutil
+import tempfile
+
+import mock
+
+from megautils import instrumentation
+from megautils.ipa_mega_manager import hardware_manager
+from megautils.raid import mega
+from megautils.tests import base
+
+
+class InstrumentationTestCase(base.TestCase):
+
+    def setUp(self):
+        super(InstrumentationTestCase, self).setUp()
+        self.addCleanup(setattr, instrumentation, 'enabled',
+                        instrumentation.enabled)
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path, True)
+
+    def test_record(self):
+        instrumentation.record('megacli', '-PdList', 0.02, 100, 0)
+        instrumentation.record('megacli', '-PdList', 120, 50, 1)
+        instrumentation.record_cache_hit('megacli', '-PdList')
+        stats = instrumentation.get_stats()['megacli']['-PdList']
+        self.assertEqual(2, stats['calls'])
+        self.assertEqual(1, stats['cache_hits'])
+        self.assertEqual(120.02, stats['seconds'])
+        self.assertEqual(120, stats['max_seconds'])
+        self.assertEqual(150, stats['output_bytes'])
+        self.assertEqual({'0': 1, '1': 1}, stats['exit_codes'])
+        # 0.02 is in the 0.05 bucket, 120 overflows the last one
+        self.assertEqual([0, 1, 0, 0, 0, 0, 0, 0, 0, 1],
+                         stats['histogram'])
+
+    def test_get_stats_copies(self):
+        instrumentation.record('sas3ircu', 'DISPLAY', 1, 10, None)
+        stats = instrumentation.get_stats()
+        stats['sas3ircu']['DISPLAY']['histogram'][0] = 5
+        stats['sas3ircu']['DISPLAY']['exit_codes'].clear()
+        stats = instrumentation.get_stats()['sas3ircu']['DISPLAY']
+        self.assertEqual(0, stats['histogram'][0])
+        self.assertEqual({'None': 1}, stats['exit_codes'])
+
+    def test_dump_json(self):
+        path = os.path.join(self.path, 'stats.json')
+        instrumentation.record('megacli', '-PdList', 0.5, 10, 0)
+        instrumentation.dump_json('create_configuration', path)
+        instrumentation.reset()
+        document = instrumentation.dump_json('delete_configuration', path)
+
+        with open(path) as f:
+            lines = f.readlines()
+        self.assertEqual(2, len(lines))
+        self.assertEqual(document, lines[1].strip())
+        first, second = [json.loads(line) for line in lines]
+        self.assertEqual('create_configuration', first['step'])
+        self.assertEqual(list(instrumentation.LATENCY_BUCKETS),
+                         first['latency_buckets'])
+        self.assertEqual(1, first['stats']['megacli']['-PdList']['calls'])
+        self.assertEqual('delete_configuration', second['step'])
+        self.assertEqual({}, second['stats'])
+
+    def test_dump_json_without_file(self):
+        document = json.loads(instrumentation.dump_json('step', None))
+        self.assertEqual('step', document['step'])
+        self.assertEqual([], os.listdir(self.path))
+
+
+class CliInstrumentationTestCase(base.SimulatorTestCase):
+
+    def setUp(self):
+        super(CliInstrumentationTestCase, self).setUp()
+        self.build(disks_per_enclosure=2)
+        self.addCleanup(setattr, instrumentation, 'enabled',
+                        instrumentation.enabled)
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+
+    def test_megacli(self):
+        instrumentation.enable()
+        mega.Mega().command('-PdList -a0')
+        mega.Mega().command('-PdList -a0')
+        stats = instrumentation.get_stats()['megacli']['-PdList']
+        self.assertEqual(1, stats['calls'])
+        self.assertEqual(1, stats['cache_hits'])
+        self.assertEqual({'0': 1}, stats['exit_codes'])
+        self.assertGreater(stats['output_bytes'], 0)
+
+    def test_disabled(self):
+        instrumentation.disable()
+        mega.Mega().command('-PdList -a0')
+        self.assertEqual({}, instrumentation.get_stats())
+
+    def test_clean_step_dump(self):
+        instrumentation.enable()
+        manager = hardware_manager.MegaHardwareManager()
+        with mock.patch.object(hardware_manager.LOG, 'info') as info:
+            manager.delete_configuration({'uuid': 'node'}, [])
+        message = info.call_args[0][0]
+        prefix = 'cli stats of delete_configuration: '
+        self.assertTrue(message.startswith(prefix))
+        document = json.loads(message[len(prefix):])
+        self.assertEqual('delete_configuration', document['step'])
+        self.assertIn('megacli', document['stats'])
@@ -0,0 +1,67 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from megautils import exception
+from megautils.raid_ircu import disk_allocator
+from megautils.raid_ircu import mega
+from megautils.simulator import topology
+from megautils.tests import base
+
+
+class IrcuAllocateDisksTestCase(base.SimulatorTestCase):
+
+    def setUp(self):
+        super(IrcuAllocateDisksTestCase, self).setUp()
+        # 2:0 and 2:1 hold 500 GB, 2:2-2:5 1862.5 GB, 2:6 and 2:7 are ssd
+        state = topology.build_topology(disks_per_enclosure=8,
+                                        ssds_per_enclosure=2,
+                                        family=topology.FAMILY_SAS3)
+        for disk in state['controllers'][0]['disks'][:2]:
+            disk['size_gb'] = 500
+        topology.save_state(state, self.state_path)
+
+    def allocate(self, **config):
+        disk_allocator.allocate_disks(0, config)
+        return config['physical_disks']
+
+    def test_disk_size_gb(self):
+        self.assertEqual(500, disk_allocator.disk_size_gb(
+            {'raid_level': mega.RAID_1, 'size_gb': 500}, 2))
+        self.assertEqual(250, disk_allocator.disk_size_gb(
+            {'raid_level': mega.RAID_0, 'size_gb': 500}, 2))
+        self.assertEqual(0, disk_allocator.disk_size_gb(
+            {'raid_level': mega.RAID_10, 'size_gb': 'MAX'}, 4))
+
+    def test_small_disks(self):
+        self.assertEqual(['2:0', '2:1'],
+                         self.allocate(raid_level=mega.RAID_1, size_gb=400))
+
+    def test_size_per_disk(self):
+        # the disks of 800 GB of raid 1 hold 800 GB each
+        self.assertEqual(['2:2', '2:3'],
+                         self.allocate(raid_level=mega.RAID_1, size_gb=800))
+        # 2 disks of 500 GB hold 1000 GB of raid 0
+        self.assertEqual(['2:0', '2:1'],
+                         self.allocate(raid_level=mega.RAID_0,
+                                       size_gb=1000))
+
+    def test_root_volume_on_ssd(self):
+        self.assertEqual(['2:6', '2:7'],
+                         self.allocate(raid_level=mega.RAID_1, size_gb=100,
+                                       is_root_volume=True))
+
+    def test_too_large(self):
+        self.assertRaises(exception.PhysicalDisksNotFoundError,
+                          self.allocate, raid_level=mega.RAID_1,
+                          size_gb=2000)
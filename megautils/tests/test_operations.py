@@ -0,0 +1,127 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mock
+
+from megautils import exception
+from megautils.raid import mega
+from megautils.raid import operations
+from megautils.raid.virtual_driver import VirtualDriver
+from megautils.simulator import topology
+from megautils.tests import base
+
+
+class ParseProgressLineTestCase(base.TestCase):
+
+    def test_virtual_driver(self):
+        self.assertEqual((0, 24), operations.parse_progress_line(
+            'Initialization on VD #0 (target id #0) Completed 24% in '
+            '1 Minutes.'))
+
+    def test_physical_disk(self):
+        self.assertEqual(('8:2', 45), operations.parse_progress_line(
+            'Rebuild Progress on Device at Enclosure 8, Slot 2 Completed '
+            '45% in 12 Minutes.'))
+
+    def test_not_running(self):
+        self.assertEqual(('8:0', None), operations.parse_progress_line(
+            'Device(Encl-8 Slot-0) is not in rebuild process'))
+
+    def test_no_progress(self):
+        self.assertIsNone(operations.parse_progress_line('Exit Code: 0x00'))
+
+
+class OperationTestCase(base.TestCase):
+
+    def test_rate_and_eta(self):
+        now = [100.0]
+        operation = operations.Operation(0, operations.INIT, 0, 10,
+                                         timer=lambda: now[0])
+        self.assertIsNone(operation.eta())
+        now[0] += 10
+        self.assertTrue(operation.update(20))
+        self.assertEqual(1.0, operation.rate)
+        self.assertEqual(80.0, operation.eta())
+        self.assertTrue(operation.update(None))
+        self.assertTrue(operation.done)
+        self.assertFalse(operation.update(None))
+
+
+class OperationTrackerTestCase(base.SimulatorTestCase):
+
+    def setUp(self):
+        super(OperationTrackerTestCase, self).setUp()
+        self.build(disks_per_enclosure=4)
+        with topology.open_state(self.state_path) as state:
+            state['init_seconds_per_gb'] = {'full': 3600}
+        VirtualDriver(adapter_id=0).create(mega.RAID_1, ['8:0', '8:1'],
+                                           flush=False, init_mode='full')
+        self.completed = []
+        self.tracker = operations.OperationTracker(
+            on_complete=self.completed.append)
+
+    def _finish_init(self):
+        with topology.open_state(self.state_path) as state:
+            state['controllers'][0]['volumes'][0]['init']['seconds'] = 0
+
+    def test_discover(self):
+        operation, = self.tracker.discover()
+        self.assertEqual((0, operations.INIT, 0), operation.key)
+        self.assertFalse(operation.done)
+
+    def test_complete(self):
+        self.tracker.discover()
+        self._finish_init()
+        self.assertEqual([], self.tracker.poll())
+        operation, = self.completed
+        self.assertTrue(operation.done)
+        self.assertEqual(100, operation.percent)
+
+    def test_failed_query_ends_nothing(self):
+        self.tracker.discover()
+        command = mega.Mega.command
+
+        def failing(client, cmd):
+            if '-ShowProg' in cmd:
+                raise exception.MegaCLIError('transient failure')
+            return command(client, cmd)
+
+        with mock.patch.object(mega.Mega, 'command', failing):
+            operation, = self.tracker.poll()
+        self.assertEqual([], self.completed)
+        self.assertEqual((0, operations.INIT, 0), operation.key)
+
+    def test_failed_query_without_virtual_drivers(self):
+        self.tracker.discover()
+        VirtualDriver(adapter_id=0, id=0).destroy(flush=False)
+
+        def failing(client, cmd):
+            if '-ShowProg' in cmd:
+                raise exception.MegaCLIError('no virtual drivers')
+            return ['Adapter #0\n', 'Number of Virtual Disks: 0\n']
+
+        with mock.patch.object(mega.Mega, 'command', failing):
+            self.assertEqual([], self.tracker.poll())
+        self.assertEqual(1, len(self.completed))
+
+    def test_run(self):
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            self._finish_init()
+
+        tracker = operations.OperationTracker(sleep=sleep)
+        self.assertTrue(tracker.run(timeout=60))
+        self.assertEqual([operations.MIN_INTERVAL * 2], sleeps)
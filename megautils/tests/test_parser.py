@@ -0,0 +1,159 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from megautils import parser
+from megautils.raid.virtual_driver import VirtualDriver
+from megautils.simulator import megacli
+from megautils.simulator import topology
+from megautils.tests import base
+
+LINES = ['Adapter #0\n',
+         '\n',
+         'Enclosure Device ID: 8\n',
+         'Slot Number: 0\n',
+         'Raw Size: 1.818 TB [0xe8e088b0 Sectors]\n',
+         'Media Type: Hard Disk Device\n',
+         'Enclosure Device ID: 8\n',
+         'Slot Number: 1\n',
+         'Media Type: Solid State Device\n',
+         'Exit Code: 0x00\n']
+
+FIELDS = [parser.Field('Enclosure Device ID', 'enclosure', parser.to_int),
+          parser.Field('Slot Number', 'slot', parser.to_int),
+          parser.Field('Raw Size', 'raw_size', parser.to_size_gb),
+          parser.Field('Media Type', 'media_type')]
+
+
+class SplitFieldTestCase(base.TestCase):
+
+    def test_colon(self):
+        self.assertEqual(('Slot Number', ' 1\n'),
+                         parser.split_field('Slot Number: 1\n'))
+
+    def test_hash(self):
+        self.assertEqual(('Adapter', '0\n'),
+                         parser.split_field('Adapter #0\n'))
+
+    def test_first_colon(self):
+        self.assertEqual(('Inquiry Data', ' SEAGATE:ST2000\n'),
+                         parser.split_field('Inquiry Data: SEAGATE:ST2000\n'))
+
+    def test_no_key(self):
+        self.assertEqual((None, None), parser.split_field('\n'))
+
+
+class ConverterTestCase(base.TestCase):
+
+    def test_to_int(self):
+        self.assertEqual(12, parser.to_int(' 12 \n'))
+
+    def test_to_size_gb(self):
+        self.assertEqual(278.875,
+                         parser.to_size_gb(' 278.875 GB [0x22dc0000 Sectors]'))
+        self.assertEqual(2048.0, parser.to_size_gb('2.0 TB'))
+        self.assertEqual(0.5, parser.to_size_gb('512 MB'))
+        self.assertEqual(3.0, parser.to_size_gb('3'))
+
+
+class TableParserTestCase(base.TestCase):
+
+    def test_parse(self):
+        records = list(parser.TableParser(FIELDS, 'Enclosure Device ID')
+                       .parse(LINES))
+        self.assertEqual([{'enclosure': 8, 'slot': 0,
+                           'raw_size': 1.818 * 1024,
+                           'media_type': 'Hard Disk Device'},
+                          {'enclosure': 8, 'slot': 1,
+                           'media_type': 'Solid State Device'}], records)
+
+    def test_lines_before_start_ignored(self):
+        records = list(parser.TableParser(FIELDS, 'Enclosure Device ID')
+                       .parse(['Raw Size: 1 GB\n'] + LINES[2:4]))
+        self.assertEqual([{'enclosure': 8, 'slot': 0}], records)
+
+    def test_stop(self):
+        records = list(parser.TableParser(FIELDS, 'Enclosure Device ID',
+                                          stop='Media Type').parse(LINES))
+        self.assertEqual([{'enclosure': 8, 'slot': 0,
+                           'raw_size': 1.818 * 1024}], records)
+
+    def test_multi(self):
+        fields = [parser.Field('Slot Number', 'slots', parser.to_int,
+                               multi=True)]
+        records = list(parser.TableParser(fields, 'Adapter').parse(LINES))
+        self.assertEqual([{'slots': [0, 1]}], records)
+
+    def test_on_record_drops_none(self):
+        records = list(parser.TableParser(FIELDS, 'Enclosure Device ID')
+                       .parse(LINES, on_record=lambda values:
+                              values['slot'] if 'raw_size' in values
+                              else None))
+        self.assertEqual([0], records)
+
+    def test_lazy(self):
+        def lines():
+            # a record ends where the next one begins
+            for line in LINES[:7]:
+                yield line
+            raise AssertionError('read past the first record')
+
+        records = parser.TableParser(FIELDS, 'Enclosure Device ID').parse(
+            lines())
+        self.assertEqual(0, next(records)['slot'])
+
+
+class SimulatorOutputTestCase(base.TestCase):
+
+    def setUp(self):
+        super(SimulatorOutputTestCase, self).setUp()
+        self.state = topology.build_topology(disks_per_enclosure=4,
+                                             ssds_per_enclosure=1,
+                                             enclosures=2)
+        self.cli = megacli.MegaCli(self.state)
+
+    def test_physical_disks(self):
+        pds = base.physical_disks(self.state)
+        self.assertEqual(8, len(pds))
+        self.assertEqual([(8, 0), (8, 1), (8, 2), (8, 3), (9, 0)],
+                         [(pd.enclosure, pd.slot) for pd in pds[:5]])
+        self.assertEqual(list(range(8)), [pd.id for pd in pds])
+        self.assertEqual([0] * 8, [pd.adapter for pd in pds])
+        self.assertEqual(['Solid State Device'],
+                         list(set(pd.media_type for pd in pds[3::4])))
+        self.assertEqual(['Hard Disk Device'],
+                         list(set(pd.media_type for pd in pds[:3])))
+        self.assertTrue(pds[0].raw_size > pds[3].raw_size)
+        self.assertIn('Unconfigured', pds[0].firmware_state)
+
+    def _virtual_drivers(self):
+        _, out = self.cli.run(['-LdInfo', '-Lall', '-a0'])
+        return VirtualDriver(adapter_id=0)._handle(out.splitlines(True),
+                                                   multi_vd=True)
+
+    def test_virtual_drivers(self):
+        self.cli.run(['-CfgLdAdd', '-r1', '[8:0,8:1]', '-a0'])
+        self.cli.run(['-CfgLdAdd', '-r0', '[9:0]', '-a0'])
+        vds = self._virtual_drivers()
+        self.assertEqual([0, 1], [vd.id for vd in vds])
+        self.assertEqual([0, 1], [vd.target_id for vd in vds])
+        self.assertEqual([2, 1], [vd.number_of_drives for vd in vds])
+        self.assertEqual('64', vds[0].stripe_size)
+
+    def test_target_id(self):
+        self.cli.run(['-CfgLdAdd', '-r0', '[8:0]', '-a0'])
+        _, out = self.cli.run(['-LdInfo', '-L0', '-a0'])
+        out = out.replace('(Target Id: 0)', '(Target Id: 3)')
+        vd, = VirtualDriver(adapter_id=0)._handle(out.splitlines(True))
+        self.assertEqual(0, vd.id)
+        self.assertEqual(3, vd.target_id)
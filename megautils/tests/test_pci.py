@@ -0,0 +1,126 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+import mock
+
+from megautils import pci
+from megautils.simulator import topology
+from megautils.tests import base
+
+
+class PciTestCase(base.TestCase):
+
+    def setUp(self):
+        super(PciTestCase, self).setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        pci.forget()
+        self.addCleanup(pci.forget)
+
+    def write(self, **kwargs):
+        topology.write_sysfs(topology.build_topology(**kwargs), self.root)
+
+    def device(self, number=0):
+        return os.path.join(self.root, 'bus', 'pci', 'devices',
+                            '0000:%02x:00.0' % (0x10 + number))
+
+    def unbind(self, number=0, device_id=None):
+        os.unlink(os.path.join(self.device(number), 'driver'))
+        if device_id is not None:
+            with open(os.path.join(self.device(number), 'device'), 'w') as f:
+                f.write(device_id + '\n')
+
+    def test_lsi_devices(self):
+        self.write(controllers=2, disks_per_enclosure=1)
+        self.assertEqual([('0000:10:00.0', '0x005d', 'megaraid_sas'),
+                          ('0000:11:00.0', '0x005d', 'megaraid_sas')],
+                         pci.lsi_devices(self.root))
+
+    def test_other_vendor_ignored(self):
+        self.write(disks_per_enclosure=1)
+        with open(os.path.join(self.device(), 'vendor'), 'w') as f:
+            f.write('0x8086\n')
+        self.assertEqual([], pci.lsi_devices(self.root))
+        self.assertEqual(pci.ABSENT,
+                         pci.probe(pci.FAMILY_MEGARAID, self.root))
+
+    def test_no_sysfs(self):
+        self.assertIsNone(pci.lsi_devices(self.root))
+        self.assertEqual(pci.UNKNOWN,
+                         pci.probe(pci.FAMILY_MEGARAID, self.root))
+
+    def test_bound_driver(self):
+        self.write(disks_per_enclosure=1)
+        self.assertEqual(pci.PRESENT,
+                         pci.probe(pci.FAMILY_MEGARAID, self.root))
+        self.assertEqual(pci.ABSENT, pci.probe(pci.FAMILY_SAS3, self.root))
+
+    def test_sas3(self):
+        self.write(disks_per_enclosure=1, family=topology.FAMILY_SAS3)
+        self.assertEqual(pci.PRESENT, pci.probe(pci.FAMILY_SAS3, self.root))
+        self.assertEqual(pci.ABSENT,
+                         pci.probe(pci.FAMILY_MEGARAID, self.root))
+
+    def test_unbound_known_device(self):
+        self.write(disks_per_enclosure=1)
+        self.unbind()
+        self.assertEqual(pci.PRESENT,
+                         pci.probe(pci.FAMILY_MEGARAID, self.root))
+        self.assertEqual(pci.ABSENT, pci.probe(pci.FAMILY_SAS3, self.root))
+
+    def test_unbound_unknown_device(self):
+        self.write(disks_per_enclosure=1)
+        self.unbind(device_id='0xffff')
+        self.assertEqual(pci.UNKNOWN,
+                         pci.probe(pci.FAMILY_MEGARAID, self.root))
+
+    def test_bound_to_another_driver(self):
+        self.write(disks_per_enclosure=1)
+        self.unbind(device_id='0xffff')
+        vfio = os.path.join(self.root, 'bus', 'pci', 'drivers', 'vfio-pci')
+        os.makedirs(vfio)
+        os.symlink(vfio, os.path.join(self.device(), 'driver'))
+        self.assertEqual(pci.ABSENT,
+                         pci.probe(pci.FAMILY_MEGARAID, self.root))
+
+    def test_has_controller_without_cli(self):
+        self.write(disks_per_enclosure=1)
+        cli_check = mock.Mock(return_value=False)
+        self.assertTrue(pci.has_controller(pci.FAMILY_MEGARAID, cli_check,
+                                           self.root))
+        self.assertFalse(pci.has_controller(pci.FAMILY_SAS3, cli_check,
+                                            self.root))
+        self.assertFalse(cli_check.called)
+
+    def test_has_controller_asks_cli_once(self):
+        cli_check = mock.Mock(return_value=True)
+        for _ in range(2):
+            self.assertTrue(pci.has_controller(pci.FAMILY_MEGARAID,
+                                               cli_check, self.root))
+        self.assertEqual(1, cli_check.call_count)
+
+    def test_forget(self):
+        self.assertFalse(pci.has_controller(pci.FAMILY_MEGARAID,
+                                            lambda: False, self.root))
+        # the controller appeared, e.g. after its driver was loaded
+        self.write(disks_per_enclosure=1)
+        self.assertFalse(pci.has_controller(pci.FAMILY_MEGARAID,
+                                            lambda: False, self.root))
+        pci.forget()
+        self.assertTrue(pci.has_controller(pci.FAMILY_MEGARAID,
+                                           lambda: False, self.root))
@@ -0,0 +1,238 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mock
+
+from megautils.raid import initialization
+from megautils.raid import mega
+from megautils.raid import planner
+from megautils.raid.inventory import Inventory
+from megautils.simulator import topology
+from megautils.tests import base
+
+
+def _inventory(state):
+    inventory = Inventory()
+    inventory.physical_disks = dict(
+        (adapter_id, base.physical_disks(state, adapter_id))
+        for adapter_id in range(len(state['controllers'])))
+    return inventory
+
+
+class PlanConfigurationTestCase(base.TestCase):
+
+    def setUp(self):
+        super(PlanConfigurationTestCase, self).setUp()
+        self.state = topology.build_topology(controllers=2, enclosures=2,
+                                             disks_per_enclosure=8,
+                                             ssds_per_enclosure=2)
+        self.inventory = _inventory(self.state)
+
+    def plan(self, *logical_disks):
+        return planner.plan_configuration(
+            {'logical_disks': list(logical_disks)}, self.inventory)
+
+    def test_sort_logical_disks(self):
+        logical_disks = [{'size_gb': 'MAX'}, {'size_gb': 10},
+                         {'size_gb': 100}]
+        self.assertEqual([{'size_gb': 100}, {'size_gb': 10},
+                          {'size_gb': 'MAX'}],
+                         planner.sort_logical_disks(logical_disks))
+
+    def test_root_volume(self):
+        plan = self.plan({'raid_level': mega.RAID_1, 'size_gb': 100,
+                          'is_root_volume': True})
+        volume, = plan.volumes
+        self.assertEqual(('8:6', '8:7'), volume.physical_disks)
+        self.assertTrue(volume.is_root_volume)
+        self.assertEqual(mega.DEFAULT_POLICIES[mega.DISK_TYPE_SSD],
+                         volume.policy)
+
+    def test_count(self):
+        plan = self.plan({'raid_level': mega.RAID_1, 'size_gb': 100,
+                          'count': 3, 'is_root_volume': True,
+                          'disk_type': mega.DISK_TYPE_HDD})
+        self.assertEqual(3, len(plan.volumes))
+        disks = [disk for volume in plan.volumes
+                 for disk in volume.physical_disks]
+        self.assertEqual(6, len(set(disks)))
+        # a single volume of the count may be the root volume
+        self.assertFalse(any(volume.is_root_volume
+                             for volume in plan.volumes))
+
+    def test_logical_disks_without_count(self):
+        plan = self.plan({'raid_level': mega.RAID_1, 'size_gb': 100,
+                          'count': 2})
+        logical_disks = plan.logical_disks()
+        self.assertEqual(2, len(logical_disks))
+        for logical_disk, volume in zip(logical_disks, plan.volumes):
+            self.assertNotIn('count', logical_disk)
+            self.assertEqual(list(volume.physical_disks),
+                             logical_disk['physical_disks'])
+        # planning them again gives the same volumes
+        again = self.plan(*logical_disks)
+        self.assertEqual(plan.to_dict(), again.to_dict())
+
+    def test_logical_disks_in_input_order(self):
+        plan = self.plan({'raid_level': mega.RAID_1, 'size_gb': 'MAX'},
+                         {'raid_level': mega.RAID_1, 'size_gb': 10},
+                         {'raid_level': mega.RAID_1, 'size_gb': 100})
+        # volumes are created largest first
+        self.assertEqual([100, 10, 'MAX'],
+                         [volume.logical_disk['size_gb']
+                          for volume in plan.volumes])
+        self.assertEqual(['MAX', 10, 100],
+                         [logical_disk['size_gb']
+                          for logical_disk in plan.logical_disks()])
+
+    def test_given_physical_disks_are_used(self):
+        plan = self.plan({'raid_level': mega.RAID_1, 'size_gb': 100,
+                          'physical_disks': ['8:0', '8:1']},
+                         {'raid_level': mega.RAID_1, 'size_gb': 10})
+        given, planned = plan.volumes
+        self.assertEqual(('8:0', '8:1'), given.physical_disks)
+        self.assertEqual(('8:2', '8:3'), planned.physical_disks)
+
+    def test_controllers(self):
+        plan = self.plan({'raid_level': mega.RAID_5, 'size_gb': 100,
+                          'controller': 1,
+                          'number_of_physical_disks': 12},
+                         {'raid_level': mega.RAID_5, 'size_gb': 100,
+                          'number_of_physical_disks': 12})
+        self.assertEqual([1, 0], [volume.adapter
+                                  for volume in plan.volumes])
+        self.assertEqual(plan.volumes[0].physical_disks,
+                         plan.volumes[1].physical_disks)
+
+    def test_cachecade(self):
+        plan = self.plan({'raid_level': mega.RAID_5, 'size_gb': 100,
+                          'cachecade': {'raid_level': mega.RAID_1}})
+        volume, = plan.volumes
+        # 'MAX' CacheCade volumes take the largest ssds left
+        self.assertEqual(['9:6', '9:7'],
+                         sorted(volume.cachecade['physical_disks']))
+        self.assertEqual(3, len(volume.physical_disks))
+        self.assertEqual('WT', volume.cachecade['write_policy'])
+
+    def test_cachecade_logical_disks(self):
+        plan = self.plan({'raid_level': mega.RAID_5, 'size_gb': 100,
+                          'cachecade': {'raid_level': mega.RAID_1}})
+        volume, = plan.volumes
+        logical_disk, = plan.logical_disks()
+        self.assertEqual({'raid_level': mega.RAID_1,
+                          'physical_disks': volume.cachecade[
+                              'physical_disks']},
+                         logical_disk['cachecade'])
+        # planning them again gives the same CacheCade volume
+        again = self.plan(logical_disk)
+        self.assertEqual(plan.to_dict(), again.to_dict())
+
+    def test_given_cachecade_disks_are_used(self):
+        plan = self.plan({'raid_level': mega.RAID_1, 'size_gb': 100,
+                          'cachecade': {'physical_disks': ['9:6']}},
+                         {'raid_level': mega.RAID_0, 'size_gb': 10,
+                          'disk_type': mega.DISK_TYPE_SSD,
+                          'number_of_physical_disks': 1})
+        cached, planned = plan.volumes
+        self.assertEqual(['9:6'], cached.cachecade['physical_disks'])
+        self.assertNotIn('9:6', planned.physical_disks)
+
+
+class ParseProgressTestCase(base.TestCase):
+
+    def test_progress(self):
+        self.assertEqual(24, initialization.parse_progress(
+            ['Initialization on VD #0 (target id #0) Completed 24% in '
+             '1 Minutes.\n']))
+
+    def test_not_in_progress(self):
+        self.assertEqual(100, initialization.parse_progress(
+            ['Initialization on VD #0 is not in Progress.\n']))
+
+    def test_nothing_reported(self):
+        self.assertIsNone(initialization.parse_progress(
+            ['\n', 'Exit Code: 0x00\n']))
+
+    def test_handle_not_done_before_reported(self):
+        vd = mock.Mock(id=0, adapter=0)
+        vd._get_client.return_value.command.side_effect = [
+            ['Exit Code: 0x00\n'],
+            ['Initialization on VD #0 is not in Progress.\n']]
+        handle = initialization.InitHandle(vd, initialization.INIT_FAST)
+        self.assertEqual(0, handle.progress())
+        self.assertFalse(handle._done)
+        self.assertTrue(handle.done())
+        self.assertTrue(handle.done())
+        self.assertEqual(2, vd._get_client.return_value.command.call_count)
+
+
+class ExecutePlanTestCase(base.SimulatorTestCase):
+
+    def setUp(self):
+        super(ExecutePlanTestCase, self).setUp()
+        self.build(enclosures=2, disks_per_enclosure=8,
+                   ssds_per_enclosure=2)
+
+    def test_execute(self):
+        plan = planner.plan_configuration({'logical_disks': [
+            {'raid_level': mega.RAID_1, 'size_gb': 100,
+             'is_root_volume': True},
+            {'raid_level': mega.RAID_10, 'size_gb': 'MAX'}]})
+        vds = planner.execute_plan(plan)
+        self.assertEqual(['0', '1'], [vd.id for vd in vds])
+
+        controller, = self.load()['controllers']
+        self.assertEqual([list(plan.volumes[0].physical_disks)],
+                         controller['volumes'][0]['spans'])
+        self.assertEqual(list(plan.volumes[1].physical_disks),
+                         [disk for span in controller['volumes'][1]['spans']
+                          for disk in span])
+        self.assertEqual(0, controller['boot_volume'])
+
+    def test_dry_run(self):
+        plan = planner.plan_configuration({'logical_disks': [
+            {'raid_level': mega.RAID_1, 'size_gb': 100}]})
+        self.assertEqual([], planner.execute_plan(plan, dry_run=True))
+        self.assertEqual(0, self.commands('-CfgLdAdd'))
+        self.assertEqual([], self.load()['controllers'][0]['volumes'])
+
+    def test_single_inventory_query(self):
+        planner.plan_configuration({'logical_disks': [
+            {'raid_level': mega.RAID_1, 'size_gb': 100, 'count': 2},
+            {'raid_level': mega.RAID_5, 'size_gb': 100}]})
+        self.assertEqual(1, self.commands('-PdList'))
+
+    def test_no_wait(self):
+        with topology.open_state(self.state_path) as state:
+            state['init_seconds_per_gb'] = {'full': 3600}
+        plan = planner.plan_configuration({'logical_disks': [
+            {'raid_level': mega.RAID_1, 'size_gb': 100,
+             'init_mode': 'full'}]})
+        with mock.patch.object(planner.LOG, 'warning') as warning:
+            vd, = planner.execute_plan(plan)
+        self.assertFalse(warning.called)
+        # the start only
+        self.assertEqual(1, self.commands('-LDInit'))
+
+    def test_wait_timeout(self):
+        with topology.open_state(self.state_path) as state:
+            state['init_seconds_per_gb'] = {'full': 3600}
+        plan = planner.plan_configuration({'logical_disks': [
+            {'raid_level': mega.RAID_1, 'size_gb': 100,
+             'init_mode': 'full'}]})
+        with mock.patch.object(planner.LOG, 'warning') as warning:
+            vd, = planner.execute_plan(plan, wait=True, timeout=0)
+        self.assertTrue(warning.called)
+        # the start and a single progress query
+        self.assertEqual(2, self.commands('-LDInit'))
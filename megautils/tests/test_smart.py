@@ -0,0 +1,118 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+
+from megautils.raid_ircu.physical_disk import PhysicalDisk \
+    as SASPhysicalDisk
+from megautils import smart
+from megautils.simulator import sas3ircu
+from megautils.simulator import topology
+from megautils.tests import base
+
+
+class SmartTestCase(base.SimulatorTestCase):
+
+    def setUp(self):
+        super(SmartTestCase, self).setUp()
+        self.smartctl = self._wrapper('smartctl', 'smartctl_main')
+        self.sysfs = os.path.join(self.path, 'sys')
+        self.dev = os.path.join(self.path, 'dev')
+
+    def megaraid(self, **kwargs):
+        # 8:0 and 8:1 are SAS hdd, 8:2 is a SATA ssd
+        state = self.build(disks_per_enclosure=3, ssds_per_enclosure=1,
+                           **kwargs)
+        topology.write_sysfs(state, self.sysfs)
+        return smart.megaraid_targets(0, base.physical_disks(state),
+                                      self.sysfs)
+
+    def test_megaraid_targets(self):
+        targets = self.megaraid()
+        self.assertEqual(['/dev/bus/0'] * 3,
+                         [target.device for target in targets])
+        self.assertEqual(['megaraid,0', 'megaraid,1', 'sat+megaraid,2'],
+                         [target.device_type for target in targets])
+        self.assertEqual(['-H', '-A', '-j', '-d', 'megaraid,0',
+                          '/dev/bus/0'], targets[0].args())
+
+    def test_megaraid_targets_without_scsi_host(self):
+        state = topology.build_topology(disks_per_enclosure=1)
+        target, = smart.megaraid_targets(0, base.physical_disks(state),
+                                         self.sysfs)
+        self.assertIsNone(target.device)
+        health = smart.read(target, self.smartctl)
+        self.assertEqual('no device of the disk found', health['error'])
+
+    def test_sas3_targets(self):
+        state = self.build(disks_per_enclosure=2,
+                           family=topology.FAMILY_SAS3)
+        topology.write_sysfs(state, self.sysfs)
+        _, out = sas3ircu.Sas3ircu(state).run(['0', 'DISPLAY'])
+        pds = SASPhysicalDisk(adapter=0)._handle(out.splitlines(True))
+        targets = smart.sas3_targets(0, pds, self.sysfs, self.dev)
+        self.assertEqual([os.path.join(self.dev, 'sg0'),
+                          os.path.join(self.dev, 'sg1')],
+                         [target.device for target in targets])
+        self.assertEqual(['sat', 'sat'],
+                         [target.device_type for target in targets])
+
+        health = smart.read(targets[1], self.smartctl)
+        self.assertIsNone(health['error'])
+        self.assertTrue(health['passed'])
+        self.assertEqual(1017, health['power_on_hours'])
+
+    def test_read_ata(self):
+        health = smart.read(self.megaraid()[2], self.smartctl)
+        self.assertIsNone(health['error'])
+        self.assertEqual((0, 8, 2), (health['controller'],
+                                     health['enclosure'], health['slot']))
+        self.assertTrue(health['passed'])
+        self.assertEqual(32, health['temperature'])
+        self.assertEqual(1034, health['power_on_hours'])
+        self.assertEqual({'id': 5, 'value': 100, 'worst': 100,
+                          'thresh': 10, 'raw': 0, 'failed': None},
+                         health['attributes']['Reallocated_Sector_Ct'])
+        self.assertIsNone(health['grown_defects'])
+
+    def test_read_scsi(self):
+        health = smart.read(self.megaraid()[0], self.smartctl)
+        self.assertIsNone(health['error'])
+        self.assertEqual(0, health['grown_defects'])
+        self.assertEqual({}, health['attributes'])
+
+    def test_read_error(self):
+        target = self.megaraid()[0]
+        target.device_type = 'megaraid,7'
+        health = smart.read(target, self.smartctl)
+        self.assertIn('INQUIRY failed', health['error'])
+        self.assertNotIn('passed', health)
+
+    def test_read_timeout(self):
+        target = self.megaraid(latency={'SMARTCTL': 10})[0]
+        health = smart.read(target, self.smartctl, timeout=1)
+        self.assertEqual('smartctl timed out after 1 seconds',
+                         health['error'])
+
+    def test_collect(self):
+        targets = self.megaraid()
+        health = smart.collect(targets, workers=2, path=self.smartctl)
+        self.assertEqual([(0, '8:0'), (0, '8:1'), (0, '8:2')],
+                         sorted(health))
+        self.assertTrue(all(x['passed'] for x in health.values()))
+        self.assertEqual(3, self.load()['stats'].get('SMARTCTL', 0))
+
+    def test_collect_without_smartctl(self):
+        self.assertEqual({}, smart.collect(
+            self.megaraid(), path=os.path.join(self.path, 'missing')))
+        self.assertEqual(0, self.load()['stats'].get('SMARTCTL', 0))
@@ -0,0 +1,139 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+
+import mock
+
+from megautils import exception
+from megautils.raid_storcli import mega
+from megautils.raid_storcli.adapter import Adapter
+from megautils.raid_storcli.physical_disk import PhysicalDisk
+from megautils.raid_storcli.virtual_driver import VirtualDriver
+from megautils.raid_storcli.virtual_driver import vd_records
+from megautils.tests import base
+
+# recorded from one controller with 8:0-8:2 hdd and 8:3 ssd, 8:0 and 8:1
+# hold a RAID1 virtual drive
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'storcli')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, '%s.json' % name)) as f:
+        return f.read()
+
+
+class ParserTestCase(base.TestCase):
+
+    def test_responses(self):
+        data = json.loads(fixture('controller_show_all'))
+        (adapter, response), = mega.responses(data)
+        self.assertEqual(0, adapter)
+        self.assertIn('Basics', response)
+
+    def test_adapter(self):
+        adapter, = Adapter()._handle(
+            json.loads(fixture('controller_show_all')))
+        self.assertEqual(0, adapter.id)
+        self.assertEqual('AVAGO MegaRAID SAS 9361-8i', adapter.product_name)
+        self.assertEqual('SIMCTL0000', adapter.serial_number)
+        self.assertEqual('4.740.00-8394', adapter.fw_version)
+        self.assertTrue(adapter.bbu_present)
+        self.assertFalse(adapter.alarm_present)
+        self.assertEqual('1024MB', adapter.memory_size)
+
+    def test_physical_disks(self):
+        disks = PhysicalDisk(adapter=0)._handle(
+            json.loads(fixture('drives_show_all')))
+        self.assertEqual([(8, 0), (8, 1), (8, 2), (8, 3)],
+                         [(d.enclosure, d.slot) for d in disks])
+        online, _, unconfigured, ssd = disks
+        self.assertEqual(0, online.adapter)
+        self.assertEqual(0, online.id)
+        self.assertEqual('Online, Spun Up', online.firmware_state)
+        self.assertEqual('Unconfigured(good), Spun Up',
+                         unconfigured.firmware_state)
+        self.assertEqual('Hard Disk Device', online.media_type)
+        self.assertEqual('Solid State Device', ssd.media_type)
+        self.assertEqual('SAS', online.pd_type)
+        self.assertEqual('SATA', ssd.pd_type)
+        self.assertEqual('5000C50000000000', online.wwn)
+        self.assertEqual('0x5000c50000000000', online.sas_address)
+        self.assertEqual('0(path0)', online.connected_port_number)
+        self.assertEqual(2, online.sequence_number)
+        self.assertEqual(0, online.media_errors)
+
+    def test_physical_disk_sizes(self):
+        disk = PhysicalDisk(adapter=0)._handle(
+            json.loads(fixture('drives_show_all')))[0]
+        self.assertGreater(disk.raw_size, disk.coerced_size)
+        self.assertAlmostEqual(1861.632, disk.coerced_size, places=3)
+
+    def test_vd_records(self):
+        (record, members), = vd_records(
+            json.loads(fixture('vds_show_all')))
+        self.assertEqual(0, record.adapter)
+        self.assertEqual(0, record.id)
+        self.assertEqual(0, record.target_id)
+        self.assertEqual(['8:0', '8:1'], members)
+
+    def test_virtual_drivers(self):
+        vd, = VirtualDriver(adapter_id=0)._handle(
+            json.loads(fixture('vds_show_all')))
+        self.assertEqual('Primary-1, Secondary-0, RAID Level Qualifier-0',
+                         vd.raid_level)
+        self.assertEqual('Optimal', vd.state)
+        self.assertEqual('1.819 TB', vd.size)
+        self.assertEqual('64', vd.stripe_size)
+        self.assertEqual(2, vd.number_of_drives)
+        self.assertEqual(1, vd.span_depth)
+        self.assertEqual('WriteBack, ReadAhead, Direct',
+                         vd.default_cache_policy)
+        self.assertEqual('Read/Write', vd.access_policy)
+
+
+class CommandTestCase(base.TestCase):
+
+    def setUp(self):
+        super(CommandTestCase, self).setUp()
+        patcher = mock.patch('subprocess.Popen')
+        self.popen = patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch('os.path.exists', return_value=True):
+            self.client = mega.Mega()
+
+    def _answer(self, name, returncode=0):
+        proc = self.popen.return_value
+        proc.communicate.return_value = (fixture(name), '')
+        proc.returncode = returncode
+
+    def test_command(self):
+        self._answer('controller_show_all')
+        data = self.client.command('/c0 show all')
+        self.assertEqual(0, data['Controllers'][0]['Command Status'][
+            'Controller'])
+        self.assertIn('/c0 show all J', self.popen.call_args[0][0])
+
+    def test_show_is_cached(self):
+        self._answer('drives_show_all')
+        first = self.client.command('/c0/eall/sall show all')
+        second = self.client.command('/c0/eall/sall show all')
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.popen.call_count)
+
+    def test_failure_status(self):
+        self._answer('missing_controller', returncode=1)
+        ex = self.assertRaises(exception.MegaCLIError,
+                               self.client.command, '/c3 show all')
+        self.assertEqual(1, ex.exitcode)
@@ -0,0 +1,76 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from megautils import utils
+from megautils.tests import base
+
+
+class MapControllersTestCase(base.TestCase):
+
+    def test_order(self):
+        self.assertEqual([0, 1, 4, 9],
+                         utils.map_controllers(lambda x: x * x, range(4),
+                                               workers=3))
+
+    def test_serial(self):
+        self.assertEqual([2], utils.map_controllers(lambda x: x + 1, [1],
+                                                    workers=8))
+
+    def test_exception(self):
+        def func(item):
+            if item == 2:
+                raise ValueError(item)
+            return item
+
+        self.assertRaises(ValueError, utils.map_controllers, func,
+                          range(4), workers=4)
+
+
+class ExecuteTestCase(base.TestCase):
+
+    def test_output(self):
+        returncode, out, err, timed_out = utils.execute(
+            ['sh', '-c', 'echo out; echo err >&2; exit 3'], 10)
+        self.assertEqual((3, 'out\n', 'err\n', False),
+                         (returncode, out, err, timed_out))
+
+    def test_stdin_closed(self):
+        _, out, _, timed_out = utils.execute(['sh', '-c', 'read x; echo $?'],
+                                             10)
+        self.assertEqual('1\n', out)
+        self.assertFalse(timed_out)
+
+    def test_timeout(self):
+        start = time.time()
+        _, _, _, timed_out = utils.execute(['sleep', '10'], 0.2)
+        self.assertTrue(timed_out)
+        self.assertTrue(time.time() - start < 5)
+
+    def test_timeout_kills_children(self):
+        if not utils.NEW_SESSION:
+            self.skipTest('python 2 kills the command only')
+        # the background sleep holds stdout open, it must be killed too
+        start = time.time()
+        _, _, _, timed_out = utils.execute(
+            ['sh', '-c', 'sleep 10 & wait'], 0.2)
+        self.assertTrue(timed_out)
+        self.assertTrue(time.time() - start < 5)
+
+    def test_concurrent(self):
+        results = utils.map_controllers(
+            lambda n: utils.execute(['sh', '-c', 'echo %d' % n], 10)[1],
+            range(8), workers=8)
+        self.assertEqual(['%d\n' % n for n in range(8)], results)
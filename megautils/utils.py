@@ -0,0 +1,86 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+DEFAULT_WORKERS = int(os.environ.get('MEGAUTILS_CONTROLLER_WORKERS', 4))
+
+# Popen arguments starting the command in a session of its own
+NEW_SESSION = {'start_new_session': True} if sys.version_info[0] >= 3 \
+    else {}
+
+
+def map_controllers(func, items, workers=DEFAULT_WORKERS):
+    """
+    Call func for every controller on a bounded thread pool
+    :param func: callable taking one item
+    :param items: controllers, per controller work items or disks
+    :param workers: maximum number of concurrent calls, 1 runs serially
+    :return: results in the order of items, the first exception raised by
+             a call is raised again
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    # multiprocessing is slow to import and most nodes have one controller
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def execute(args, timeout):
+    """
+    Run a command, killing it when timeout passed
+    :param args: argument list, no shell is involved
+    :param timeout: seconds
+    :return: (exit code, stdout, stderr, timed out) tuple
+    """
+    # an empty stdin lets a prompt we did not expect fail instead of
+    # hang, the own session lets the timer kill wrapper scripts together
+    # with the command. execute runs on thread pools, where preexec_fn is
+    # not safe, python 2 kills the command only.
+    proc = subprocess.Popen(args,
+                            stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True,
+                            **NEW_SESSION)
+    timed_out = []
+
+    def kill():
+        timed_out.append(True)
+        try:
+            if NEW_SESSION:
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except OSError:
+            pass
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        out, err = proc.communicate()
+    finally:
+        timer.cancel()
+    return proc.returncode, out, err, bool(timed_out)
@@ -0,0 +1,88 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Joint disk allocation against disk count
+
+Usage: python -m tools.benchmarks.bench_allocator [max disks] [rounds]
+"""
+
+import sys
+import timeit
+
+from megautils.raid.disk_allocator import allocate_jointly
+from megautils.raid.physical_disk import PhysicalDiskRecord
+
+SIZES_GB = (446.625, 893.75, 1862.5, 3725.0, 7451.0)
+
+
+def physical_disks(disks, per_enclosure=24):
+    """
+    Build physical disks of mixed sizes, one in eight is a ssd
+    :param disks: number of disks
+    :return: list of PhysicalDiskRecord
+    """
+    return [PhysicalDiskRecord(
+        adapter=0, id=i, enclosure=8 + i // per_enclosure,
+        slot=i % per_enclosure, raw_size=SIZES_GB[i * 7 % len(SIZES_GB)],
+        firmware_state='Unconfigured(good), Spun Up',
+        media_type='Solid State Device' if i % 8 == 0 else
+        'Hard Disk Device')
+        for i in range(disks)]
+
+
+def logical_disks(disks):
+    """
+    Build logical disks using about two thirds of the disks
+    :param disks: number of disks
+    :return: list of logical disk configs
+    """
+    configs = [{'raid_level': '1', 'size_gb': 400, 'is_root_volume': True}]
+    levels = (('1', 2, 800), ('5', 4, 2000), ('6', 6, 3000),
+              ('1+0', 4, 1500), ('0', 2, 800))
+    used = 2
+    i = 0
+    while used + 6 <= disks * 2 // 3:
+        level, number, size_gb = levels[i % len(levels)]
+        configs.append({'raid_level': level, 'size_gb': size_gb,
+                        'number_of_physical_disks': number})
+        used += number
+        i += 1
+    configs.append({'raid_level': '5', 'size_gb': 'MAX'})
+    return configs
+
+
+def run(max_disks=1024, rounds=5):
+    results = []
+    disks = 64
+    while disks <= max_disks:
+        pds = physical_disks(disks)
+        configs = logical_disks(disks)
+        elapsed = min(timeit.repeat(
+            lambda: allocate_jointly(pds, configs), number=1, repeat=rounds))
+        results.append((disks, len(configs), elapsed))
+        disks *= 2
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    max_disks = int(argv[0]) if argv else 1024
+    rounds = int(argv[1]) if len(argv) > 1 else 5
+    for disks, volumes, elapsed in run(max_disks, rounds):
+        print('%5d disks %4d volumes: %8.2f ms' %
+              (disks, volumes, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cold import time of the entry points declared in setup.cfg
+
+Every entry point is imported in a fresh interpreter, so nothing is shared
+with the benchmark process or with the other entry points.
+
+Usage: python -m tools.benchmarks.bench_imports [rounds]
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
+
+SETUP_CFG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '..', '..', 'setup.cfg')
+
+# modules an entry point should only load when it uses them
+HEAVY_MODULES = ('jsonschema', 'pexpect', 'multiprocessing.pool',
+                 'megautils.raid.mega', 'megautils.raid_ircu.mega')
+
+PROBE = """
+import json, sys, time
+start = time.time()
+module = __import__(%(module)r, fromlist=['_'])
+for attr in %(attrs)r:
+    module = getattr(module, attr)
+elapsed = time.time() - start
+print(json.dumps({'seconds': elapsed,
+                  'modules': len(sys.modules),
+                  'heavy': [m for m in %(heavy)r if m in sys.modules]}))
+"""
+
+
+def entry_points(path=SETUP_CFG):
+    """
+    Read the entry points of setup.cfg
+    :param path: setup.cfg path
+    :return: list of (group, name, module, attrs) tuples
+    """
+    parser = configparser.RawConfigParser()
+    parser.read(path)
+    result = []
+    for group, value in parser.items('entry_points'):
+        for line in value.splitlines():
+            if '=' not in line:
+                continue
+            name, target = [x.strip() for x in line.split('=', 1)]
+            module, _, attrs = target.partition(':')
+            result.append((group, name, module,
+                           attrs.split('.') if attrs else []))
+    return result
+
+
+def probe(module, attrs):
+    """
+    Import an entry point in a new interpreter
+    :param module: module name
+    :param attrs: attribute path inside the module
+    :return: dict with seconds, modules and heavy, None when the import
+             fails, e.g. ironic_python_agent is not installed
+    """
+    code = PROBE % {'module': module, 'attrs': attrs,
+                    'heavy': HEAVY_MODULES}
+    proc = subprocess.Popen([sys.executable, '-c', code],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    out, err = proc.communicate()
+    if proc.returncode:
+        return None
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(rounds=5):
+    """
+    Import every entry point rounds times
+    :param rounds: imports per entry point, the fastest one is kept
+    :return: list of (name, result) tuples, result is the probe() dict or
+             None when the entry point can not be imported here
+    """
+    results = []
+    for group, name, module, attrs in entry_points():
+        best = None
+        for _ in range(rounds):
+            result = probe(module, attrs)
+            if result is None:
+                break
+            if best is None or result['seconds'] < best['seconds']:
+                best = result
+        results.append(('%s.%s' % (group, name), best))
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    rounds = int(argv[0]) if argv else 5
+    for name, result in run(rounds):
+        if result is None:
+            print('%-60s not importable' % name)
+            continue
+        print('%-60s %8.2f ms %4d modules %s' % (
+            name, result['seconds'] * 1000, result['modules'],
+            ' '.join(result['heavy'])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Parser throughput on a synthetic '-PdList' dump
+
+Usage: python -m tools.benchmarks.bench_parser [disks] [rounds]
+"""
+
+import sys
+import timeit
+
+from megautils.raid.physical_disk import PD_PARSER
+from megautils.raid.physical_disk import PhysicalDisk
+
+PD_TEMPLATE = """Enclosure Device ID: %(enclosure)d
+Slot Number: %(slot)d
+Drive's position: DiskGroup: 0, Span: 0, Arm: %(slot)d
+Enclosure position: 1
+Device Id: %(id)d
+WWN: 5000C5007A9C%(id)04X
+Sequence Number: 2
+Media Error Count: 0
+Other Error Count: 0
+Predictive Failure Count: 0
+Last Predictive Failure Event Seq Number: 0
+PD Type: SAS
+
+Raw Size: 558.911 GB [0x45dd2fb0 Sectors]
+Non Coerced Size: 558.411 GB [0x45cd2fb0 Sectors]
+Coerced Size: 558.375 GB [0x45cc0000 Sectors]
+Sector Size:  512
+Firmware state: Unconfigured(good), Spun Up
+Device Firmware Level: N004
+Shield Counter: 0
+Successful diagnostics completion on :  N/A
+SAS Address(0): 0x5000c5007a9c%(id)04x
+SAS Address(1): 0x0
+Connected Port Number: %(port)d(path0)
+Inquiry Data: SEAGATE ST600MM0006     N004S0M%(id)05d
+FDE Capable: Not Capable
+FDE Enable: Disable
+Secured: Unsecured
+Locked: Unlocked
+Needs EKM Attention: No
+Foreign State: None
+Device Speed: 6.0Gb/s
+Link Speed: 6.0Gb/s
+Media Type: Hard Disk Device
+Drive Temperature :30C (86.00 F)
+PI Eligibility:  No
+Drive is formatted for PI information:  No
+PI: No PI
+Port-0 :
+Port status: Active
+Port's Linkspeed: 6.0Gb/s
+Port-1 :
+Port status: Active
+Port's Linkspeed: Unknown
+Drive has flagged a S.M.A.R.T alert : No
+
+
+
+"""
+
+
+def pdlist_lines(disks, per_enclosure=24):
+    """
+    Build a synthetic '-PdList -a0' output
+    :param disks: number of physical disks
+    :param per_enclosure: disks per enclosure
+    :return: output lines
+    """
+    out = ['\n', 'Adapter #0\n', '\n']
+    for i in range(disks):
+        out.append(PD_TEMPLATE % {'enclosure': 8 + i // per_enclosure,
+                                  'slot': i % per_enclosure,
+                                  'id': i,
+                                  'port': i % 8})
+    out.append('\nExit Code: 0x00\n')
+    return ''.join(out).splitlines(True)
+
+
+def run(disks=256, rounds=20):
+    lines = pdlist_lines(disks)
+    results = {}
+    for name, func in (
+            ('table_parser', lambda: list(PD_PARSER.parse(lines))),
+            ('physical_disk_handle',
+             lambda: PhysicalDisk(adapter=0)._handle(lines))):
+        elapsed = min(timeit.repeat(func, number=1, repeat=rounds))
+        results[name] = {'lines': len(lines),
+                         'seconds': elapsed,
+                         'lines_per_sec': len(lines) / elapsed}
+    return results
+
+
+def main(argv):
+    disks = int(argv[1]) if len(argv) > 1 else 256
+    rounds = int(argv[2]) if len(argv) > 2 else 20
+    for name, result in sorted(run(disks, rounds).items()):
+        print('%-22s %7d lines %10.0f lines/sec' %
+              (name, result['lines'], result['lines_per_sec']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
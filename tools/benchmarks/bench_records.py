@@ -0,0 +1,111 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Record building versus the former mutate and deepcopy path
+
+Usage: python -m tools.benchmarks.bench_records [disks] [rounds]
+"""
+
+import copy
+import gc
+import sys
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from megautils.raid.physical_disk import PD_PARSER
+from megautils.raid.physical_disk import PhysicalDisk
+from tools.benchmarks.bench_parser import pdlist_lines
+
+
+class DeepcopyPhysicalDisk(object):
+    """Physical disk parsed the way it was before records"""
+
+    def __init__(self, adapter=None):
+        self.adapter = adapter
+        self.slot = None
+        self.id = None
+        self.enclosure = None
+        self.sequence_number = 0
+        self.media_errors = 0
+        self.other_errors = 0
+        self.predictive_failures = 0
+        self.last_predictive_seq_number = 0
+        self.pd_type = ''
+        self.raw_size = ''
+        self.non_coerced_size = ''
+        self.wwn = ''
+        self.coerced_size = ''
+        self.firmware_state = ''
+        self.sas_address = ''
+        self.connected_port_number = ''
+        self.inquiry_data = ''
+        self.fde_capable = ''
+        self.fde_enable = ''
+        self.secured = ''
+        self.locked = ''
+        self.foreign_state = ''
+        self.device_speed = ''
+        self.link_speed = ''
+        self.media_type = ''
+
+    def _handle(self, retstr):
+        pds = []
+        for values in PD_PARSER.parse(retstr):
+            self.__dict__.update(values)
+            if self.id is not None:
+                pds.append(copy.deepcopy(self))
+        return pds
+
+
+def _retained_bytes(func):
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def run(disks=1024, rounds=10):
+    lines = pdlist_lines(disks)
+    results = {}
+    for name, func in (
+            ('deepcopy',
+             lambda: DeepcopyPhysicalDisk(adapter=0)._handle(lines)),
+            ('records', lambda: PhysicalDisk(adapter=0)._handle(lines))):
+        elapsed = min(timeit.repeat(func, number=1, repeat=rounds))
+        results[name] = {'disks': disks,
+                         'seconds': elapsed,
+                         'retained_bytes': _retained_bytes(func)}
+    return results
+
+
+def main(argv):
+    disks = int(argv[1]) if len(argv) > 1 else 1024
+    rounds = int(argv[2]) if len(argv) > 2 else 10
+    for name, result in sorted(run(disks, rounds).items()):
+        print('%-10s %6d disks %8.2f ms %10s bytes retained' %
+              (name, result['disks'], result['seconds'] * 1000,
+               result['retained_bytes']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,352 @@
+# Copyright 2016 Mellanox Technologies, Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark suite
+
+Drives megautils against the simulator and prints the results as json:
+
+    python -m tools.benchmarks.run --output results.json
+    python -m tools.benchmarks.run --baseline results.json --threshold 0.2
+
+With --baseline the run fails when a metric is worse than the baseline by
+more than the threshold.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+WRAPPER = """#!/bin/sh
+exec "%(python)s" -c "import sys; from megautils.simulator.cli import \
+%(main)s; sys.exit(%(main)s())" "$@"
+"""
+
+LOWER = 'lower'
+HIGHER = 'higher'
+
+PARSE_ROUNDS = 10
+ALLOCATE_DISK_COUNTS = (24, 96, 384)
+HEALTH_DISKS = 32
+# a SMART read through the controller firmware is slow, which is what the
+# pool of smart.collect hides
+SMARTCTL_LATENCY = 0.25
+
+TARGET_RAID_CONFIG = {
+    'logical_disks': [
+        {'raid_level': '1', 'size_gb': 100, 'is_root_volume': True},
+        {'raid_level': '5', 'size_gb': 1000},
+        {'raid_level': '6', 'size_gb': 'MAX'},
+    ]
+}
+
+
+class Environment(object):
+    """Simulator state and stand-in executables in a temporary directory"""
+
+    def __init__(self):
+        self.path = tempfile.mkdtemp(prefix='megautils-bench-')
+        self.state = os.path.join(self.path, 'state.json')
+        self.sysfs = os.path.join(self.path, 'sys')
+        os.environ['MEGAUTILS_SIM_STATE'] = self.state
+        for name, main in (('megacli', 'megacli_main'),
+                           ('sas3ircu', 'sas3ircu_main'),
+                           ('smartctl', 'smartctl_main')):
+            script = os.path.join(self.path, name)
+            with open(script, 'w') as f:
+                f.write(WRAPPER % {'python': sys.executable, 'main': main})
+            os.chmod(script, 0o755)
+        # must be set before megautils.raid.mega is imported
+        os.environ['MEGAUTILS_MEGACLI_PATH'] = os.path.join(self.path,
+                                                            'megacli')
+        os.environ['MEGAUTILS_SAS3IRCU_PATH'] = os.path.join(self.path,
+                                                             'sas3ircu')
+        os.environ['MEGAUTILS_SMARTCTL_PATH'] = os.path.join(self.path,
+                                                             'smartctl')
+        os.environ['MEGAUTILS_SYSFS_ROOT'] = self.sysfs
+
+    def init(self, **kwargs):
+        from megautils import pci
+        from megautils.cache import get_cache
+        from megautils.simulator import topology
+        state = topology.build_topology(**kwargs)
+        topology.save_state(state)
+        shutil.rmtree(self.sysfs, ignore_errors=True)
+        topology.write_sysfs(state, self.sysfs)
+        pci.forget()
+        get_cache().invalidate()
+
+    def commands(self):
+        from megautils.simulator import topology
+        with topology.open_state() as state:
+            stats = state.get('stats', {})
+            state['stats'] = {}
+        return sum(stats.values())
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _metric(results, name, value, unit, better):
+    results[name] = {'value': value, 'unit': unit, 'better': better}
+
+
+def _best_of(func, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_parsers(results):
+    from megautils.raid.adapter import Adapter
+    from megautils.raid.physical_disk import PhysicalDisk
+    from megautils.raid.virtual_driver import VirtualDriver
+    from megautils.raid_ircu.adapter import Adapter as SASAdapter
+    from megautils.raid_ircu.physical_disk import PhysicalDisk as SASDisk
+    from megautils.raid_ircu.virtual_driver import VirtualDriver as SASDriver
+    from megautils.raid_storcli.physical_disk import PhysicalDisk as JSONDisk
+    from megautils.raid_storcli.virtual_driver import VirtualDriver \
+        as JSONDriver
+    from megautils.simulator import megacli
+    from megautils.simulator import sas3ircu
+    from megautils.simulator import storcli
+    from megautils.simulator import topology
+
+    state = topology.build_topology(controllers=4, enclosures=4,
+                                    disks_per_enclosure=16)
+    cli = megacli.MegaCli(state)
+    for controller in range(4):
+        for start in range(0, 64, 4):
+            cli.run(['-CfgLdAdd', '-r5', '[%s]' % ','.join(
+                '%d:%d' % (8 + (start + i) // 16, (start + i) % 16)
+                for i in range(4)), '-a%d' % controller])
+    sas_state = topology.build_topology(
+        controllers=1, enclosures=4, disks_per_enclosure=16,
+        family=topology.FAMILY_SAS3)
+    sas_cli = sas3ircu.Sas3ircu(sas_state)
+    sas_cli.run(['0', 'CREATE', 'RAID1', 'MAX', '2:0', '2:1', 'noprompt'])
+    sas_display = sas_cli.run(['0', 'DISPLAY'])[1].splitlines(True)
+    sas_list = sas3ircu.Sas3ircu(topology.build_topology(
+        controllers=8, family=topology.FAMILY_SAS3)).run(['LIST'])[1]
+
+    cases = (
+        ('raid.adapter', cli.run(['-AdpAllInfo', '-aALL'])[1],
+         lambda lines: Adapter()._handle(lines)),
+        ('raid.physical_disk', cli.run(['-PdList', '-a0'])[1],
+         lambda lines: PhysicalDisk(adapter=0)._handle(lines)),
+        ('raid.virtual_driver', cli.run(['-LdInfo', '-LALL', '-a0'])[1],
+         lambda lines: VirtualDriver(adapter_id=0)._handle(lines,
+                                                           multi_vd=True)),
+        ('raid_ircu.adapter', sas_list,
+         lambda lines: SASAdapter()._handle(lines)),
+        ('raid_ircu.physical_disk', ''.join(sas_display),
+         lambda lines: SASDisk(adapter=0)._handle(lines)),
+        ('raid_ircu.virtual_driver', ''.join(sas_display),
+         lambda lines: SASDriver(adapter_id=0)._handle(lines)),
+    )
+    for name, output, handle in cases:
+        lines = output.splitlines(True)
+        elapsed = _best_of(lambda: handle(lines), PARSE_ROUNDS)
+        _metric(results, 'parse.%s' % name, len(lines) / elapsed,
+                'lines/sec', HIGHER)
+
+    # json has no meaningful line count, storcli and MegaCli are compared
+    # by objects per second of the same state
+    json_cli = storcli.Storcli(state)
+    cases = (
+        ('physical_disk', '-PdList', '/c0/eall/sall',
+         lambda lines: PhysicalDisk(adapter=0)._handle(lines),
+         lambda out: JSONDisk(adapter=0)._handle(json.loads(out))),
+        ('virtual_driver', '-LdInfo -LALL', '/c0/vall',
+         lambda lines: VirtualDriver(adapter_id=0)._handle(lines,
+                                                           multi_vd=True),
+         lambda out: JSONDriver(adapter_id=0)._handle(json.loads(out))),
+    )
+    for name, text_cmd, json_cmd, handle_text, handle_json in cases:
+        lines = cli.run(text_cmd.split() + ['-a0'])[1].splitlines(True)
+        out = json_cli.run([json_cmd, 'show', 'all', 'J'])[1]
+        count = len(handle_json(out))
+        for prefix, handle, output in (('raid', handle_text, lines),
+                                       ('raid_storcli', handle_json, out)):
+            elapsed = _best_of(lambda: handle(output), PARSE_ROUNDS)
+            _metric(results, 'parse_objects.%s.%s' % (prefix, name),
+                    count / elapsed, 'objects/sec', HIGHER)
+
+
+def bench_allocation(results, env):
+    from megautils.raid import disk_allocator
+    from tools.benchmarks import bench_allocator
+
+    for disks in ALLOCATE_DISK_COUNTS:
+        env.init(controllers=1, enclosures=disks // 24,
+                 disks_per_enclosure=24)
+        elapsed = _best_of(lambda: disk_allocator.allocate_disks(
+            0, {'raid_level': '5', 'size_gb': 100,
+                'number_of_physical_disks': disks // 2}), 3)
+        _metric(results, 'allocate_disks.%d_disks' % disks, elapsed,
+                'seconds', LOWER)
+
+    for disks, volumes, elapsed in bench_allocator.run(max(
+            ALLOCATE_DISK_COUNTS), rounds=3):
+        _metric(results, 'allocate_jointly.%d_disks' % disks, elapsed,
+                'seconds', LOWER)
+
+
+def bench_clean_steps(results, env, latency, ttl=0, prefix='clean'):
+    """
+    Time the clean steps of the MegaCli hardware manager
+    :param ttl: seconds the cli output is cached, 0 runs every command
+    :param prefix: prefix of the metric names
+    """
+    from megautils.cache import configure
+    from megautils.ipa_mega_manager import hardware_manager
+
+    env.init(controllers=2, enclosures=2, disks_per_enclosure=24,
+             ssds_per_enclosure=4, latency={'*': latency})
+    env.commands()
+    manager = hardware_manager.MegaHardwareManager()
+    # the simulated kernel exposes no volumes created after env.init
+    manager.ROOT_DEVICE_TIMEOUT = 0
+    node = {'uuid': 'benchmark',
+            'target_raid_config': json.loads(json.dumps(TARGET_RAID_CONFIG))}
+    steps = (
+        ('evaluate_hardware_support', manager.evaluate_hardware_support),
+        # the megautils part of list_hardware_info, the generic inventory
+        # depends on the machine the benchmark runs on
+        ('list_hardware_info.physical_disks',
+         manager.list_all_physical_disks),
+        ('create_configuration',
+         lambda: manager.create_configuration(node, [])),
+        ('delete_configuration',
+         lambda: manager.delete_configuration(node, [])),
+    )
+    configure(ttl)
+    try:
+        for name, step in steps:
+            start = time.time()
+            step()
+            elapsed = time.time() - start
+            _metric(results, '%s.%s.seconds' % (prefix, name), elapsed,
+                    'seconds', LOWER)
+            _metric(results, '%s.%s.commands' % (prefix, name),
+                    env.commands(), 'commands', LOWER)
+    finally:
+        configure(0)
+
+
+def bench_health(results, env):
+    from megautils import smart
+    from megautils.raid.inventory import Inventory
+
+    env.init(controllers=2, enclosures=2,
+             disks_per_enclosure=HEALTH_DISKS // 4,
+             latency={'SMARTCTL': SMARTCTL_LATENCY})
+    inventory = Inventory()
+    inventory.collect_physical_disks()
+    for workers in sorted(set([1, smart.DEFAULT_WORKERS])):
+        start = time.time()
+        inventory.collect_health(workers)
+        elapsed = time.time() - start
+        _metric(results, 'health.%d_disks.workers_%d.seconds' %
+                (HEALTH_DISKS, workers), elapsed, 'seconds', LOWER)
+
+
+def bench_imports(results):
+    from tools.benchmarks import bench_imports
+
+    for name, result in bench_imports.run(rounds=3):
+        if result is None:
+            continue
+        _metric(results, 'import.%s.seconds' % name, result['seconds'],
+                'seconds', LOWER)
+        _metric(results, 'import.%s.modules' % name, result['modules'],
+                'modules', LOWER)
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a baseline
+    :param results: metrics of this run
+    :param baseline: metrics of a previous run
+    :param threshold: tolerated relative regression, 0.2 for 20%
+    :return: list of regression messages
+    """
+    regressions = []
+    for name, metric in sorted(results.items()):
+        base = baseline.get(name)
+        if not base or not base['value']:
+            continue
+        change = (metric['value'] - base['value']) / float(base['value'])
+        if metric['better'] == HIGHER:
+            change = -change
+        if change > threshold:
+            regressions.append('%s: %s -> %s %s (%.0f%% worse)' % (
+                name, base['value'], metric['value'], metric['unit'],
+                change * 100))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='tools.benchmarks.run')
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--baseline', help='results of a previous run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='tolerated regression, default 0.2')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='simulated seconds per cli command of the '
+                             'clean step benchmarks')
+    args = parser.parse_args(argv)
+
+    env = Environment()
+    results = {}
+    try:
+        from megautils.cache import configure, DEFAULT_TTL
+        # every benchmark runs the clis, except the cached clean steps
+        configure(0)
+        bench_imports(results)
+        bench_parsers(results)
+        bench_allocation(results, env)
+        bench_clean_steps(results, env, args.latency)
+        bench_clean_steps(results, env, args.latency, DEFAULT_TTL,
+                          'clean_cached')
+        bench_health(results, env)
+    finally:
+        env.cleanup()
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            sys.stderr.write('REGRESSION %s\n' % regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())